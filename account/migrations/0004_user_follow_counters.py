@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:37
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by().values(field).annotate(c=Count("pk")).values("c")
+        ),
+        0,
+    )
+
+
+def backfill_follow_counters(apps, schema_editor):
+    User = apps.get_model("account", "User")
+    Follower = apps.get_model("feed", "Follower")
+    User.objects.update(
+        followers_count=count_subquery(Follower, "following"),
+        following_count=count_subquery(Follower, "follower"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_user_is_private'),
+        ('feed', '0007_follower_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_follow_counters, migrations.RunPython.noop),
+    ]
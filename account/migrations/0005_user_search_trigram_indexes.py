@@ -0,0 +1,43 @@
+# Trigram indexes for feed.search (Postgres only)
+
+from django.db import migrations
+
+
+# Same expression Django generates for `icontains` on Postgres, so the
+# planner can serve UPPER(col::text) LIKE UPPER('%q%') from the index.
+INDEXES = {
+    "account_user_username_trgm": "username",
+    "account_user_first_name_trgm": "first_name",
+    "account_user_last_name_trgm": "last_name",
+}
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" '
+            f'ON "account_user" USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False  # CREATE INDEX CONCURRENTLY can't run in a transaction
+
+    dependencies = [
+        ('account', '0004_user_follow_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
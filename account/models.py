@@ -15,6 +15,8 @@ class User(AbstractUser):
         - `user_type` (CharField): Defines the type of user (Personal/Business).
         - `master_policy` (ForeignKey): References a MasterPolicy.
         - `batch_policy` (ForeignKey): References a Batch.
+        - `followers_count` / `following_count` (PositiveIntegerField): Denormalized
+          follow counters, updated together with `feed.Follower` rows.
     """
 
     USER_TYPE_CHOICES = (
@@ -26,6 +28,8 @@ class User(AbstractUser):
     mobile_number = models.CharField(max_length=15, unique=True)
     user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES)
     is_private = models.BooleanField(default=False)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
 
      # Lazy Reference से Circular Import Fix
     master_policy = models.ForeignKey(
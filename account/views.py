@@ -11,6 +11,7 @@ from django.conf import settings
 from django.core.cache import cache
 from django.core.mail import send_mail, EmailMessage
 from django.template.loader import render_to_string
+from feed.autocomplete import schedule_reindex
 
 
 
@@ -121,6 +122,8 @@ class VerifyOtpView(APIView):
             password=make_password(password)
         )
 
+        schedule_reindex(user.pk)  # Findable by autocomplete
+
         # Clear OTP from Redis after use
         cache.delete(email)
 
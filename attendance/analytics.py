@@ -0,0 +1,108 @@
+"""
+Attendance heatmap and trend data.
+
+Per-day and per-week counts are aggregated in the database from
+`AttendanceDailySummary` (`TruncWeek` + filtered `Sum`), then cached per
+(batch or business, date range). Attendance writes bump the batch's and the
+owner's cache version (see `invalidate_analytics()`), and batch analytics
+also follow the batch's schedule version, so stale entries are never served.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce, TruncWeek
+
+from core.cache import bump_cache_version, versioned_key
+from .models import AttendanceDailySummary
+from .schedule import class_calendar, schedule_scope
+from .summaries import STATUSES
+
+
+ANALYTICS_CACHE_TIMEOUT = 60 * 60
+ROLLING_WINDOW_DAYS = 7
+MAX_RANGE_DAYS = 366
+
+
+def batch_scope(batch_id):
+    return f"attendance:batch:{batch_id}"
+
+
+def owner_scope(owner_id):
+    return f"attendance:owner:{owner_id}"
+
+
+def invalidate_analytics(batch):
+    """Drop cached analytics of `batch` and of its owner's business, on commit."""
+    bump_cache_version(batch_scope(batch.id), owner_scope(batch.created_by_id))
+
+
+def _status_sums():
+    return {value: Coalesce(Sum("count", filter=Q(status=value)), 0) for value in STATUSES}
+
+
+def _present_rate(counts):
+    marked = counts["present"] + counts["absent"] + counts["leave"]
+    return round(100 * counts["present"] / marked, 2) if marked else None
+
+
+def compute_analytics(owner, start_date, end_date, batch=None):
+    """Daily counts with present rate and rolling rate, plus weekly totals."""
+    summaries = AttendanceDailySummary.objects.filter(batch__created_by=owner, date__range=[start_date, end_date])
+    if batch is not None:
+        summaries = summaries.filter(batch=batch)
+
+    by_day = {row.pop("date"): row for row in summaries.values("date").annotate(**_status_sums()).order_by()}
+    weeks = (
+        summaries.annotate(week=TruncWeek("date"))
+        .values("week").annotate(**_status_sums()).order_by("week")
+    )
+
+    calendar = class_calendar(batch, start_date, end_date) if batch is not None else {}
+
+    days, window = [], []
+    empty = {value: 0 for value in STATUSES}
+    day = start_date
+    while day <= end_date:
+        counts = by_day.get(day, empty)
+        window = (window + [counts])[-ROLLING_WINDOW_DAYS:]
+        rolling = {value: sum(row[value] for row in window) for value in STATUSES}
+        days.append({
+            "date": day.strftime("%Y-%m-%d"),
+            **counts,
+            "total": sum(counts.values()),
+            "present_rate": _present_rate(counts),
+            "rolling_present_rate": _present_rate(rolling),
+            "class_day": calendar.get(day),  # None for business-wide analytics
+        })
+        day += timedelta(days=1)
+
+    return {
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "end_date": end_date.strftime("%Y-%m-%d"),
+        "rolling_window_days": ROLLING_WINDOW_DAYS,
+        "days": days,
+        "weeks": [
+            {
+                "week_start": row["week"].strftime("%Y-%m-%d"),
+                **{value: row[value] for value in STATUSES},
+                "total": sum(row[value] for value in STATUSES),
+                "present_rate": _present_rate(row),
+            }
+            for row in weeks
+        ],
+    }
+
+
+def get_analytics(owner, start_date, end_date, batch=None):
+    """Cached `compute_analytics()`; the key carries the batch/owner version."""
+    if batch is not None:
+        scopes = [batch_scope(batch.id), schedule_scope(batch.id)]
+    else:
+        scopes = [owner_scope(owner.id)]
+    key = versioned_key("attendance:analytics", scopes, start_date, end_date)
+    data = cache.get(key)
+    if data is None:
+        data = compute_analytics(owner, start_date, end_date, batch)
+        cache.set(key, data, timeout=ANALYTICS_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,165 @@
+"""
+Compact per-user attendance history.
+
+`AttendanceBitmap` keeps one row per (batch, user, month) with the status of
+every day packed at 2 bits, plus a holiday bit mask. Writes are grouped by
+day and status, so marking a whole batch costs a handful of
+`UPDATE ... SET bits = (bits & ~day_mask) | day_code` statements. Range
+counts use bit masks and popcounts instead of scanning rows.
+"""
+import calendar
+from collections import defaultdict
+
+from django.db.models import F
+
+from .models import Attendance, AttendanceBitmap
+
+
+CODES = {"present": 1, "absent": 2, "leave": 3}
+DAY_CHARS = {0: "-", 1: "P", 2: "A", 3: "L"}  # "H" for holidays
+LOW_BITS = int("01" * 31, 2)  # Low bit of every 2-bit day
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def day_mask(day):
+    """Both bits of `day` (1-31)."""
+    return 3 << (2 * (day - 1))
+
+
+def range_mask(first_day, last_day):
+    """Both bits of every day from `first_day` to `last_day`, inclusive."""
+    return ((1 << (2 * (last_day - first_day + 1))) - 1) << (2 * (first_day - 1))
+
+
+def encode_day(bits, holidays, day, status_value):
+    """Return (bits, holidays) with `day` set to `status_value` (None clears it)."""
+    bits &= ~day_mask(day)
+    holidays &= ~(1 << (day - 1))
+    if status_value == "holiday":
+        holidays |= 1 << (day - 1)
+    elif status_value in CODES:
+        bits |= CODES[status_value] << (2 * (day - 1))
+    return bits, holidays
+
+
+def count_days(bits, holidays, first_day=1, last_day=31):
+    """Number of present/absent/leave/holiday days between `first_day` and `last_day`."""
+    bits &= range_mask(first_day, last_day)
+    low = bits & LOW_BITS
+    high = (bits >> 1) & LOW_BITS
+    holiday_range = ((1 << (last_day - first_day + 1)) - 1) << (first_day - 1)
+    return {
+        "present": bin(low & ~high).count("1"),
+        "absent": bin(high & ~low).count("1"),
+        "leave": bin(low & high).count("1"),
+        "holiday": bin(holidays & holiday_range).count("1"),
+    }
+
+
+def day_string(bitmap):
+    """One character per day of the month: P, A, L, H or - (not marked)."""
+    days = calendar.monthrange(bitmap.month.year, bitmap.month.month)[1]
+    chars = []
+    for day in range(1, days + 1):
+        if bitmap.holidays & (1 << (day - 1)):
+            chars.append("H")
+        else:
+            chars.append(DAY_CHARS[(bitmap.bits >> (2 * (day - 1))) & 3])
+    return "".join(chars)
+
+
+def apply_bitmap_changes(batch, changes):
+    """
+    Write attendance changes of `batch` into the bitmaps; `changes` holds
+    (user_id, date, old_status, new_status) tuples like
+    `attendance.summaries.apply_status_changes()`. Issues one UPDATE per
+    (date, status) group, plus one INSERT for missing months.
+    """
+    groups = defaultdict(list)
+    months = set()
+    for user_id, day, old_status, new_status in changes:
+        if old_status != new_status:
+            groups[(day, new_status)].append(user_id)
+            months.add((user_id, month_start(day)))
+    if not groups:
+        return
+
+    AttendanceBitmap.objects.bulk_create(
+        [AttendanceBitmap(batch=batch, user_id=user_id, month=month) for user_id, month in months],
+        ignore_conflicts=True,
+    )
+    for (day, new_status), user_ids in groups.items():
+        holiday_bit = 1 << (day.day - 1)
+        bits = F("bits").bitand(~day_mask(day.day))
+        if new_status in CODES:
+            bits = bits.bitor(CODES[new_status] << (2 * (day.day - 1)))
+        holidays = F("holidays").bitor(holiday_bit) if new_status == "holiday" else F("holidays").bitand(~holiday_bit)
+
+        AttendanceBitmap.objects.filter(batch=batch, month=month_start(day), user_id__in=user_ids).update(
+            bits=bits, holidays=holidays,
+        )
+
+
+def rebuild_bitmaps(batch_ids=None):
+    """Recompute the bitmaps of `batch_ids` (all batches if None) from `Attendance`."""
+    records = Attendance.objects.filter(batch__isnull=False, user__isnull=False, date__isnull=False)
+    bitmaps = AttendanceBitmap.objects.all()
+    if batch_ids is not None:
+        records = records.filter(batch_id__in=batch_ids)
+        bitmaps = bitmaps.filter(batch_id__in=batch_ids)
+
+    packed = defaultdict(lambda: (0, 0))
+    for batch_id, user_id, day, status_value in records.values_list("batch_id", "user_id", "date", "status").iterator():
+        key = (batch_id, user_id, month_start(day))
+        packed[key] = encode_day(*packed[key], day.day, status_value)
+
+    bitmaps.delete()
+    AttendanceBitmap.objects.bulk_create(
+        [
+            AttendanceBitmap(batch_id=batch_id, user_id=user_id, month=month, bits=bits, holidays=holidays)
+            for (batch_id, user_id, month), (bits, holidays) in packed.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def history_summary(bitmaps, start_date=None, end_date=None):
+    """
+    Totals, percentage present and present-day streaks over `bitmaps`, limited
+    to `start_date`..`end_date`. Holidays and unmarked days don't break a streak.
+    """
+    totals = {"present": 0, "absent": 0, "leave": 0, "holiday": 0}
+    days = {}  # date ordinal -> status code, across batches
+    for bitmap in bitmaps:
+        last_of_month = calendar.monthrange(bitmap.month.year, bitmap.month.month)[1]
+        first_day, last_day = 1, last_of_month
+        if start_date and month_start(start_date) == bitmap.month:
+            first_day = start_date.day
+        if end_date and month_start(end_date) == bitmap.month:
+            last_day = min(end_date.day, last_of_month)
+        if first_day > last_day:
+            continue
+
+        for status_value, count in count_days(bitmap.bits, bitmap.holidays, first_day, last_day).items():
+            totals[status_value] += count
+        base = bitmap.month.toordinal() - 1
+        for day in range(first_day, last_day + 1):
+            code = (bitmap.bits >> (2 * (day - 1))) & 3
+            if code and days.get(base + day, 1) == 1:  # Present only if present in every batch
+                days[base + day] = code
+
+    current = longest = 0
+    for ordinal in sorted(days):
+        current = current + 1 if days[ordinal] == 1 else 0
+        longest = max(longest, current)
+
+    marked = totals["present"] + totals["absent"] + totals["leave"]
+    return {
+        **totals,
+        "percent_present": round(100 * totals["present"] / marked, 2) if marked else 0.0,
+        "current_streak": current,
+        "longest_streak": longest,
+    }
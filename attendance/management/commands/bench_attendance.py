@@ -0,0 +1,70 @@
+import random
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from account.models import User
+from attendance.models import Attendance, Batch
+from attendance.services import upsert_attendance
+from core.benchmarks import create_bench_users, format_stats, measure
+
+
+STATUSES = ["present", "absent", "leave"]
+
+
+def mark_row_by_row(batch, day, statuses, created_by):
+    """The previous BatchAttendanceAPIView.post loop: get_or_create + save per student."""
+    for user_id, status_value in statuses.items():
+        attendance, created = Attendance.objects.get_or_create(
+            batch=batch, user_id=user_id, date=day,
+            defaults={"status": status_value, "created_by": created_by},
+        )
+        if not created:
+            attendance.status = status_value
+            attendance.save()
+
+
+class Command(BaseCommand):
+    """
+    Benchmark marking a batch's attendance: the old per-student loop against
+    the single upsert of `attendance.services.upsert_attendance`.
+
+    Every sample marks a new date (insert) and then the same date again (update).
+    Usage: python manage.py bench_attendance --sizes 10,100,1000
+    Data is seeded in a transaction and rolled back.
+    """
+    help = "Compare per-student attendance writes with the bulk upsert."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10,100,1000", help="Comma separated batch sizes.")
+        parser.add_argument("--samples", type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        with transaction.atomic():
+            owner = create_bench_users(1, user_type="business")[0]
+            for size in sizes:
+                self.benchmark(owner, size, options["samples"])
+            transaction.set_rollback(True)
+
+    def benchmark(self, owner, size, samples):
+        batch = Batch.objects.create(name=f"bench {size}", created_by=owner)
+        students = create_bench_users(size)
+        User.objects.filter(id__in=[student.id for student in students]).update(batch_policy=batch)
+
+        days = iter(date(2000, 1, 1) + timedelta(days=i) for i in range(10 * samples))
+
+        for label, writer in (("row by row", mark_row_by_row), ("bulk upsert", upsert_attendance)):
+            for phase in ("insert", "update"):
+                marked = [next(days) for _ in range(samples)]
+                if phase == "update":
+                    for day in marked:
+                        upsert_attendance(batch, day, {student.id: "present" for student in students}, owner)
+
+                def mark():
+                    statuses = {student.id: random.choice(STATUSES) for student in students}
+                    writer(batch, marked.pop(), statuses, owner)
+
+                stats = measure(mark, samples)
+                self.stdout.write(format_stats(f"{size:>5} students {label} {phase}", stats))
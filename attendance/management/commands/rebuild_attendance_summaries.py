@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from django.db import transaction
+
+from attendance.analytics import invalidate_analytics
+from attendance.bitmaps import rebuild_bitmaps
+from attendance.models import Batch
+from attendance.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    """
+    Recompute the attendance report summaries and the history bitmaps from
+    the Attendance table.
+
+    Needed only if attendance was written outside attendance.services
+    (admin, shell, raw SQL). Usage:
+        python manage.py rebuild_attendance_summaries [--batch <batch_id> ...]
+    """
+    help = "Rebuild AttendanceMonthlySummary, AttendanceDailySummary and AttendanceBitmap."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", action="append", dest="batch_ids", help="Only this batch (repeatable).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_summaries(options["batch_ids"])
+            rebuild_bitmaps(options["batch_ids"])
+
+            batches = Batch.objects.only("id", "created_by_id")
+            if options["batch_ids"] is not None:
+                batches = batches.filter(id__in=options["batch_ids"])
+            for batch in batches.iterator():
+                invalidate_analytics(batch)
+        self.stdout.write(self.style.SUCCESS("Attendance summaries and bitmaps rebuilt."))
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:44
+
+from django.conf import settings
+from django.db import migrations
+
+
+def remove_duplicate_attendance(apps, schema_editor):
+    """Keep the most recently updated row of every (batch, user, date)."""
+    from django.db.models import Count
+
+    Attendance = apps.get_model("attendance", "Attendance")
+    duplicates = (
+        Attendance.objects.filter(batch__isnull=False, user__isnull=False, date__isnull=False)
+        .values("batch", "user", "date")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates.iterator():
+        ids = list(
+            Attendance.objects.filter(batch=group["batch"], user=group["user"], date=group["date"])
+            .order_by("-updated_at", "-created_at")
+            .values_list("id", flat=True)
+        )
+        Attendance.objects.filter(id__in=ids[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('attendance', '0003_batch_description_masterpolicy_description_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_attendance, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='attendance',
+            unique_together={('batch', 'user', 'date')},
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_summaries(apps, schema_editor):
+    """Aggregate the existing attendance into the new summary tables."""
+    from django.db.models import Count
+    from django.db.models.functions import TruncMonth
+
+    Attendance = apps.get_model("attendance", "Attendance")
+    Monthly = apps.get_model("attendance", "AttendanceMonthlySummary")
+    Daily = apps.get_model("attendance", "AttendanceDailySummary")
+
+    records = Attendance.objects.filter(batch__isnull=False, user__isnull=False, date__isnull=False, status__isnull=False)
+    rows = records.annotate(month=TruncMonth("date")).values("batch_id", "user_id", "month", "status").annotate(n=Count("id")).order_by()
+    Monthly.objects.bulk_create((Monthly(count=row.pop("n"), **row) for row in rows.iterator()), batch_size=500)
+    rows = records.values("batch_id", "date", "status").annotate(n=Count("id")).order_by()
+    Daily.objects.bulk_create((Daily(count=row.pop("n"), **row) for row in rows.iterator()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('attendance', '0004_attendance_unique_per_day'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceMonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('status', models.CharField(choices=[('present', 'Present'), ('absent', 'Absent'), ('leave', 'Leave'), ('holiday', 'Holiday')], max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to='attendance.batch')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_monthly_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'month'], name='attendance__user_id_ee3e90_idx')],
+                'unique_together': {('batch', 'user', 'month', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AttendanceDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('present', 'Present'), ('absent', 'Absent'), ('leave', 'Leave'), ('holiday', 'Holiday')], max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='attendance.batch')),
+            ],
+            options={
+                'unique_together': {('batch', 'date', 'status')},
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+CODES = {"present": 1, "absent": 2, "leave": 3}
+
+
+def build_bitmaps(apps, schema_editor):
+    """Pack the existing attendance into monthly bitmaps."""
+    Attendance = apps.get_model("attendance", "Attendance")
+    AttendanceBitmap = apps.get_model("attendance", "AttendanceBitmap")
+
+    packed = {}
+    records = Attendance.objects.filter(batch__isnull=False, user__isnull=False, date__isnull=False)
+    for batch_id, user_id, day, status in records.values_list("batch_id", "user_id", "date", "status").iterator():
+        key = (batch_id, user_id, day.replace(day=1))
+        bits, holidays = packed.get(key, (0, 0))
+        if status == "holiday":
+            holidays |= 1 << (day.day - 1)
+        elif status in CODES:
+            bits |= CODES[status] << (2 * (day.day - 1))
+        packed[key] = (bits, holidays)
+
+    AttendanceBitmap.objects.bulk_create(
+        [
+            AttendanceBitmap(batch_id=batch_id, user_id=user_id, month=month, bits=bits, holidays=holidays)
+            for (batch_id, user_id, month), (bits, holidays) in packed.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('attendance', '0005_attendance_summaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('bits', models.BigIntegerField(default=0)),
+                ('holidays', models.IntegerField(default=0)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_bitmaps', to='attendance.batch')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_bitmaps', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'month'], name='attendance__user_id_3ebe2d_idx')],
+                'unique_together': {('batch', 'user', 'month')},
+            },
+        ),
+        migrations.RunPython(build_bitmaps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_attendance_bitmap'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['batch', 'created_by', '-date'], name='attendance__batch_i_848088_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['created_by', '-created_at'], name='attendance__created_d45b1c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['user', '-date'], name='attendance__user_id_4791a1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(condition=models.Q(('status__in', ['absent', 'leave'])), fields=['created_by', 'date'], name='attendance_absences_idx'),
+        ),
+    ]
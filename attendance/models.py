@@ -140,6 +140,9 @@ class MasterPolicy(BaseModel):
 
 
 
+ABSENCE_STATUSES = ["absent", "leave"]  # Served by the partial index attendance_absences_idx
+
+
 class Attendance(BaseModel):
     """
     Attendance model to track student attendance batch-wise.
@@ -173,8 +176,97 @@ class Attendance(BaseModel):
         User, on_delete=models.CASCADE, related_name="recorded_attendance"
     )  # Business user who marks attendance
 
-    # class Meta:
-    #     unique_together = ('batch', 'user', 'date')  # Ensures unique attendance record per user per day
+    class Meta:
+        unique_together = ('batch', 'user', 'date')  # Ensures unique attendance record per user per day
+        indexes = [
+            models.Index(fields=["batch", "created_by", "-date"]),  # AttendanceLogsAPIView
+            models.Index(fields=["created_by", "-created_at"]),  # AttendanceReportAPIView listing and export
+            models.Index(fields=["user", "-date"]),  # UserAttendanceAPIView
+            models.Index(  # Absentee reports (`?status=absent|leave`), a small share of the rows
+                fields=["created_by", "date"],
+                condition=models.Q(status__in=ABSENCE_STATUSES),
+                name="attendance_absences_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.date} - {self.status}" if self.user and self.date else "Attendance Entry"
+
+
+
+class AttendanceMonthlySummary(models.Model):
+    """
+    Number of attendance days per (batch, user, month, status).
+
+    Derived from `Attendance` and kept current by `attendance.summaries`;
+    rebuild with `python manage.py rebuild_attendance_summaries`.
+
+    Attributes:
+        - `month` (DateField): First day of the month.
+        - `count` (IntegerField): Attendance rows with this status in the month.
+    """
+
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name="monthly_summaries")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="attendance_monthly_summaries")
+    month = models.DateField()
+    status = models.CharField(max_length=10, choices=Attendance.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('batch', 'user', 'month', 'status')
+        indexes = [
+            models.Index(fields=["user", "month"]),
+        ]
+
+    def __str__(self):
+        return f"{self.batch_id} - {self.user_id} - {self.month:%Y-%m} - {self.status}: {self.count}"
+
+
+
+class AttendanceDailySummary(models.Model):
+    """
+    Number of students per (batch, date, status); see `AttendanceMonthlySummary`.
+    """
+
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name="daily_summaries")
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=Attendance.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('batch', 'date', 'status')
+
+    def __str__(self):
+        return f"{self.batch_id} - {self.date} - {self.status}: {self.count}"
+
+
+
+class AttendanceBitmap(models.Model):
+    """
+    One month of a user's attendance in a batch, packed at 2 bits per day.
+
+    Day `d` (1-31) is stored in bits `2*(d-1)` and `2*(d-1)+1` of `bits`:
+    0 = not marked, 1 = present, 2 = absent, 3 = leave. Holidays are the days
+    set in `holidays` (bit `d-1`). Kept next to `Attendance` by
+    `attendance.bitmaps`, so a multi-year history is a few rows.
+
+    Attributes:
+        - `month` (DateField): First day of the month.
+        - `bits` (BigIntegerField): 31 packed 2-bit day statuses.
+        - `holidays` (IntegerField): Bit per holiday.
+    """
+
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name="attendance_bitmaps")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="attendance_bitmaps")
+    month = models.DateField()
+    bits = models.BigIntegerField(default=0)
+    holidays = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('batch', 'user', 'month')
+        indexes = [
+            models.Index(fields=["user", "month"]),
+        ]
+
+    def __str__(self):
+        return f"{self.batch_id} - {self.user_id} - {self.month:%Y-%m}"
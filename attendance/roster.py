@@ -0,0 +1,46 @@
+"""
+Cached member list of a batch.
+
+The attendance register needs every member of a batch (`User.batch_policy`)
+with their display name. The list is cached per batch under a versioned key,
+so opening and submitting the register skip the member query; assigning a
+user to a batch, or renaming a member, calls `invalidate_roster()`.
+"""
+from django.core.cache import cache
+
+from account.models import User
+from core.cache import bump_cache_version, versioned_key
+
+
+ROSTER_CACHE_TIMEOUT = 60 * 60
+
+
+def roster_scope(batch_id):
+    return f"attendance:roster:{batch_id}"
+
+
+def invalidate_roster(batch_ids):
+    """Drop the cached rosters of `batch_ids` (None entries are ignored), on commit."""
+    scopes = [roster_scope(batch_id) for batch_id in set(batch_ids) if batch_id]
+    if scopes:
+        bump_cache_version(*scopes)
+
+
+def build_roster(batch):
+    """[(user_id, name)] of the batch members, same name as `User.get_full_name()`."""
+    rows = (
+        User.objects.filter(batch_policy=batch)
+        .order_by("first_name", "last_name", "username")
+        .values_list("id", "first_name", "last_name", "username")
+    )
+    return [(user_id, f"{first} {last}".strip() or username) for user_id, first, last, username in rows]
+
+
+def get_roster(batch):
+    """Cached `build_roster()`."""
+    key = versioned_key("attendance:roster", [roster_scope(batch.id)])
+    roster = cache.get(key)
+    if roster is None:
+        roster = build_roster(batch)
+        cache.set(key, roster, timeout=ROSTER_CACHE_TIMEOUT)
+    return roster
@@ -0,0 +1,78 @@
+"""
+Class-day calendar of a batch.
+
+A batch has classes on the weekdays enabled in its `WeeklyPlan`, between the
+plan's `start_date` and `end_date` (when set). Batches without a plan keep
+the old rule: Monday to Friday. The weekday pattern and the plan dates are
+cached per batch, so checking any date range costs no query; every other day
+is a non-class day that is marked "holiday".
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+
+from core.cache import bump_cache_version, versioned_key
+from .models import Batch
+
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+DEFAULT_CLASS_DAYS = [True, True, True, True, True, False, False]  # Without a WeeklyPlan
+SCHEDULE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def schedule_scope(batch_id):
+    return f"attendance:schedule:{batch_id}"
+
+
+def invalidate_schedule(batch_ids):
+    """Call when a batch's WeeklyPlan, or the plan itself, changes."""
+    scopes = [schedule_scope(batch_id) for batch_id in batch_ids]
+    if scopes:
+        bump_cache_version(*scopes)
+
+
+def build_schedule(batch):
+    """{"weekdays": [7 bools, Monday first], "start": date|None, "end": date|None}"""
+    plan = batch.weekly_plan
+    if plan is None:
+        return {"weekdays": DEFAULT_CLASS_DAYS, "start": None, "end": None}
+    return {
+        "weekdays": [getattr(plan, day) for day in WEEKDAYS],
+        "start": plan.start_date,
+        "end": plan.end_date,
+    }
+
+
+def get_schedule(batch):
+    """Cached `build_schedule()`."""
+    key = versioned_key("attendance:schedule", [schedule_scope(batch.id)])
+    schedule = cache.get(key)
+    if schedule is None:
+        if batch.weekly_plan_id and "weekly_plan" not in batch._state.fields_cache:
+            batch = Batch.objects.select_related("weekly_plan").get(pk=batch.pk)
+        schedule = build_schedule(batch)
+        cache.set(key, schedule, timeout=SCHEDULE_CACHE_TIMEOUT)
+    return schedule
+
+
+def is_class_day(schedule, day):
+    if schedule["start"] and day < schedule["start"]:
+        return False
+    if schedule["end"] and day > schedule["end"]:
+        return False
+    return schedule["weekdays"][day.weekday()]
+
+
+def class_calendar(batch, start_date, end_date):
+    """{date: is_class_day} for every date from `start_date` to `end_date`."""
+    schedule = get_schedule(batch)
+    calendar = {}
+    day = start_date
+    while day <= end_date:
+        calendar[day] = is_class_day(schedule, day)
+        day += timedelta(days=1)
+    return calendar
+
+
+def non_class_days(batch, start_date, end_date):
+    return [day for day, is_class in class_calendar(batch, start_date, end_date).items() if not is_class]
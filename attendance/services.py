@@ -0,0 +1,218 @@
+"""
+Set-based attendance writes.
+
+`upsert_attendance()` marks a whole batch for one date with a single
+`INSERT ... ON CONFLICT (batch, user, date) DO UPDATE`, instead of a
+get_or_create + save per student. `correct_attendance()` validates a day's
+corrections together and writes them with one `bulk_update`.
+`fill_holidays()` marks every non-class day of a date range (see
+`attendance.schedule`) with one `INSERT ... ON CONFLICT DO NOTHING`. All keep
+the report summaries (`attendance.summaries`) and the history bitmaps
+(`attendance.bitmaps`) in step and invalidate cached analytics.
+
+`assign_batch()` moves many business members into a batch with one
+membership check and one `UPDATE ... WHERE id IN (...)`.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.timezone import now
+
+from account.models import User
+from .models import Attendance, Batch
+from .analytics import invalidate_analytics
+from .bitmaps import apply_bitmap_changes
+from .roster import get_roster, invalidate_roster
+from .schedule import non_class_days
+from .summaries import apply_status_changes
+
+
+UPSERT_BATCH_SIZE = 1000
+
+
+def _lock_batch(batch):
+    """
+    Lock the batch row until the transaction ends. Attendance writes read the
+    previous statuses to move the summaries and bitmaps, and `select_for_update`
+    on attendance rows can't lock rows that don't exist yet: without this, two
+    concurrent first marks of a day would both count it.
+    """
+    Batch.objects.select_for_update().only("id").get(pk=batch.pk)
+
+
+def upsert_attendance(batch, date, statuses, created_by):
+    """
+    Write `statuses` ({user_id: status}) for `batch` on `date`.
+
+    New rows are created by `created_by`; existing rows only get the new
+    status. Returns the ids of users that already had attendance that day.
+    """
+    if not statuses:
+        return []
+
+    with transaction.atomic():
+        _lock_batch(batch)
+        previous = dict(
+            Attendance.objects.select_for_update()
+            .filter(batch=batch, date=date, user_id__in=list(statuses))
+            .values_list("user_id", "status")
+        )
+
+        Attendance.objects.bulk_create(
+            [
+                Attendance(batch=batch, user_id=user_id, date=date, status=status_value, created_by=created_by)
+                for user_id, status_value in statuses.items()
+            ],
+            batch_size=UPSERT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["batch", "user", "date"],
+            update_fields=["status", "updated_at"],
+        )
+        changes = [(user_id, date, previous.get(user_id), status_value) for user_id, status_value in statuses.items()]
+        apply_status_changes(batch, changes)
+        apply_bitmap_changes(batch, changes)
+        invalidate_analytics(batch)
+    return list(previous)
+
+
+def _user_pk(value):
+    """`value` as a User primary key, or None if it isn't one."""
+    try:
+        return User._meta.pk.to_python(value)
+    except ValidationError:
+        return None
+
+
+def correct_attendance(batch, date, updates):
+    """
+    Apply status corrections for `batch` on `date`, all entries validated up front.
+
+    `updates` is a list of {"user_id", "status"}. Every entry is checked against
+    the batch members and the existing attendance in one query each; the valid
+    ones are written with a single `bulk_update`. Returns one result per entry:
+    {"user_id", "status", "updated": bool, "error"?}.
+    """
+    valid_statuses = {value for value, _ in Attendance.STATUS_CHOICES}
+
+    parsed = []
+    for entry in updates:
+        user_id, new_status = entry.get("user_id"), entry.get("status")
+        result = {"user_id": user_id, "status": new_status, "updated": False}
+        pk = _user_pk(user_id)
+        if pk is None:
+            result["error"] = "Invalid user id"
+        if pk is not None and new_status not in valid_statuses:
+            pk, result["error"] = None, f"Invalid status, use one of {sorted(valid_statuses)}"
+        parsed.append((pk, new_status, result))
+
+    user_ids = {pk for pk, _, _ in parsed if pk is not None}
+    with transaction.atomic():
+        _lock_batch(batch)  # The previous statuses must not change before the summaries move
+        members = set(User.objects.filter(id__in=user_ids, batch_policy=batch).values_list("id", flat=True))
+        records = {
+            record.user_id: record
+            for record in Attendance.objects.filter(batch=batch, date=date, user_id__in=members)
+        }
+
+        changed, changes = {}, []
+        for pk, new_status, result in parsed:
+            if pk is None:
+                continue
+            if pk not in members:
+                result["error"] = f"User {result['user_id']} is not part of Batch {batch.id}"
+            elif pk not in records:
+                result["error"] = f"No attendance for user {result['user_id']} on {date}"
+            else:
+                changes.append((pk, date, records[pk].status, new_status))
+                records[pk].status = new_status
+                records[pk].updated_at = now()  # bulk_update skips auto_now
+                changed[pk] = records[pk]
+                result["updated"] = True
+
+        if changed:
+            Attendance.objects.bulk_update(changed.values(), ["status", "updated_at"], batch_size=UPSERT_BATCH_SIZE)
+            apply_status_changes(batch, changes)
+            apply_bitmap_changes(batch, changes)
+            invalidate_analytics(batch)
+
+    return [result for _, _, result in parsed]
+
+
+def fill_holidays(batch, start_date, end_date, created_by):
+    """
+    Mark every batch member "holiday" on the non-class days of `batch` between
+    `start_date` and `end_date`. Days already marked are kept as they are.
+    Returns the filled dates.
+    """
+    days = non_class_days(batch, start_date, end_date)
+    user_ids = [user_id for user_id, _ in get_roster(batch)]
+    if not days or not user_ids:
+        return []
+
+    with transaction.atomic():
+        _lock_batch(batch)
+        marked = set(
+            Attendance.objects.select_for_update()
+            .filter(batch=batch, date__in=days, user_id__in=user_ids)
+            .values_list("user_id", "date")
+        )
+        missing = [(user_id, day) for day in days for user_id in user_ids if (user_id, day) not in marked]
+
+        Attendance.objects.bulk_create(
+            [
+                Attendance(batch=batch, user_id=user_id, date=day, status="holiday", created_by=created_by)
+                for user_id, day in missing
+            ],
+            batch_size=UPSERT_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        changes = [(user_id, day, None, "holiday") for user_id, day in missing]
+        apply_status_changes(batch, changes)
+        apply_bitmap_changes(batch, changes)
+        if changes:
+            invalidate_analytics(batch)
+    return days
+
+
+def assign_batch(batch, user_ids=None, unassigned_only=False):
+    """
+    Assign users to `batch`; only members of the batch owner's business qualify.
+
+    `user_ids` lists the users to assign; None means every member of the
+    business (with `unassigned_only`, those without a batch). Returns one
+    result per user: {"user_id", "assigned": bool, "previous_batch_id"?, "error"?}.
+    Users already in `batch` count as assigned.
+    """
+    members = User.objects.filter(business_memberships__business__user=batch.created_by)
+    if user_ids is None and unassigned_only:
+        members = members.filter(batch_policy__isnull=True)
+
+    results, pks = [], []
+    if user_ids is not None:
+        for user_id in user_ids:
+            result = {"user_id": user_id, "assigned": False}
+            pk = _user_pk(user_id)
+            if pk is None:
+                result["error"] = "Invalid user id"
+            results.append((pk, result))
+            pks.append(pk)
+        members = members.filter(id__in=[pk for pk in pks if pk is not None])
+
+    previous = dict(members.values_list("id", "batch_policy_id").distinct().order_by())
+    if user_ids is None:
+        results = [(pk, {"user_id": str(pk), "assigned": False}) for pk in previous]
+
+    for pk, result in results:
+        if pk is None:
+            continue
+        if pk not in previous:
+            result["error"] = f"User {result['user_id']} is not a member of this business"
+        else:
+            result["assigned"] = True
+            result["previous_batch_id"] = previous[pk]
+
+    moved = [pk for pk, batch_id in previous.items() if batch_id != batch.id]
+    if moved:
+        with transaction.atomic():
+            User.objects.filter(id__in=moved).update(batch_policy=batch)
+            invalidate_roster([batch.id, *(previous[pk] for pk in moved)])
+    return [result for _, result in results]
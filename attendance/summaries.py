@@ -0,0 +1,164 @@
+"""
+Pre-aggregated attendance counts for reports.
+
+`AttendanceMonthlySummary` counts days per (batch, user, month, status) and
+`AttendanceDailySummary` counts students per (batch, date, status). Every
+attendance write passes its status changes to `apply_status_changes()`, which
+adds them with `INSERT ... ON CONFLICT DO UPDATE SET count = count + delta`,
+so a report reads a few summary rows instead of every attendance row.
+`rebuild_summaries()` recomputes them from `Attendance` if they ever drift.
+"""
+import calendar
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import Attendance, AttendanceDailySummary, AttendanceMonthlySummary
+
+
+INSERT_BATCH_SIZE = 500
+STATUSES = [value for value, _ in Attendance.STATUS_CHOICES]
+REPORT_GROUPS = ("user", "batch", "day", "month")
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def is_whole_months(start_date, end_date):
+    """True if the range starts on the first and ends on the last day of a month."""
+    last_day = calendar.monthrange(end_date.year, end_date.month)[1]
+    return start_date.day == 1 and end_date.day == last_day
+
+
+def apply_status_changes(batch, changes):
+    """
+    Add attendance changes of `batch` to the summaries. `changes` holds
+    (user_id, date, old_status, new_status) tuples; `old_status` is None for
+    a new row. Call it in the transaction that writes the attendance.
+    """
+    monthly, daily = Counter(), Counter()
+    for user_id, day, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        for status_value, delta in ((old_status, -1), (new_status, 1)):
+            if status_value:
+                monthly[(batch.id, user_id, month_start(day), status_value)] += delta
+                daily[(batch.id, day, status_value)] += delta
+
+    _increment(AttendanceMonthlySummary, ["batch", "user", "month", "status"], monthly)
+    _increment(AttendanceDailySummary, ["batch", "date", "status"], daily)
+
+
+def _increment(model, key_fields, deltas):
+    """Upsert `deltas` ({key tuple: delta}) into the `count` column of `model`."""
+    rows = [(*key, delta) for key, delta in deltas.items() if delta]
+    if not rows:
+        return
+
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in key_fields + ["count"]]
+    table = quote(model._meta.db_table)
+    columns = ", ".join(quote(field.column) for field in fields)
+    conflict = ", ".join(quote(field.column) for field in fields[:-1])
+    count = quote("count")
+    row_sql = "(" + ", ".join(["%s"] * len(fields)) + ")"
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            chunk = rows[start:start + INSERT_BATCH_SIZE]
+            params = [field.get_db_prep_value(value, connection) for row in chunk for field, value in zip(fields, row)]
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join([row_sql] * len(chunk))} "
+                f"ON CONFLICT ({conflict}) DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count}",
+                params,
+            )
+
+
+def rebuild_summaries(batch_ids=None):
+    """Recompute the summaries of `batch_ids` (all batches if None) from `Attendance`."""
+    records = Attendance.objects.filter(batch__isnull=False, user__isnull=False, date__isnull=False, status__isnull=False)
+    monthly = AttendanceMonthlySummary.objects.all()
+    daily = AttendanceDailySummary.objects.all()
+    if batch_ids is not None:
+        records = records.filter(batch_id__in=batch_ids)
+        monthly = monthly.filter(batch_id__in=batch_ids)
+        daily = daily.filter(batch_id__in=batch_ids)
+
+    with transaction.atomic():
+        monthly.delete()
+        daily.delete()
+
+        rows = (
+            records.annotate(month=TruncMonth("date"))
+            .values("batch_id", "user_id", "month", "status")
+            .annotate(days=Count("id"))
+            .order_by()
+        )
+        AttendanceMonthlySummary.objects.bulk_create(
+            (AttendanceMonthlySummary(batch_id=row["batch_id"], user_id=row["user_id"], month=row["month"],
+                                      status=row["status"], count=row["days"]) for row in rows.iterator()),
+            batch_size=INSERT_BATCH_SIZE,
+        )
+
+        rows = records.values("batch_id", "date", "status").annotate(students=Count("id")).order_by()
+        AttendanceDailySummary.objects.bulk_create(
+            (AttendanceDailySummary(batch_id=row["batch_id"], date=row["date"], status=row["status"],
+                                    count=row["students"]) for row in rows.iterator()),
+            batch_size=INSERT_BATCH_SIZE,
+        )
+
+
+def summary_report(owner, group_by, batch_id=None, user_id=None, start_date=None, end_date=None, status=None):
+    """
+    Attendance counts per status for the batches of `owner`, grouped by
+    `group_by` (one of REPORT_GROUPS). Reads only the summary tables.
+
+    `user`/`month` groups, and any report filtered by `user_id`, come from the
+    monthly table, so their date range must cover whole months; raises
+    ValueError otherwise. `day` cannot be filtered by user.
+    """
+    monthly = group_by in ("user", "month") or user_id
+    if monthly and start_date and end_date and not is_whole_months(start_date, end_date):
+        raise ValueError("start_date and end_date must cover whole months.")
+    if monthly:
+        summaries = AttendanceMonthlySummary.objects.filter(batch__created_by=owner)
+        if user_id:
+            summaries = summaries.filter(user_id=user_id)
+        if start_date and end_date:
+            summaries = summaries.filter(month__range=[month_start(start_date), month_start(end_date)])
+    else:
+        summaries = AttendanceDailySummary.objects.filter(batch__created_by=owner)
+        if start_date and end_date:
+            summaries = summaries.filter(date__range=[start_date, end_date])
+
+    if batch_id:
+        summaries = summaries.filter(batch_id=batch_id)
+    if status:
+        summaries = summaries.filter(status=status)
+
+    keys = {
+        "user": ["user_id", "user__first_name", "user__last_name", "user__username"],
+        "batch": ["batch_id", "batch__name"],
+        "day": ["date"],
+        "month": ["month"],
+    }[group_by]
+    counts = {value: Coalesce(Sum("count", filter=Q(status=value)), 0) for value in STATUSES}
+    rows = summaries.values(*keys).annotate(**counts, total=Coalesce(Sum("count"), 0)).order_by(keys[-1])
+
+    report = []
+    for row in rows:
+        if group_by == "user":
+            first_name, last_name = row.pop("user__first_name"), row.pop("user__last_name")
+            row["user_name"] = f"{first_name} {last_name}".strip() or row.pop("user__username")
+            row.pop("user__username", None)
+        elif group_by == "batch":
+            row["batch_name"] = row.pop("batch__name")
+        elif group_by == "month":
+            row["month"] = row["month"].strftime("%Y-%m")
+        else:
+            row["date"] = row["date"].strftime("%Y-%m-%d")
+        report.append(row)
+    return report
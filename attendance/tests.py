@@ -1,3 +1,373 @@
-from django.test import TestCase
+import json
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from account.models import User
+from core.models import BusinessInfo, BusinessMembership
+from .bitmaps import rebuild_bitmaps
+from .roster import invalidate_roster
+from .models import Attendance, AttendanceBitmap, AttendanceDailySummary, AttendanceMonthlySummary, Batch, WeeklyPlan
+from .summaries import rebuild_summaries
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BatchAttendanceTests(APITestCase):
+    """Marking a batch is one upsert whatever the batch size."""
+
+    def setUp(self):
+        self.owner = self.create_user("owner", user_type="business")
+        self.batch = Batch.objects.create(name="Morning", created_by=self.owner)
+        self.students = [self.create_user(f"student{i}") for i in range(5)]
+        User.objects.filter(id__in=[student.id for student in self.students]).update(batch_policy=self.batch)
+        self.client.force_authenticate(self.owner)
+        self.url = f"/api/attendance/batch/{self.batch.id}/attendance/"
+
+    def create_user(self, username, user_type="personal"):
+        return User.objects.create(
+            username=username, email=f"{username}@example.com",
+            mobile_number=f"+91-{username}", user_type=user_type,
+        )
+
+    def mark(self, present, day="2024-01-01"):  # 2024-01-01 is a Monday
+        return self.client.post(
+            self.url, {"date": day, "present_user_ids": [str(student.id) for student in present]}, format="json",
+        )
+
+    def statuses(self, day="2024-01-01"):
+        return dict(Attendance.objects.filter(batch=self.batch, date=day).values_list("user_id", "status"))
+
+    def test_mark_and_remark(self):
+        response = self.mark(self.students[:2])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data["updated_users"], [])
+        self.assertEqual(list(self.statuses().values()).count("present"), 2)
+
+        response = self.mark(self.students[:4])
+        self.assertEqual(len(response.data["updated_users"]), 5)
+        self.assertEqual(Attendance.objects.filter(batch=self.batch).count(), 5)
+        self.assertEqual(self.statuses()[self.students[3].id], "present")
+        self.assertEqual(self.statuses()[self.students[4].id], "absent")
+
+    def test_weekend_is_holiday(self):
+        self.mark(self.students, day="2024-01-06")
+        self.assertEqual(set(self.statuses("2024-01-06").values()), {"holiday"})
+
+    def test_weekly_plan_class_days(self):
+        plan = WeeklyPlan.objects.create(
+            name="Weekend", created_by=self.owner, start_date=date(2024, 1, 1), saturday=True, sunday=True,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/api/attendance/batches/{self.batch.id}/", {"weekly_plan": str(plan.id)}, format="json",
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+
+        self.mark(self.students[:1], day="2024-01-06")  # Saturday is a class day now
+        self.assertEqual(sorted(self.statuses("2024-01-06").values()), ["absent"] * 4 + ["present"])
+        self.mark(self.students, day="2024-01-08")
+        self.assertEqual(set(self.statuses("2024-01-08").values()), {"holiday"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/attendance/weekly-plans/{plan.id}/", {"monday": True}, format="json")
+        self.mark(self.students, day="2024-01-15")
+        self.assertEqual(set(self.statuses("2024-01-15").values()), {"present"})
+
+    def test_fill_holidays(self):
+        Attendance.objects.create(  # Already marked days are kept
+            batch=self.batch, user=self.students[0], date=date(2024, 1, 7), status="present", created_by=self.owner,
+        )
+        url = f"/api/attendance/batch/{self.batch.id}/attendance/fill-holidays/"
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, {"start_date": "2024-01-01", "end_date": "2024-01-31"}, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data["holidays"], ["2024-01-06", "2024-01-07", "2024-01-13", "2024-01-14",
+                                                     "2024-01-20", "2024-01-21", "2024-01-27", "2024-01-28"])
+        inserts = [
+            query for query in context.captured_queries
+            if query["sql"].startswith("INSERT") and '"attendance_attendance"' in query["sql"].split("(")[0]
+        ]
+        self.assertEqual(len(inserts), 1)
+
+        self.assertEqual(Attendance.objects.filter(batch=self.batch, status="holiday").count(), 8 * 5 - 1)
+        self.assertEqual(self.statuses("2024-01-07")[self.students[0].id], "present")
+        summaries = dict(AttendanceMonthlySummary.objects.filter(user=self.students[1]).values_list("status", "count"))
+        self.assertEqual(summaries, {"holiday": 8})
+        bitmap = AttendanceBitmap.objects.get(user=self.students[1])
+        self.assertEqual(bin(bitmap.holidays).count("1"), 8)
+
+        response = self.client.post(url, {"start_date": "2024-01-01", "end_date": "2025-06-01"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_constant_queries(self):
+        with CaptureQueriesContext(connection) as small:
+            self.mark(self.students)
+        self.students += [self.create_user(f"late{i}") for i in range(20)]
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.exclude(id=self.owner.id).update(batch_policy=self.batch)
+            invalidate_roster([self.batch.id])
+        with CaptureQueriesContext(connection) as large:
+            self.mark(self.students, day="2024-01-02")
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+    def test_roster_cached_until_assignment(self):
+        response = self.client.get(self.url)
+        self.assertEqual([user["id"] for user in response.data["users"]], [student.id for student in self.students])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(len(context.captured_queries), 1)  # The batch only
+
+        newcomer = self.create_user("newcomer")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/attendance/assign-batch/{newcomer.id}/{self.batch.id}/")
+        self.mark([newcomer])
+        self.assertEqual(self.statuses()[newcomer.id], "present")
+        self.assertEqual(len(self.client.get(self.url).data["users"]), 6)
+
+    def test_bulk_assign(self):
+        business = BusinessInfo.objects.create(user=self.owner, business_address="Pune", business_phone="1")
+        newcomers = [self.create_user(f"new{i}") for i in range(3)]
+        outsider = self.create_user("outsider")
+        for user in self.students[:2] + newcomers:
+            BusinessMembership.objects.create(business=business, user=user)
+        url = f"/api/attendance/assign-batch/bulk/{self.batch.id}/"
+        self.client.get(self.url)  # Warm the roster
+
+        user_ids = [str(user.id) for user in newcomers + [outsider]] + ["not-a-uuid"]
+        with CaptureQueriesContext(connection) as context, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {"user_ids": user_ids}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data["assigned_users"], user_ids[:3])
+        self.assertIn("error", response.data["results"][3])
+        self.assertEqual(response.data["results"][4]["error"], "Invalid user id")
+        self.assertEqual(sum(query["sql"].startswith("UPDATE") for query in context.captured_queries), 1)
+        self.assertEqual(len(self.client.get(self.url).data["users"]), 8)
+
+        other = Batch.objects.create(name="Evening", created_by=self.owner)
+        response = self.client.post(f"/api/attendance/assign-batch/bulk/{other.id}/", {"members": "all"}, format="json")
+        self.assertEqual(len(response.data["assigned_users"]), 5)
+        self.assertEqual(User.objects.filter(batch_policy=other).count(), 5)
+        response = self.client.post(url, {"members": "unassigned"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_correction(self):
+        self.mark(self.students[:2])
+        outsider = self.create_user("outsider")
+        response = self.client.patch(self.url, {"date": "2024-01-01", "updates": [
+            {"user_id": str(self.students[0].id), "status": "leave"},
+            {"user_id": str(self.students[3].id), "status": "present"},
+            {"user_id": str(outsider.id), "status": "present"},
+            {"user_id": "not-a-uuid", "status": "present"},
+            {"user_id": str(self.students[4].id), "status": "late"},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([result["updated"] for result in response.data["results"]], [True, True, False, False, False])
+        self.assertEqual(len(response.data["updated_users"]), 2)
+        self.assertEqual(self.statuses()[self.students[0].id], "leave")
+        self.assertEqual(self.statuses()[self.students[3].id], "present")
+        self.assertEqual(self.statuses()[self.students[4].id], "absent")
+
+    def test_summary_report(self):
+        self.mark(self.students[:3])
+        self.mark(self.students[:1], day="2024-01-02")
+        self.client.patch(self.url, {"date": "2024-01-01", "updates": [
+            {"user_id": str(self.students[2].id), "status": "leave"},
+        ]}, format="json")
+
+        report = self.client.get("/api/attendance/attendance-report/?group_by=day").data["results"]
+        self.assertEqual(
+            [(row["date"], row["present"], row["absent"], row["leave"], row["total"]) for row in report],
+            [("2024-01-01", 2, 2, 1, 5), ("2024-01-02", 1, 4, 0, 5)],
+        )
+
+        report = self.client.get("/api/attendance/attendance-report/?group_by=user").data["results"]
+        first = next(row for row in report if row["user_id"] == self.students[0].id)
+        self.assertEqual((first["present"], first["total"]), (2, 2))
+
+        month = self.client.get("/api/attendance/attendance-report/?group_by=month").data["results"]
+        self.assertEqual((month[0]["month"], month[0]["total"]), ("2024-01", 10))
+
+        url = "/api/attendance/attendance-report/?group_by=user&start_date=2024-01-01&end_date={}"
+        self.assertEqual(len(self.client.get(url.format("2024-01-31")).data["results"]), 5)
+        response = self.client.get(url.format("2024-01-01"))
+        self.assertEqual(response.status_code, 400)
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get("/api/attendance/attendance-report/?group_by=batch")
+        self.assertEqual(len(context.captured_queries), 1)
+
+        incremental = self.summary_rows()
+        rebuild_summaries()
+        self.assertEqual(self.summary_rows(), incremental)
+
+    def summary_rows(self):
+        return (
+            set(AttendanceMonthlySummary.objects.exclude(count=0).values_list("user_id", "month", "status", "count")),
+            set(AttendanceDailySummary.objects.exclude(count=0).values_list("date", "status", "count")),
+        )
+
+    def test_streaming_export(self):
+        User.objects.filter(pk=self.students[0].pk).update(first_name="Asha", last_name="Rao")
+        self.mark(self.students[:2])
+        url = "/api/attendance/attendance-report/"
+
+        response = self.client.get(url, {"export": "csv"})
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "user_id,user_name,batch_id,batch_name,date,status")
+        self.assertEqual(len(lines), 6)
+
+        response = self.client.get(url, {"export": "ndjson", "status": "present"})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row["status"] for row in rows], ["present", "present"])
+        self.assertEqual({row["user_name"] for row in rows}, {"Asha Rao", self.students[1].username})
+
+        self.assertEqual(self.client.get(url, {"export": "xml"}).status_code, 400)
+
+    def test_compact_history(self):
+        student = self.students[0]
+        self.mark([student], day="2024-01-01")
+        self.mark([student], day="2024-01-02")
+        self.mark([], day="2024-01-03")
+        self.mark([student], day="2024-01-04")
+        self.mark([student], day="2024-01-06")  # Saturday, holiday
+        self.mark([student], day="2024-02-01")
+        self.client.patch(self.url, {"date": "2024-01-03", "updates": [
+            {"user_id": str(student.id), "status": "leave"},
+        ]}, format="json")
+
+        url = f"/api/attendance/attendance/user/{student.id}/"
+        data = self.client.get(url, {"mode": "compact"}).data
+        self.assertEqual([month["days"][:6] for month in data["months"]], ["PPLP-H", "P-----"])
+        summary = data["summary"]
+        self.assertEqual((summary["present"], summary["leave"], summary["holiday"]), (4, 1, 1))
+        self.assertEqual((summary["current_streak"], summary["longest_streak"], summary["percent_present"]), (2, 2, 80.0))
+
+        summary = self.client.get(url, {"mode": "compact", "start_date": "2024-01-02", "end_date": "2024-01-31"}).data["summary"]
+        self.assertEqual((summary["present"], summary["leave"]), (2, 1))
+
+        packed = list(AttendanceBitmap.objects.values_list("user_id", "month", "bits", "holidays"))
+        rebuild_bitmaps()
+        self.assertEqual(sorted(AttendanceBitmap.objects.values_list("user_id", "month", "bits", "holidays")), sorted(packed))
+
+    def test_analytics_cached_until_attendance_changes(self):
+        url = "/api/attendance/attendance-analytics/?start_date=2024-01-01&end_date=2024-01-14"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mark(self.students[:4])
+            self.mark(self.students[:2], day="2024-01-02")
+
+        data = self.client.get(url).data
+        self.assertEqual(len(data["days"]), 14)
+        first, second = data["days"][:2]
+        self.assertEqual((first["present"], first["absent"], first["present_rate"]), (4, 1, 80.0))
+        self.assertEqual((second["present_rate"], second["rolling_present_rate"]), (40.0, 60.0))
+        self.assertEqual([week["week_start"] for week in data["weeks"]], ["2024-01-01"])
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        self.assertEqual(len(context.captured_queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mark(self.students, day="2024-01-02")
+        batch_url = f"{url}&batch_id={self.batch.id}"
+        for data in (self.client.get(url).data, self.client.get(batch_url).data):
+            self.assertEqual(data["days"][1]["present"], 5)
+
+
+class AttendanceQueryPlanTests(APITestCase):
+    """
+    The attendance endpoints must read `attendance_attendance` through an index.
+
+    Every query an endpoint runs against the table is captured and re-run with
+    EXPLAIN on a seeded dataset (ANALYZEd, so the planner has statistics).
+    """
+    BATCHES = 40
+    STUDENTS = 25
+    DAYS = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        owners = User.objects.bulk_create([
+            User(username=f"owner{i}", email=f"owner{i}@example.com", mobile_number=f"1{i:04}", user_type="business")
+            for i in range(cls.BATCHES)
+        ])
+        students = User.objects.bulk_create([
+            User(username=f"student{i}", email=f"student{i}@example.com", mobile_number=f"2{i:04}", user_type="personal")
+            for i in range(cls.BATCHES * cls.STUDENTS)
+        ])
+        batches = Batch.objects.bulk_create([Batch(name=f"Batch {i}", created_by=owner) for i, owner in enumerate(owners)])
+
+        today = date.today()
+        Attendance.objects.bulk_create([
+            Attendance(
+                batch=batch, user=students[b * cls.STUDENTS + s], date=today - timedelta(days=d),
+                status=["present", "present", "present", "absent", "leave"][(s + d) % 5], created_by=batch.created_by,
+            )
+            for b, batch in enumerate(batches) for s in range(cls.STUDENTS) for d in range(cls.DAYS)
+        ], batch_size=1000)
+
+        cls.owner, cls.batch, cls.student = owners[0], batches[0], students[0]
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def explain(self, sql):
+        prefix = "EXPLAIN QUERY PLAN" if connection.vendor == "sqlite" else "EXPLAIN"
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}")
+            return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+
+    def index_name(self, *fields):
+        return next(index.name for index in Attendance._meta.indexes if tuple(index.fields) == fields)
+
+    def assertUsesIndex(self, url, *indexes):
+        """Every attendance query of `url` avoids a full scan and uses one of `indexes`."""
+        self.client.force_authenticate(self.owner)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+            if getattr(response, "streaming", False):
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, getattr(response, "content", b""))
+
+        queries = [query["sql"] for query in context.captured_queries if 'FROM "attendance_attendance"' in query["sql"]]
+        self.assertTrue(queries, f"{url} did not query attendance")
+        for sql in queries:
+            plan = self.explain(sql)
+            message = f"{url}\n{sql}\n{plan}"
+            if connection.vendor == "sqlite":
+                self.assertNotRegex(plan, r"SCAN attendance_attendance(?! USING)", message)
+            else:
+                self.assertNotIn("Seq Scan on attendance_attendance", plan, message)
+            self.assertTrue(any(index in plan for index in indexes), message)
+
+    def test_attendance_logs(self):
+        self.assertUsesIndex(
+            f"/api/attendance/batch/{self.batch.id}/attendance/logs/", self.index_name("batch", "created_by", "-date"),
+        )
+
+    def test_report(self):
+        self.assertUsesIndex("/api/attendance/attendance-report/", self.index_name("created_by", "-created_at"))
+
+    def test_report_absences(self):
+        today = date.today()
+        indexes = ["attendance_absences_idx"]
+        if connection.vendor != "postgresql":
+            # Only Postgres proves that status = 'absent' satisfies the partial index's condition
+            indexes.append(self.index_name("created_by", "-created_at"))
+        self.assertUsesIndex(
+            f"/api/attendance/attendance-report/?status=absent"
+            f"&start_date={today - timedelta(days=3)}&end_date={today}",
+            *indexes,
+        )
+
+    def test_report_export(self):
+        self.assertUsesIndex("/api/attendance/attendance-report/?export=ndjson", self.index_name("created_by", "-created_at"))
+
+    def test_user_attendance(self):
+        self.assertUsesIndex(f"/api/attendance/attendance/user/{self.student.id}/", self.index_name("user", "-date"))
@@ -6,7 +6,9 @@ from .views import (
     MasterPolicyAPIView, MasterPolicyDetailAPIView, 
     BatchAttendanceAPIView, AssignBatchAPIView,
     BatchWiseMembersAPIView, AttendanceReportAPIView,
-    UserAttendanceAPIView, AttendanceLogsAPIView
+    UserAttendanceAPIView, AttendanceLogsAPIView,
+    AttendanceAnalyticsAPIView, BatchHolidayFillAPIView,
+    BulkAssignBatchAPIView,
 )
 
 urlpatterns = [
@@ -24,9 +26,12 @@ urlpatterns = [
     path('master-policies/<pk>/', MasterPolicyDetailAPIView.as_view(), name='master-policy-detail'),
     #path('attendance/<pk>/', AttendanceDetailAPIView.as_view(), name='attendance-detail'),
     path('batch/<batch_id>/attendance/', BatchAttendanceAPIView.as_view(), name='batch-attendance'),
+    path('batch/<batch_id>/attendance/fill-holidays/', BatchHolidayFillAPIView.as_view(), name='batch-fill-holidays'),
+    path("assign-batch/bulk/<batch_id>/", BulkAssignBatchAPIView.as_view(), name="bulk_assign_batch"),
     path("assign-batch/<user_id>/<batch_id>/", AssignBatchAPIView.as_view(), name="assign_batch"),
     path('batch-members/<batch_id>/', BatchWiseMembersAPIView.as_view(), name='batch-wise-members'),
     path('attendance-report/', AttendanceReportAPIView.as_view(), name='attendance-report'),
+    path('attendance-analytics/', AttendanceAnalyticsAPIView.as_view(), name='attendance-analytics'),
     path('attendance/user/<user_id>/', UserAttendanceAPIView.as_view(), name='user-attendance'),
     path('batch/<batch_id>/attendance/logs/', AttendanceLogsAPIView.as_view(), name='attendance-logs'), # last 2 
 
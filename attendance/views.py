@@ -3,10 +3,11 @@ from rest_framework.response import Response
 from rest_framework import status, permissions
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
+from django.core.exceptions import ValidationError
 
 from core import serializers
 
-from .models import WeeklyPlan, SubTask, Batch, MasterPolicy, Attendance
+from .models import WeeklyPlan, SubTask, Batch, MasterPolicy, Attendance, AttendanceBitmap
 from .serializers import (
     WeeklyPlanSerializer, SubTaskSerializer, BatchSerializer,
     MasterPolicySerializer, AttendanceSerializer
@@ -15,6 +16,13 @@ from account.models import User
 from core.models import BusinessMembership
 from datetime import datetime, date, timedelta
 from core.serializers import UserFullDataSerializer
+from .services import assign_batch, correct_attendance, fill_holidays, upsert_attendance
+from .summaries import REPORT_GROUPS, summary_report
+from .exports import EXPORT_FORMATS, export_response
+from .bitmaps import day_string, history_summary
+from .analytics import MAX_RANGE_DAYS, get_analytics
+from .schedule import get_schedule, invalidate_schedule, is_class_day
+from .roster import get_roster, invalidate_roster
 
 
 
@@ -142,6 +150,7 @@ class WeeklyPlanDetailAPIView(APIView):
             serializer = WeeklyPlanSerializer(plan, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
+                invalidate_schedule(plan.batches.values_list("id", flat=True))  # Class days may have changed
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except WeeklyPlan.DoesNotExist:
@@ -150,7 +159,9 @@ class WeeklyPlanDetailAPIView(APIView):
     def delete(self, request, pk):
         try:
             plan = WeeklyPlan.objects.get(id=pk, created_by=request.user)
+            batch_ids = list(plan.batches.values_list("id", flat=True))  # Deleted along with the plan
             plan.delete()
+            invalidate_schedule(batch_ids)
             return Response({"message": "Deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
         except WeeklyPlan.DoesNotExist:
             return Response({"error": "Plan not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -206,6 +217,7 @@ class BatchDetailAPIView(APIView):
             serializer = BatchSerializer(batch, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
+                invalidate_schedule([batch.id])  # The WeeklyPlan may have changed
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except Batch.DoesNotExist:
@@ -301,16 +313,13 @@ class BatchAttendanceAPIView(APIView):
         Only the batch creator (business user) can view the users.
 
         GET /batch/{batch_id}/attendance/
-        Returns a list of all users in the batch.
-        The frontend will display a list with checkboxes for selection.
+        Returns a list of all users in the batch (`User.batch_policy`), from
+        the cached roster. The frontend will display a list with checkboxes for selection.
         """
         try:
             batch = Batch.objects.get(id=batch_id, created_by=request.user)  # Ensure only creator can access
 
-            # Assuming users are linked to the batch via the WeeklyPlan
-            users_in_batch = User.objects.filter(batches=batch)
-
-            user_list = [{"id": user.id, "name": user.get_full_name()} for user in users_in_batch]
+            user_list = [{"id": user_id, "name": name} for user_id, name in get_roster(batch)]
 
             return Response({"batch_id": batch.id, "batch_name": batch.name, "users": user_list}, status=status.HTTP_200_OK)
 
@@ -318,7 +327,13 @@ class BatchAttendanceAPIView(APIView):
             return Response({"error": "Batch not found or unauthorized access"}, status=status.HTTP_404_NOT_FOUND)
 
     def post(self, request, batch_id):
-        """Mark attendance for selected users in a batch, with weekend handling."""
+        """
+        Mark attendance for selected users in a batch.
+
+        On a non-class day of the batch's WeeklyPlan (Saturday and Sunday
+        without a plan) every user is marked "holiday"; they are still listed
+        under `weekend_users`.
+        """
         # try:
         #     batch = Batch.objects.get(id=batch_id, created_by=request.user)  # Only batch creator can mark
         #     data = request.data
@@ -391,7 +406,7 @@ class BatchAttendanceAPIView(APIView):
             data = request.data
             # Support both JSON and form-data (multi-value)
             present_user_ids = set(data.get("present_user_ids", []))  # for form-data with multiple fields
-            if not present_user_ids:
+            if not present_user_ids and hasattr(data, "getlist"):  # JSON bodies are plain dicts
                 present_user_ids = set(data.getlist("present_user_ids"))
 
             date_str = data.get("date")
@@ -403,52 +418,29 @@ class BatchAttendanceAPIView(APIView):
             except ValueError:
                 return Response({"error": "Invalid date format. Use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
 
-            day_of_week = date.strftime("%A").lower()
-
-            # Get all users in the batch
-            users_in_batch = User.objects.filter(batch_policy=batch)
-            all_user_ids = set([str(i) for i in users_in_batch.values_list("id", flat=True)])
+            # Get all users in the batch (cached roster)
+            batch_user_ids = [user_id for user_id, _ in get_roster(batch)]
+            all_user_ids = set([str(i) for i in batch_user_ids])
 
             absent_user_ids = all_user_ids - present_user_ids
             weekend_user_ids = set()
 
-            attendance_entries = []
-            already_marked = []
-
-            # Check for weekend
-            is_weekend = day_of_week in ["saturday", "sunday"]
-            if is_weekend:
+            # No class that day as per the batch's WeeklyPlan
+            is_holiday = not is_class_day(get_schedule(batch), date)
+            if is_holiday:
                 weekend_user_ids = all_user_ids
 
-            for user in users_in_batch:
-                if is_weekend:
-                    status_value = "holiday"
-                elif str(user.id) in present_user_ids:
-                    status_value = "present"
+            statuses = {}
+            for user_id in batch_user_ids:
+                if is_holiday:
+                    statuses[user_id] = "holiday"
+                elif str(user_id) in present_user_ids:
+                    statuses[user_id] = "present"
                 else:
-                    status_value = "absent"
-
-                # Check if attendance already exists — if yes, update it (partial update)
-                attendance_obj, created = Attendance.objects.get_or_create(
-                    batch=batch,
-                    user=user,
-                    date=date,
-                    defaults={
-                        "status": status_value,
-                        "created_by": request.user,
-                    }
-                )
-
-                if not created:
-                    attendance_obj.status = status_value
-                    attendance_obj.save()
-                    already_marked.append(user.id)
+                    statuses[user_id] = "absent"
 
-                else:
-                    attendance_entries.append(attendance_obj)
-
-            # Save only newly created (optional if using get_or_create)
-            # Attendance.objects.bulk_create(attendance_entries)
+            # One INSERT ... ON CONFLICT for the whole batch; existing rows get the new status
+            already_marked = upsert_attendance(batch, date, statuses, request.user)
 
             return Response({
                 "message": "Attendance marked successfully",
@@ -463,6 +455,14 @@ class BatchAttendanceAPIView(APIView):
             
         
     def patch(self, request, batch_id):
+        """
+        Correct the statuses of a day's register in one go.
+
+        Body: {"date": "YYYY-MM-DD", "updates": [{"user_id": ..., "status": ...}, ...]}
+        All entries are validated together; valid ones are saved in one
+        transaction even if others fail. Every entry gets a result with
+        `updated` and, on failure, an `error`.
+        """
         try:
             batch = Batch.objects.get(id=batch_id, created_by=request.user)  # Only batch creator can update
             data = request.data
@@ -472,39 +472,69 @@ class BatchAttendanceAPIView(APIView):
             if not date_str or not updates:
                 return Response({"error": "Date and updates are required"}, status=status.HTTP_400_BAD_REQUEST)
 
+            if not isinstance(updates, list) or not all(isinstance(entry, dict) for entry in updates):
+                return Response({"error": "Updates must be a list of {user_id, status} objects"}, status=status.HTTP_400_BAD_REQUEST)
+
             # Convert date string to datetime object
-            date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+            try:
+                date = datetime.strptime(date_str, "%Y-%m-%d").date()
+            except ValueError:
+                return Response({"error": "Invalid date format. Use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
 
-            updated_entries = []
+            results = correct_attendance(batch, date, updates)
+            updated_entries = [
+                {"user_id": result["user_id"], "status": result["status"]} for result in results if result["updated"]
+            ]
 
-            for entry in updates:
-                user_id = entry.get("user_id")
-                new_status = entry.get("status")
+            if not updated_entries:
+                return Response({"error": "No attendance was updated", "results": results},
+                                status=status.HTTP_400_BAD_REQUEST)
 
-                try:
-                    user = User.objects.get(id=user_id)
+            return Response({"message": "Attendance updated successfully", "updated_users": updated_entries,
+                             "results": results}, status=status.HTTP_200_OK)
 
-                    # Ensure user belongs to this batch
-                    if user.batch_policy != batch:
-                        return Response({"error": f"User {user_id} is not part of Batch {batch_id}"},
-                                        status=status.HTTP_400_BAD_REQUEST)
+        except Batch.DoesNotExist:
+            return Response({"error": "Batch not found or unauthorized access"}, status=status.HTTP_404_NOT_FOUND)
+        
 
-                    # Update attendance
-                    attendance = Attendance.objects.get(batch=batch, user=user, date=date)
-                    attendance.status = new_status
-                    attendance.save()
 
-                    updated_entries.append({"user_id": user_id, "status": new_status})
+class BatchHolidayFillAPIView(APIView):
+    """
+    Mark the non-class days of a batch as holidays.
 
-                except (User.DoesNotExist, Attendance.DoesNotExist):
-                    return Response({"error": f"User {user_id} or attendance not found"}, status=status.HTTP_400_BAD_REQUEST)
+    - `POST /batch/{batch_id}/attendance/fill-holidays/`
+    - Body: {"start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD"}, at most 366 days.
 
-            return Response({"message": "Attendance updated successfully", "updated_users": updated_entries},
-                            status=status.HTTP_200_OK)
+    Every member gets "holiday" on each day the batch's WeeklyPlan has no
+    class; attendance already marked is left as it is.
+    """
 
-        except Batch.DoesNotExist:
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, batch_id):
+        try:
+            batch = Batch.objects.get(id=batch_id, created_by=request.user)
+        except (Batch.DoesNotExist, ValidationError):
             return Response({"error": "Batch not found or unauthorized access"}, status=status.HTTP_404_NOT_FOUND)
-        
+
+        start_date, end_date = request.data.get("start_date"), request.data.get("end_date")
+        if not start_date or not end_date:
+            return Response({"error": "start_date and end_date are required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+        except ValueError:
+            return Response({"error": "Invalid date format. Use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start_date > end_date or (end_date - start_date).days >= MAX_RANGE_DAYS:
+            return Response({"error": f"Date range must be between 1 and {MAX_RANGE_DAYS} days."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        days = fill_holidays(batch, start_date, end_date, request.user)
+        return Response({
+            "message": "Holidays marked successfully",
+            "holidays": [day.strftime("%Y-%m-%d") for day in days],
+        }, status=status.HTTP_201_CREATED)
 
 
 class AttendanceLogsAPIView(APIView):
@@ -532,7 +562,7 @@ class AttendanceLogsAPIView(APIView):
                 batch=batch,
                 created_by=request.user,
                 date__gte=two_days_ago
-            ).order_by("-date")  
+            ).select_related("user").order_by("-date")  
 
             log_list = [
                 {
@@ -561,6 +591,9 @@ class UserAttendanceAPIView(APIView):
     
     - `GET /attendance/user/{user_id}/`  
     - Returns all attendance records of the user.
+    - `?mode=compact`: history from the monthly bitmaps, one day string per
+      batch and month plus totals, % present and streaks. Optional
+      `start_date`/`end_date` (YYYY-MM-DD) limit the range.
     """
     permission_classes = [IsAuthenticated]
 
@@ -571,6 +604,9 @@ class UserAttendanceAPIView(APIView):
         """
         try:
             user = User.objects.get(id=user_id)
+
+            if request.GET.get("mode") == "compact":
+                return self.get_compact(request, user)
             
             # Fetch attendance sorted by latest date first
             attendance_records = Attendance.objects.filter(user=user).order_by('-date')
@@ -591,6 +627,36 @@ class UserAttendanceAPIView(APIView):
 
         except User.DoesNotExist:
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    def get_compact(self, request, user):
+        """
+        Day strings use one character per day: P(resent), A(bsent), L(eave),
+        H(oliday) or - (not marked).
+        """
+        try:
+            start_date = request.GET.get("start_date")
+            end_date = request.GET.get("end_date")
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else None
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else None
+        except ValueError:
+            return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+        bitmaps = AttendanceBitmap.objects.filter(user=user).order_by("month")
+        if start_date:
+            bitmaps = bitmaps.filter(month__gte=start_date.replace(day=1))
+        if end_date:
+            bitmaps = bitmaps.filter(month__lte=end_date)
+        bitmaps = list(bitmaps)
+
+        return Response({
+            "user": user.get_full_name(),
+            "mode": "compact",
+            "months": [
+                {"batch_id": bitmap.batch_id, "month": bitmap.month.strftime("%Y-%m"), "days": day_string(bitmap)}
+                for bitmap in bitmaps
+            ],
+            "summary": history_summary(bitmaps, start_date, end_date),
+        }, status=status.HTTP_200_OK)
         
 
 class AssignBatchAPIView(APIView):
@@ -635,8 +701,10 @@ class AssignBatchAPIView(APIView):
         #     )
 
         # Assign batch to the user
+        previous_batch_id = user.batch_policy_id
         user.batch_policy = batch
         user.save()
+        invalidate_roster([previous_batch_id, batch.id])
 
         return Response(
             {"message": f"Batch '{batch.name}' assigned to {user.get_full_name()}"},
@@ -645,6 +713,50 @@ class AssignBatchAPIView(APIView):
     
 
 
+class BulkAssignBatchAPIView(APIView):
+    """
+    Assign many business members to a batch at once.
+
+    - `POST /assign-batch/bulk/{batch_id}/`
+    - Body: {"user_ids": [...]} or {"members": "all" | "unassigned"} for the
+      members of your business (those without a batch for "unassigned").
+
+    Only the batch creator can assign, and only members of their business. Every
+    user gets a result with `assigned` and, on failure, an `error`.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, batch_id):
+        try:
+            batch = Batch.objects.get(id=batch_id, created_by=request.user)
+        except (Batch.DoesNotExist, ValidationError):
+            return Response({"error": "Batch not found or unauthorized access"}, status=status.HTTP_404_NOT_FOUND)
+
+        user_ids = request.data.get("user_ids")
+        members = request.data.get("members")
+        if user_ids is not None:
+            if not isinstance(user_ids, list) or not user_ids:
+                return Response({"error": "user_ids must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+            results = assign_batch(batch, user_ids=user_ids)
+        elif members in ("all", "unassigned"):
+            results = assign_batch(batch, unassigned_only=members == "unassigned")
+        else:
+            return Response({"error": "Provide user_ids or members ('all' or 'unassigned')"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        assigned = [result["user_id"] for result in results if result["assigned"]]
+        if not assigned:
+            return Response({"error": "No user was assigned", "results": results}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "message": f"{len(assigned)} user(s) assigned to batch '{batch.name}'",
+            "assigned_users": assigned,
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
+
+
 class BatchWiseMembersAPIView(APIView):
     """
     API to list all members assigned to a specific batch.
@@ -711,6 +823,9 @@ class AttendanceReportAPIView(APIView):
         - `batch_id`: Get attendance for a specific batch.
         - `start_date` & `end_date`: Filter attendance within a date range.
         - `status`: Get attendance for a specific status (Present, Absent, etc.).
+    - `group_by=user|batch|day|month`: counts per status for each group, read
+      from the pre-aggregated summaries (see `attendance.summaries`).
+    - `export=csv|ndjson`: the filtered records streamed as a file download.
     """
 
     permission_classes = [permissions.IsAuthenticated]
@@ -725,19 +840,33 @@ class AttendanceReportAPIView(APIView):
         - `start_date` (optional): Start date for filtering (YYYY-MM-DD).
         - `end_date` (optional): End date for filtering (YYYY-MM-DD).
         - `status` (optional): Filter by attendance status (present, absent, leave, holiday).
+        - `group_by` (optional): `user`, `batch`, `day` or `month` for aggregated counts.
+          `user`/`month` (and any `user_id` report) need a range of whole months.
+        - `export` (optional): `csv` or `ndjson` to stream the records instead of JSON.
 
         Returns:
-        - 200 OK: List of filtered attendance records.
-        - 400 Bad Request: If date format is incorrect.
+        - 200 OK: List of filtered attendance records, or {"group_by", "results"}
+          with `present`/`absent`/`leave`/`holiday`/`total` per group.
+        - 400 Bad Request: If date format or group_by is incorrect, or a
+          monthly report's range does not cover whole months.
         """
         user_id = request.GET.get("user_id")
         batch_id = request.GET.get("batch_id")
         start_date = request.GET.get("start_date")
         end_date = request.GET.get("end_date")
         status_filter = request.GET.get("status")
+        group_by = request.GET.get("group_by")
+        export_format = request.GET.get("export")
+
+        if group_by:
+            return self.get_summary(request, group_by, user_id, batch_id, start_date, end_date, status_filter)
 
         # Base queryset
-        attendance_records = Attendance.objects.filter(created_by=request.user).order_by('-created_at')
+        attendance_records = (
+            Attendance.objects.filter(created_by=request.user)
+            .select_related("user", "batch")
+            .order_by('-created_at')
+        )
 
         # Apply filters if provided
         if user_id:
@@ -754,6 +883,12 @@ class AttendanceReportAPIView(APIView):
             except ValueError:
                 return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
 
+        if export_format:
+            if export_format not in EXPORT_FORMATS:
+                return Response({"error": f"Invalid export. Use one of {', '.join(EXPORT_FORMATS)}."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            return export_response(attendance_records, export_format)
+
         # Serialize attendance records
         report_data = [
             {
@@ -767,4 +902,76 @@ class AttendanceReportAPIView(APIView):
             for record in attendance_records
         ]
 
-        return Response({"attendance_records": report_data}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({"attendance_records": report_data}, status=status.HTTP_200_OK)
+
+    def get_summary(self, request, group_by, user_id, batch_id, start_date, end_date, status_filter):
+        """Aggregated report from the summary tables."""
+        if group_by not in REPORT_GROUPS:
+            return Response({"error": f"Invalid group_by. Use one of {', '.join(REPORT_GROUPS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if group_by == "day" and user_id:
+            return Response({"error": "group_by=day cannot be filtered by user_id."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if start_date and end_date:
+            try:
+                start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+                end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+            except ValueError:
+                return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            start_date = end_date = None
+
+        try:
+            results = summary_report(
+                request.user, group_by, batch_id=batch_id, user_id=user_id,
+                start_date=start_date, end_date=end_date, status=status_filter,
+            )
+        except ValidationError:
+            return Response({"error": "Invalid batch_id or user_id."}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"group_by": group_by, "results": results}, status=status.HTTP_200_OK)
+
+
+
+class AttendanceAnalyticsAPIView(APIView):
+    """
+    Heatmap and trend data for a batch or for all batches of the business.
+
+    - `GET /attendance-analytics/?batch_id=&start_date=&end_date=`
+    - `batch_id` (optional): one batch of the current user, else all of them.
+    - `start_date` & `end_date` (optional, YYYY-MM-DD): defaults to the last
+      90 days, at most 366 days.
+
+    Returns per-day present/absent/leave/holiday counts with the present rate
+    and a 7-day rolling present rate, plus weekly totals. Served from cache
+    until attendance of the batch changes.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        batch = None
+        batch_id = request.GET.get("batch_id")
+        if batch_id:
+            try:
+                batch = Batch.objects.get(id=batch_id, created_by=request.user)
+            except (Batch.DoesNotExist, ValidationError):
+                return Response({"error": "Batch not found or unauthorized access"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            end_date = request.GET.get("end_date")
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else date.today()
+            start_date = request.GET.get("start_date")
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else end_date - timedelta(days=89)
+        except ValueError:
+            return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start_date > end_date or (end_date - start_date).days >= MAX_RANGE_DAYS:
+            return Response({"error": f"Date range must be between 1 and {MAX_RANGE_DAYS} days."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        data = get_analytics(request.user, start_date, end_date, batch)
+        return Response({"batch_id": batch.id if batch else None, **data}, status=status.HTTP_200_OK)
@@ -0,0 +1,64 @@
+"""
+Helpers shared by the `bench_*` management commands.
+
+Benchmarks seed synthetic rows inside a transaction that is rolled back at
+the end, so they can be pointed at a staging database without leaving data
+behind.
+"""
+import statistics
+import time
+import uuid
+
+from django.contrib.auth.hashers import make_password
+
+
+def measure(func, samples):
+    """Call `func` `samples` times and return latency stats in milliseconds."""
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    return {
+        "samples": samples,
+        "p50": percentile(timings, 50),
+        "p99": percentile(timings, 99),
+        "mean": statistics.mean(timings),
+        "max": timings[-1],
+    }
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def format_stats(label, stats):
+    return (
+        f"{label:<32} p50={stats['p50']:8.2f}ms  p99={stats['p99']:8.2f}ms  "
+        f"mean={stats['mean']:8.2f}ms  max={stats['max']:8.2f}ms  (n={stats['samples']})"
+    )
+
+
+def create_bench_users(count, user_type="personal", batch_size=5000):
+    """Bulk create throwaway users with unique username/email/mobile."""
+    from account.models import User  # Keeps this module importable before django.setup()
+
+    password = make_password(None)  # Unusable password
+    prefix = uuid.uuid4().hex[:8]
+    users = [
+        User(
+            username=f"bench_{prefix}_{i}",
+            email=f"bench_{prefix}_{i}@example.com",
+            mobile_number=f"{prefix[:4]}{i}",
+            user_type=user_type,
+            password=password,
+        )
+        for i in range(count)
+    ]
+    return User.objects.bulk_create(users, batch_size=batch_size)
@@ -0,0 +1,52 @@
+"""
+Versioned cache keys.
+
+A cached value is stored under a key that embeds the current version of every
+scope it depends on (e.g. a batch). Bumping a scope's version makes all of
+its entries unreachable at once; they simply expire, no key scan needed.
+
+`get_connection()` gives features that need Redis data structures (sorted
+sets, lists) the raw client behind the default cache.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django_redis import get_redis_connection
+
+
+def _version_key(scope):
+    return f"cache_version:{scope}"
+
+
+def get_cache_versions(scopes):
+    """Current versions of `scopes`; a scope never set (or evicted) gets a new random one."""
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_cache_version(*scopes):
+    """Invalidate everything cached under `scopes`, once the current transaction commits."""
+    def bump():
+        cache.set_many({_version_key(scope): uuid.uuid4().hex for scope in scopes}, timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def versioned_key(prefix, scopes, *parts):
+    """Cache key for `prefix` + `parts` that changes whenever one of `scopes` is bumped."""
+    versions = ":".join(get_cache_versions(scopes))
+    return ":".join([prefix, versions, *[str(part) for part in parts]])
+
+
+def get_connection():
+    """Redis connection of the default cache, or None when the cache isn't Redis."""
+    try:
+        return get_redis_connection("default")
+    except NotImplementedError:
+        return None
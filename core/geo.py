@@ -0,0 +1,160 @@
+"""
+Geohash grid index for "near me" searches, on any database.
+
+`BusinessInfo.geohash` holds the 12-character geohash of the business
+coordinates, with a plain B-tree index. A radius search covers the circle's
+bounding box with the smallest geohash cells that fit in `MAX_CELLS`, reads
+the candidates' coordinates with one prefix range scan per cell and ranks
+them by haversine distance; only the nearest rows are then loaded in full.
+
+Radius searches return the nearest `limit` rows, so they start small and
+widen until `limit` rows are found or the radius is reached: a wide radius
+around a dense city reads no more than a small one. A search step never
+reads more than `MAX_CANDIDATES` coordinates; a step that would is retried
+with a smaller radius. k-nearest searches are radius searches as wide as the
+earth.
+"""
+import math
+
+from django.db.models import Q
+
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_LENGTH = 12
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+HALF_EARTH_KM = math.pi * EARTH_RADIUS_KM  # No two points are farther apart
+MAX_CELLS = 16  # Prefix scans per search
+START_RADIUS_KM = 2
+MAX_CANDIDATES = 20000  # Coordinates read per search step
+MIN_STEP_KM = 0.01  # Narrowing stops here (that many rows on one spot: take what was read)
+
+
+def encode(latitude, longitude, length=GEOHASH_LENGTH):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < length:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def cell_size(length):
+    """(height, width) in degrees of the cells of a `length` geohash."""
+    lat_bits = 5 * length // 2
+    lng_bits = 5 * length - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def covering_cells(latitude, longitude, radius_km, max_cells=MAX_CELLS):
+    """
+    The longest geohash cells, at most `max_cells` of them, that together cover
+    the bounding box of the circle. Empty when even length 1 needs more cells.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    lat_min, lat_max = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0 - 1e-9)
+    cos_lat = math.cos(math.radians(max(abs(lat_min), abs(lat_max))))
+    dlng = radius_km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 180.0
+    lng_min, lng_max = (-180.0, 180.0 - 1e-9) if dlng >= 180 else (longitude - dlng, longitude + dlng)
+
+    for length in range(GEOHASH_LENGTH, 0, -1):
+        height, width = cell_size(length)
+        rows = range(math.floor((lat_min + 90) / height), math.floor((lat_max + 90) / height) + 1)
+        columns = range(math.floor((lng_min + 180) / width), math.floor((lng_max + 180) / width) + 1)
+        if len(rows) * len(columns) > max_cells:
+            continue
+        return sorted({
+            encode(-90 + (row + 0.5) * height, (-180 + (column + 0.5) * width + 180) % 360 - 180, length)
+            for row in rows for column in columns
+        })
+    return []
+
+
+def next_prefix(cell):
+    """Smallest geohash after every geohash starting with `cell`, or None."""
+    cell = cell.rstrip(BASE32[-1])
+    if not cell:
+        return None
+    return cell[:-1] + BASE32[BASE32.index(cell[-1]) + 1]
+
+
+def cells_filter(cells):
+    """
+    Q matching rows whose geohash starts with one of `cells`, written as
+    `cell <= geohash < next_prefix(cell)` ranges: a plain B-tree range scan on
+    any database (SQLite won't use an index for `LIKE ... ESCAPE`).
+    """
+    condition = Q()
+    for cell in cells:
+        upper = next_prefix(cell)
+        condition |= Q(geohash__gte=cell, geohash__lt=upper) if upper else Q(geohash__gte=cell)
+    return condition
+
+
+def bounding_box_filter(latitude, longitude, radius_km):
+    """Q on latitude/longitude dropping most cell rows outside the circle before they are loaded."""
+    dlat = radius_km / KM_PER_DEGREE
+    condition = Q(latitude__range=(latitude - dlat, latitude + dlat))
+    cos_lat = math.cos(math.radians(min(abs(latitude) + dlat, 90.0)))
+    if cos_lat > 1e-9:
+        dlng = radius_km / (KM_PER_DEGREE * cos_lat)
+        if -180 <= longitude - dlng and longitude + dlng <= 180:  # Doesn't cross the antimeridian
+            condition &= Q(longitude__range=(longitude - dlng, longitude + dlng))
+    return condition
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _candidates(queryset, latitude, longitude, radius_km):
+    """[(distance_km, id)] of the rows within `radius_km`, reading at most MAX_CANDIDATES + 1 coordinates."""
+    cells = covering_cells(latitude, longitude, radius_km)
+    if cells:
+        queryset = queryset.filter(cells_filter(cells))
+    rows = (
+        queryset.filter(bounding_box_filter(latitude, longitude, radius_km))
+        .order_by().values_list("id", "latitude", "longitude")[:MAX_CANDIDATES + 1]
+    )
+    ranked = [(haversine_km(latitude, longitude, row_latitude, row_longitude), pk) for pk, row_latitude, row_longitude in rows]
+    return [pair for pair in ranked if pair[0] <= radius_km], len(rows) > MAX_CANDIDATES
+
+
+def within_radius(queryset, latitude, longitude, radius_km, limit, start_radius_km=START_RADIUS_KM):
+    """
+    [(distance_km, row)] of the `limit` rows of `queryset` nearest to the
+    point within `radius_km`, nearest first. Widens 4x at a time from
+    `start_radius_km`: once a step finds `limit` rows they are the nearest,
+    since everything closer is inside it.
+    """
+    low, search_km = 0.0, min(start_radius_km, radius_km)
+    while True:
+        ranked, truncated = _candidates(queryset, latitude, longitude, search_km)
+        if truncated and search_km - low > MIN_STEP_KM:
+            search_km = (low + search_km) / 2  # Too dense to read whole: narrow down
+            continue
+        if len(ranked) >= limit or search_km >= radius_km:
+            break
+        low, search_km = search_km, min(search_km * 4, radius_km)
+
+    nearest_ids = sorted(ranked)[:limit]
+    rows = queryset.in_bulk([pk for _, pk in nearest_ids])
+    return [(distance, rows[pk]) for distance, pk in nearest_ids if pk in rows]
+
+
+def nearest(queryset, latitude, longitude, k):
+    """The `k` rows of `queryset` nearest to the point, however far, as [(distance_km, row)]."""
+    return within_radius(queryset, latitude, longitude, HALF_EARTH_KM, k)
@@ -0,0 +1,89 @@
+import math
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import geo
+from core.benchmarks import create_bench_users, format_stats, measure
+from core.models import BusinessInfo
+
+
+class Command(BaseCommand):
+    """
+    Benchmark "businesses near me": the geohash index against a plain
+    latitude/longitude bounding box.
+
+    Usage: python manage.py bench_nearby --businesses 1000000
+    Businesses are spread around a few city centres. Data is seeded in a
+    transaction and rolled back unless `--keep` is given.
+    """
+    help = "Compare p50/p99 latency of radius and k-nearest business searches."
+
+    CITIES = [(18.5204, 73.8567), (19.0760, 72.8777), (28.6139, 77.2090), (12.9716, 77.5946), (22.5726, 88.3639)]
+
+    def add_arguments(self, parser):
+        parser.add_argument("--businesses", type=int, default=1_000_000)
+        parser.add_argument("--spread-km", type=float, default=50, help="Std deviation around each city centre.")
+        parser.add_argument("--radius-km", type=float, default=5)
+        parser.add_argument("--k", type=int, default=20)
+        parser.add_argument("--samples", type=int, default=200)
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded data.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options)
+            self.benchmark(options)
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+    def random_point(self, spread_km):
+        latitude, longitude = random.choice(self.CITIES)
+        latitude += random.gauss(0, spread_km) / geo.KM_PER_DEGREE
+        longitude += random.gauss(0, spread_km) / (geo.KM_PER_DEGREE * math.cos(math.radians(latitude)))
+        return latitude, longitude
+
+    def seed(self, options):
+        types = [code for code, _ in BusinessInfo.BUSINESS_TYPE_CHOICES]
+        self.stdout.write(f"Seeding {options['businesses']} businesses ...")
+        remaining = options["businesses"]
+        while remaining:
+            chunk = min(remaining, 10000)
+            businesses = []
+            for user in create_bench_users(chunk, user_type="business"):
+                latitude, longitude = self.random_point(options["spread_km"])
+                businesses.append(BusinessInfo(  # bulk_create skips save(), so set the geohash here
+                    user=user, business_name=f"Bench {user.username}", business_address="-", business_phone="-",
+                    business_type=random.choice(types),
+                    latitude=latitude, longitude=longitude, geohash=geo.encode(latitude, longitude),
+                ))
+            BusinessInfo.objects.bulk_create(businesses)
+            remaining -= chunk
+
+    def benchmark(self, options):
+        radius_km, k, spread_km = options["radius_km"], options["k"], options["spread_km"]
+        businesses = BusinessInfo.objects.only("id", "latitude", "longitude", "geohash")
+
+        def bounding_box():
+            latitude, longitude = self.random_point(spread_km)
+            dlat = radius_km / geo.KM_PER_DEGREE
+            dlng = radius_km / (geo.KM_PER_DEGREE * math.cos(math.radians(latitude)))
+            rows = businesses.filter(
+                latitude__range=(latitude - dlat, latitude + dlat), longitude__range=(longitude - dlng, longitude + dlng),
+            )
+            sorted(rows, key=lambda row: geo.haversine_km(latitude, longitude, row.latitude, row.longitude))[:k]
+
+        def geohash_radius():
+            geo.within_radius(businesses, *self.random_point(spread_km), radius_km, k)
+
+        def geohash_nearest():
+            geo.nearest(businesses, *self.random_point(spread_km), k)
+
+        def geohash_nearest_filtered():
+            geo.nearest(businesses.filter(business_type="music_academy"), *self.random_point(spread_km), k)
+
+        samples = options["samples"]
+        self.stdout.write(format_stats(f"bounding box {radius_km}km", measure(bounding_box, samples)))
+        self.stdout.write(format_stats(f"geohash radius {radius_km}km", measure(geohash_radius, samples)))
+        self.stdout.write(format_stats(f"geohash {k}-nearest", measure(geohash_nearest, samples)))
+        self.stdout.write(format_stats(f"geohash {k}-nearest, one type", measure(geohash_nearest_filtered, samples)))
@@ -0,0 +1,32 @@
+# Trigram index for feed.search (Postgres only)
+
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS "core_businessinfo_name_trgm" '
+        'ON "core_businessinfo" USING gin (UPPER("business_name"::text) gin_trgm_ops)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS "core_businessinfo_name_trgm"')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False  # CREATE INDEX CONCURRENTLY can't run in a transaction
+
+    dependencies = [
+        ('core', '0014_maincategory_subcategory_subsubcategory_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_businessinfo_search_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='businessinfo',
+            index=models.Index(fields=['-created_at', '-id'], name='core_business_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='businessinfo',
+            index=models.Index(fields=['business_type', '-created_at', '-id'], name='core_business_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='businessinfo',
+            index=models.Index(fields=['main_category', '-created_at', '-id'], name='core_business_main_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='businessinfo',
+            index=models.Index(fields=['sub_category', '-created_at', '-id'], name='core_business_sub_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='businessinfo',
+            index=models.Index(fields=['sub_sub_category', '-created_at', '-id'], name='core_business_sub_sub_cat_idx'),
+        ),
+    ]
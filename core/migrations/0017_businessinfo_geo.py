@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_businessinfo_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessinfo',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='businessinfo',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='businessinfo',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='businessinfo',
+            index=models.Index(fields=['business_type', 'geohash'], name='core_business_type_geo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='businessinfo',
+            index=models.Index(fields=['main_category', 'geohash'], name='core_business_main_cat_geo_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 import uuid
 from account.models import User
+from . import geo
 
 # Create your models here.
 
@@ -111,6 +112,30 @@ class BusinessInfo(BaseModel):
     established_year = models.PositiveIntegerField(null=True, blank=True, help_text="Year of establishment")
     number_of_employees = models.PositiveIntegerField(null=True, blank=True)
     business_logo = models.ImageField(upload_to='BusinessInfo/business_logos/', null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, null=True, blank=True, db_index=True, editable=False)  # From latitude/longitude, see core.geo
+
+    class Meta:
+        indexes = [
+            # Business search: newest first, alone or under one facet filter (core.search)
+            models.Index(fields=['-created_at', '-id'], name='core_business_recent_idx'),
+            models.Index(fields=['business_type', '-created_at', '-id'], name='core_business_type_idx'),
+            models.Index(fields=['main_category', '-created_at', '-id'], name='core_business_main_cat_idx'),
+            models.Index(fields=['sub_category', '-created_at', '-id'], name='core_business_sub_cat_idx'),
+            models.Index(fields=['sub_sub_category', '-created_at', '-id'], name='core_business_sub_sub_cat_idx'),
+            # Nearby search under a facet filter (core.geo)
+            models.Index(fields=['business_type', 'geohash'], name='core_business_type_geo_idx'),
+            models.Index(fields=['main_category', 'geohash'], name='core_business_main_cat_geo_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Keep the geohash in step with the coordinates."""
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+        else:
+            self.geohash = None
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f'{self.user.get_full_name()} - {self.business_name}'
@@ -0,0 +1,130 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def use_cursor_pagination(request):
+    """Clients opt in to keyset pagination with `?pagination=cursor` (or by sending a cursor)."""
+    params = request.query_params
+    return params.get("pagination") == "cursor" or "cursor" in params
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (`created_at`, `id`).
+
+    A page is fetched with `WHERE created_at < t OR (created_at = t AND id < id)
+    ... LIMIT n` (the cursor's (t, id)), which an index on (`created_at`, `id`)
+    serves as a range scan: deep pages cost the same as the first page and no
+    `COUNT(*)` is run.
+    Response: {"next": <url or null>, "results": [...]}
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')  # Both fields in the same direction
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_page_size(request)
+        self.next_cursor = None
+
+        cursor = self.decode_cursor(request, queryset.model)
+        queryset = queryset.order_by(*self.ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self.cursor_filter(*cursor))
+
+        results = list(queryset[:self.limit + 1])  # One extra row tells if there is a next page
+        if len(results) > self.limit:
+            results = results[:self.limit]
+            last = results[-1]
+            self.next_cursor = (getattr(last, self.time_field), last.pk)
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    @property
+    def descending(self):
+        return self.ordering[0].startswith('-')
+
+    @property
+    def time_field(self):
+        return self.ordering[0].lstrip('-')
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def cursor_filter(self, created_at, pk):
+        op = 'lt' if self.descending else 'gt'
+        return (
+            Q(**{f"{self.time_field}__{op}": created_at}) |
+            Q(**{self.time_field: created_at, f"pk__{op}": pk})
+        )
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'pagination')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(*self.next_cursor))
+
+    def encode_cursor(self, created_at, pk):
+        raw = json.dumps({"t": created_at.isoformat(), "id": str(pk)})
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            created_at = parse_datetime(data["t"])
+            pk = model._meta.pk.to_python(data["id"])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+
+class CursorOptInMixin:
+    """
+    For generic list views: keep `pagination_class` as the default and switch to
+    `cursor_pagination_class` when the client asks for cursor pagination.
+    """
+    cursor_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if use_cursor_pagination(self.request):
+                self._paginator = self.cursor_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -0,0 +1,82 @@
+"""
+Business search.
+
+`search_businesses()` narrows `BusinessInfo` by a free-text query (business
+name through the trigram index of core 0015, business type against the choice
+labels) and by facet filters. Pages are keyset-paginated on
+(`created_at`, `id`), which the composite indexes of core 0016 serve alone or
+under any one facet. `facet_counts()` returns per-value counts for each facet,
+computed with the other facets applied (so a client can widen a selection).
+"""
+from django.db.models import Count, Q
+
+from .models import BusinessInfo
+
+
+# Query parameter -> (model field, field holding the label, or None for the choice display)
+FACETS = {
+    "business_type": ("business_type", None),
+    "main_category": ("main_category", "main_category__name"),
+    "sub_category": ("sub_category", "sub_category__name"),
+    "sub_sub_category": ("sub_sub_category", "sub_sub_category__name"),
+}
+FACET_LIMIT = 50  # Values returned per facet, most frequent first
+RESULT_FIELDS = [  # Columns of core.serializers.BusinessSearchSerializer, plus the cursor
+    "id", "user", "business_name", "business_type", "main_category", "sub_category",
+    "sub_sub_category", "business_logo", "established_year", "latitude", "longitude", "created_at",
+]
+
+
+def matching_business_types(query):
+    """Choice codes of `BusinessInfo.business_type` whose code or label contains `query`."""
+    query = query.lower()
+    return [
+        code for code, label in BusinessInfo.BUSINESS_TYPE_CHOICES
+        if query in code.lower() or query in label.lower()
+    ]
+
+
+def parse_facets(params):
+    """{facet: [values]} from query params; several values are comma separated."""
+    selected = {}
+    for name in FACETS:
+        values = [value.strip() for value in params.get(name, "").split(",") if value.strip()]
+        if values:
+            selected[name] = values
+    return selected
+
+
+def search_businesses(query="", facets=None, exclude_facet=None):
+    """`BusinessInfo` rows matching `query` and every facet of `facets` but `exclude_facet`."""
+    businesses = BusinessInfo.objects.all()
+    query = query.strip()
+    if query:
+        businesses = businesses.filter(
+            Q(business_name__icontains=query) | Q(business_type__in=matching_business_types(query))
+        )
+    for name, values in (facets or {}).items():
+        if name != exclude_facet:
+            businesses = businesses.filter(**{f"{FACETS[name][0]}__in": values})
+    return businesses
+
+
+def facet_counts(query="", facets=None):
+    """{facet: [{"value", "label", "count"}]} for every facet, one GROUP BY each."""
+    type_labels = dict(BusinessInfo.BUSINESS_TYPE_CHOICES)
+    counts = {}
+    for name, (field, label_field) in FACETS.items():
+        columns = [field] + ([label_field] if label_field else [])
+        rows = (
+            search_businesses(query, facets, exclude_facet=name)
+            .filter(**{f"{field}__isnull": False})
+            .values(*columns).annotate(count=Count("id")).order_by("-count")[:FACET_LIMIT]
+        )
+        counts[name] = [
+            {
+                "value": row[field],
+                "label": row[label_field] if label_field else type_labels.get(row[field], row[field]),
+                "count": row["count"],
+            }
+            for row in rows
+        ]
+    return counts
@@ -71,6 +71,16 @@ class BusinessInfoSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Please enter a valid email address.")
         return value
     
+    def validate_latitude(self, value):
+        if value is not None and not -90 <= value <= 90:
+            raise serializers.ValidationError("Latitude must be between -90 and 90.")
+        return value
+
+    def validate_longitude(self, value):
+        if value is not None and not -180 <= value <= 180:
+            raise serializers.ValidationError("Longitude must be between -180 and 180.")
+        return value
+
     def validate_business_owner(self, value):
         if not value:
             raise serializers.ValidationError("Business owner name is required.")
@@ -101,6 +111,28 @@ class BusinessInfoSerializer(serializers.ModelSerializer):
 
 
 
+class BusinessSearchSerializer(serializers.ModelSerializer):
+    """Search result card: only the columns the list shows (see `BusinessSearchView`)."""
+    business_type_display = serializers.CharField(source='get_business_type_display', read_only=True)
+
+    class Meta:
+        model = BusinessInfo
+        fields = ['id', 'user', 'business_name', 'business_type', 'business_type_display',
+                  'main_category', 'sub_category', 'sub_sub_category', 'business_logo', 'established_year',
+                  'latitude', 'longitude']
+
+
+class BusinessNearbySerializer(BusinessSearchSerializer):
+    """Search result card with the distance from the searched point."""
+    distance_km = serializers.SerializerMethodField()
+
+    class Meta(BusinessSearchSerializer.Meta):
+        fields = BusinessSearchSerializer.Meta.fields + ['distance_km']
+
+    def get_distance_km(self, obj):
+        return round(obj.distance_km, 3)
+
+
 class MembershipRequestSerializer(serializers.ModelSerializer):
     user = serializers.CharField(source='user.get_full_name', read_only=True)
     business = serializers.CharField(source='business.business_name', read_only=True)
@@ -1,3 +1,162 @@
-from django.test import TestCase
+import math
+import random
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from account.models import User
+from . import geo
+from .pagination import KeysetPagination
+from .models import BusinessInfo, MainCategory
+
+
+class BusinessSearchTests(APITestCase):
+    """Business search is paginated, facet-filtered and returns a projection."""
+
+    def setUp(self):
+        self.music = MainCategory.objects.create(name="Music")
+        self.sports = MainCategory.objects.create(name="Sports")
+        for i in range(25):
+            user = User.objects.create(
+                username=f"biz{i}", email=f"biz{i}@example.com", mobile_number=f"+91-{i}", user_type="business",
+            )
+            BusinessInfo.objects.create(
+                user=user, business_name=f"Academy {i}", business_address="Pune", business_phone="1",
+                business_type="music_academy" if i % 5 else "sports_academy",
+                main_category=self.music if i % 5 else self.sports,
+            )
+        self.client.force_authenticate(user)
+        self.url = reverse("business-search")
+
+    def test_pages_and_facets(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(response.data["results"]), 20)
+        self.assertNotIn("business_address", response.data["results"][0])
+        self.assertEqual(len(context.captured_queries), 1 + 4)  # Page, then one GROUP BY per facet
+        types = {row["value"]: row["count"] for row in response.data["facets"]["business_type"]}
+        self.assertEqual(types, {"music_academy": 20, "sports_academy": 5})
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertNotIn("facets", response.data)
+
+    def test_facet_filters(self):
+        response = self.client.get(self.url, {"main_category": str(self.sports.id), "query": "academy"})
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertEqual({row["business_type"] for row in response.data["results"]}, {"sports_academy"})
+        # A facet's own counts ignore its selection, the others apply it
+        main = {row["label"]: row["count"] for row in response.data["facets"]["main_category"]}
+        self.assertEqual(main, {"Music": 20, "Sports": 5})
+        self.assertEqual([row["count"] for row in response.data["facets"]["business_type"]], [5])
+
+        response = self.client.get(self.url, {"main_category": "nope"})
+        self.assertEqual(response.status_code, 400)
+
+
+class BusinessNearbyTests(APITestCase):
+    """Nearby search through the geohash cells matches a brute-force distance sort."""
+
+    CENTRE = (18.5204, 73.8567)
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.points = []
+        for i in range(300):
+            latitude = self.CENTRE[0] + rng.uniform(-0.5, 0.5)
+            longitude = self.CENTRE[1] + rng.uniform(-0.5, 0.5)
+            user = User.objects.create(
+                username=f"geo{i}", email=f"geo{i}@example.com", mobile_number=f"+91-{i}", user_type="business",
+            )
+            BusinessInfo.objects.create(
+                user=user, business_name=f"Place {i}", business_address="Pune", business_phone="1",
+                business_type="dance_academy" if i % 3 else "art_academy", latitude=latitude, longitude=longitude,
+            )
+            self.points.append((f"Place {i}", latitude, longitude, i % 3 != 0))
+        self.client.force_authenticate(user)
+        self.url = reverse("business-nearby")
+
+    def brute_force(self, latitude, longitude, dance_only=False):
+        return sorted(
+            (geo.haversine_km(latitude, longitude, lat, lng), name)
+            for name, lat, lng, is_dance in self.points if is_dance or not dance_only
+        )
+
+    def test_covering_cells(self):
+        rng = random.Random(3)
+        for radius_km in (0.5, 3, 40, 800):
+            cells = geo.covering_cells(*self.CENTRE, radius_km)
+            self.assertLessEqual(len(cells), geo.MAX_CELLS)
+            for _ in range(200):
+                bearing, distance = rng.uniform(0, 2 * math.pi), rng.uniform(0, radius_km)
+                latitude = self.CENTRE[0] + distance * math.cos(bearing) / geo.KM_PER_DEGREE
+                longitude = self.CENTRE[1] + distance * math.sin(bearing) / (
+                    geo.KM_PER_DEGREE * math.cos(math.radians(latitude)))
+                self.assertTrue(geo.encode(latitude, longitude).startswith(tuple(cells)))
+
+    def test_radius(self):
+        response = self.client.get(self.url, {"lat": 18.6, "lng": 73.8, "radius_km": 10, "k": 50})
+        self.assertEqual(response.status_code, 200, response.content)
+        expected = [name for distance, name in self.brute_force(18.6, 73.8) if distance <= 10][:50]
+        self.assertEqual([row["business_name"] for row in response.data["results"]], expected)
+
+    def test_nearest_with_filter(self):
+        response = self.client.get(self.url, {"lat": 18.1, "lng": 73.4, "k": 15, "business_type": "dance_academy"})
+        expected = [name for _, name in self.brute_force(18.1, 73.4, dance_only=True)[:15]]
+        self.assertEqual([row["business_name"] for row in response.data["results"]], expected)
+        distances = [row["distance_km"] for row in response.data["results"]]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_max_radius_reads_bounded_rows(self):
+        with mock.patch.object(geo, "MAX_CANDIDATES", 40), CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {"lat": self.CENTRE[0], "lng": self.CENTRE[1], "radius_km": 500, "k": 10})
+        expected = [name for _, name in self.brute_force(*self.CENTRE)[:10]]
+        self.assertEqual([row["business_name"] for row in response.data["results"]], expected)
+        scans = [query["sql"] for query in context.captured_queries if "LIMIT 41" in query["sql"]]
+        self.assertTrue(scans)
+        self.assertTrue(all('"business_name"' not in sql for sql in scans))  # Coordinates only until the top k
+
+    def test_invalid_point(self):
+        self.assertEqual(self.client.get(self.url, {"lat": 95, "lng": 10}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"lng": 10}).status_code, 400)
+
+
+class KeysetPaginationTests(APITestCase):
+    """Cursor pages cover every row once, in order, even when rows share a created_at."""
+
+    def setUp(self):
+        for i in range(7):
+            user = User.objects.create(
+                username=f"page{i}", email=f"page{i}@example.com", mobile_number=f"+91-{i}", user_type="business",
+            )
+            BusinessInfo.objects.create(user=user, business_name=f"Page {i}", business_address="Pune", business_phone="1")
+        shared = BusinessInfo.objects.order_by("created_at").first().created_at
+        BusinessInfo.objects.filter(business_name__in=["Page 2", "Page 3", "Page 4", "Page 5"]).update(created_at=shared)
+
+    def paginate(self, url):
+        paginator = KeysetPagination()
+        results = paginator.paginate_queryset(BusinessInfo.objects.all(), Request(APIRequestFactory().get(url)))
+        return results, paginator.get_next_link()
+
+    def test_pages_cover_all_rows_in_order(self):
+        seen, url = [], "/business/?page_size=2"
+        while url:
+            results, url = self.paginate(url)
+            seen.extend(business.pk for business in results)
+        expected = list(BusinessInfo.objects.order_by("-created_at", "-id").values_list("pk", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_cursor_round_trip(self):
+        paginator = KeysetPagination()
+        business = BusinessInfo.objects.first()
+        cursor = paginator.encode_cursor(business.created_at, business.pk)
+        request = Request(APIRequestFactory().get("/business/", {"cursor": cursor}))
+        self.assertEqual(paginator.decode_cursor(request, BusinessInfo), (business.created_at, business.pk))
+        with self.assertRaises(NotFound):
+            paginator.decode_cursor(Request(APIRequestFactory().get("/business/", {"cursor": "bogus"})), BusinessInfo)
@@ -13,6 +13,7 @@ urlpatterns = [
     path('categories/<sub_category_id>/subsubcategories/', SubSubCategoryListAPIView.as_view(), name='sub-sub-category-list'),
     path('business-info/<pk>/', BusinessInfoAPIView.as_view(), name='business-info'),
     path('business/search/', BusinessSearchView.as_view(), name='business-search'),
+    path('business/nearby/', BusinessNearbyView.as_view(), name='business-nearby'),
     path('business/<business_id>/', BusinessDetailView.as_view(), name='business-detail'),
 
     # Membership
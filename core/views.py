@@ -4,8 +4,14 @@ from rest_framework.response import Response
 from .models import PersonalInfo, BusinessInfo, Achievement, BusinessMembership, MembershipRequest, MainCategory, SubCategory, SubSubCategory
 from .serializers import *
 from django.db.models import Q
+from django.core.exceptions import ValidationError
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated
+from .pagination import KeysetPagination, use_cursor_pagination
+from . import geo
+from .search import RESULT_FIELDS, facet_counts, parse_facets, search_businesses
+from attendance.roster import invalidate_roster
+from feed.autocomplete import schedule_reindex
 
 
 
@@ -24,6 +30,8 @@ def update_user_fields(user, data):
 
     if updated:
         user.save()
+        invalidate_roster([user.batch_policy_id])  # Roster shows the member's name
+        schedule_reindex(user.pk)  # Autocomplete too
 
 
 # Personal Info APIs using ID
@@ -162,6 +170,7 @@ class BusinessInfoAPIView(APIView):
         serializer = BusinessInfoSerializer(data=mutable_data)
         if serializer.is_valid():
             serializer.save()
+            schedule_reindex(request.user.pk)  # Business name is searchable
             return Response({"message": "Business Info created successfully", "data": serializer.data}, status=201)
         return Response(serializer.errors, status=400)
 
@@ -175,6 +184,7 @@ class BusinessInfoAPIView(APIView):
             serializer = BusinessInfoSerializer(business_info, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
+                schedule_reindex(business_info.user_id)
                 return Response({"message": "Business Info updated successfully", "data": serializer.data}, status=200)
             return Response(serializer.errors, status=400)
         except BusinessInfo.DoesNotExist:
@@ -191,19 +201,88 @@ class BusinessInfoAPIView(APIView):
 
 
 
+class BusinessSearchPagination(KeysetPagination):
+    """Newest businesses first, 20 per page"""
+    page_size = 20
+    max_page_size = 50
+
+
 class BusinessSearchView(APIView):
+    """
+    Paginated business search with facet filters.
+
+    GET /business/search/?query=&business_type=&main_category=&sub_category=&sub_sub_category=&cursor=
+    - `query` (optional): matched against the business name and type.
+    - Facets (optional): comma separated values, e.g. `business_type=music_academy,dance_academy`.
+    Response: {"next", "results", "facets"}; `facets` (value, label and count per
+    facet) comes with the first page only, since it doesn't change between pages.
+    """
+    pagination_class = BusinessSearchPagination
+
     def get(self, request):
         query = request.GET.get("query", "")
+        facets = parse_facets(request.GET)
 
-        if not query:
-            businesses = BusinessInfo.objects.all()
-        else:
-            businesses = BusinessInfo.objects.filter(
-                Q(business_name__icontains=query) | Q(business_type__icontains=query)
-            )
+        paginator = self.pagination_class()
+        try:
+            businesses = search_businesses(query, facets).only(*RESULT_FIELDS)
+            page = paginator.paginate_queryset(businesses, request, view=self)
+            counts = facet_counts(query, facets) if not request.GET.get(paginator.cursor_query_param) else None
+        except ValidationError:
+            return Response({"error": "Invalid facet value."}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = BusinessInfoSerializer(businesses, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        response = paginator.get_paginated_response(BusinessSearchSerializer(page, many=True).data)
+        if counts is not None:
+            response.data["facets"] = counts
+        return response
+
+
+class BusinessNearbyView(APIView):
+    """
+    Businesses near a point, nearest first.
+
+    GET /business/nearby/?lat=&lng=&radius_km=&k=&query=&business_type=&main_category=...
+    - `lat` & `lng` (required): the searched point.
+    - `radius_km` (optional, at most 500): only businesses within that distance.
+      Without it the `k` nearest are returned, however far.
+    - `k` (optional): number of results, default 20, at most 50.
+    - `query` and the facets filter like `/business/search/`.
+    Served from the geohash index, see `core.geo`.
+    """
+    default_k = 20
+    max_k = 50
+    max_radius_km = 500
+
+    def get(self, request):
+        try:
+            latitude = float(request.GET["lat"])
+            longitude = float(request.GET["lng"])
+            k = min(max(int(request.GET.get("k", self.default_k)), 1), self.max_k)
+            radius_km = request.GET.get("radius_km")
+            radius_km = float(radius_km) if radius_km else None
+        except (KeyError, ValueError):
+            return Response({"error": "lat and lng are required; lat, lng, radius_km and k must be numbers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return Response({"error": "lat/lng out of range."}, status=status.HTTP_400_BAD_REQUEST)
+        if radius_km is not None and not 0 < radius_km <= self.max_radius_km:
+            return Response({"error": f"radius_km must be between 0 and {self.max_radius_km}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            businesses = search_businesses(request.GET.get("query", ""), parse_facets(request.GET))
+            businesses = businesses.only(*RESULT_FIELDS)
+            if radius_km is not None:
+                ranked = geo.within_radius(businesses, latitude, longitude, radius_km, k)
+            else:
+                ranked = geo.nearest(businesses, latitude, longitude, k)
+        except ValidationError:
+            return Response({"error": "Invalid facet value."}, status=status.HTTP_400_BAD_REQUEST)
+
+        for distance, business in ranked:
+            business.distance_km = distance
+        serializer = BusinessNearbySerializer([business for _, business in ranked], many=True)
+        return Response({"results": serializer.data}, status=status.HTTP_200_OK)
 
 
 class BusinessDetailView(APIView):
@@ -363,10 +442,17 @@ class AchievementDetailAPIView(APIView):
 ################## Notification ######################
 
 class NotificationAPIView(APIView):
-    """API to get notifications for the logged-in user"""
+    """API to get notifications for the logged-in user (`?pagination=cursor` for keyset pages)"""
 
     def get(self, request):
         notifications = Notification.objects.filter(recipient=request.user, is_read=False).order_by('-created_at')
+
+        if use_cursor_pagination(request):
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(notifications, request, view=self)
+            serializer = NotificationSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
         serializer = NotificationSerializer(notifications, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
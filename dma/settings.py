@@ -116,20 +116,31 @@ TEMPLATES = [
 WSGI_APPLICATION = 'dma.wsgi.application'
 ASGI_APPLICATION = "dma.asgi.application" #me
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
-    },
-}
-
-# CHANNEL_LAYERS = {
-#     "default": {
-#         "BACKEND": "channels_redis.core.RedisChannelLayer",
-#         "CONFIG": {
-#             "hosts": [("127.0.0.1", 6379)],  # Redis must be running prod
-#         },
-#     },
-# }
+# Channel layer for chat WebSockets.
+# Set CHANNEL_REDIS_HOSTS (comma separated redis:// URLs) to share groups across
+# Daphne processes; channels and groups are sharded over the hosts by consistent hashing.
+# Without it the in-memory layer is used, which only works inside a single process.
+CHANNEL_REDIS_HOSTS = [host.strip() for host in os.getenv("CHANNEL_REDIS_HOSTS", "").split(",") if host.strip()]
+
+if CHANNEL_REDIS_HOSTS:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": CHANNEL_REDIS_HOSTS,
+                "prefix": os.getenv("CHANNEL_PREFIX", "dma"),
+                "group_expiry": int(os.getenv("CHANNEL_GROUP_EXPIRY", 86400)),  # Seconds a group membership lives
+                "expiry": int(os.getenv("CHANNEL_MESSAGE_EXPIRY", 60)),  # Seconds an undelivered message lives
+                "capacity": int(os.getenv("CHANNEL_CAPACITY", 100)),  # Queued messages per channel before backpressure
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        },
+    }
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -222,6 +233,18 @@ CACHES = {
     }
 }
 
+# Home feed timelines (fan-out-on-write)
+FEED_FANOUT_THRESHOLD = 10000  # Authors with more followers are merged into timelines on read
+FEED_TIMELINE_PULL_LIMIT = 200  # Max posts of such authors pulled into a timeline at once
+
+# Chat messages: broadcast first, insert in batches per worker (see feed/chat.py)
+CHAT_WRITE_BEHIND = {
+    "ENABLED": os.getenv("CHAT_WRITE_BEHIND", "false").lower() == "true",
+    "BATCH_SIZE": 200,  # Flush as soon as this many messages are queued
+    "FLUSH_INTERVAL": 0.5,  # Seconds between flushes
+    "MAX_QUEUE": 5000,  # Senders wait for a flush beyond this
+}
+
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -0,0 +1,191 @@
+"""
+Search-as-you-type over usernames, full names and business names.
+
+Every prefix (up to `MAX_PREFIX_LENGTH` characters) of a user's terms — the
+username, the full name, the business name and each of their words — is a
+Redis sorted set of user ids scored by `followers_count`, trimmed to the
+`MAX_PER_PREFIX` most followed. A lookup is a `GET` of the served index
+version, one `ZREVRANGE` on the typed prefix and one `HMGET` of the display
+data, with no database access.
+
+Profile, business and follow changes re-index the user after commit
+(`schedule_reindex()`); `python manage.py rebuild_autocomplete` rebuilds the
+whole index. Every key carries an index version: a rebuild fills a new
+version while the current one keeps serving (re-indexing writes to both),
+switches `VERSION_KEY` over and only then deletes the old keys. Without Redis
+(e.g. a local-memory cache) lookups fall back to `feed.search` and
+re-indexing is skipped.
+"""
+import json
+import logging
+
+from django.db import transaction
+from redis.exceptions import RedisError
+
+from account.models import User
+from core.cache import get_connection
+
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "feed:autocomplete:version"  # Index version being served
+BUILDING_KEY = "feed:autocomplete:building"  # Index version being rebuilt, if any
+VERSION_COUNTER_KEY = "feed:autocomplete:versions"
+PREFIX_KEY = "feed:autocomplete:{}:prefix:{}"  # Sorted set of user id -> followers_count
+USERS_KEY = "feed:autocomplete:{}:users"  # Hash of user id -> display data (JSON)
+USER_PREFIXES_KEY = "feed:autocomplete:{}:user_prefixes"  # Hash of user id -> indexed prefixes (JSON)
+VERSION_PATTERN = "feed:autocomplete:{}:*"
+
+MAX_PREFIX_LENGTH = 15
+MAX_PER_PREFIX = 100
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+
+
+def normalize(text):
+    return " ".join((text or "").lower().split())
+
+
+def user_entry(user):
+    """Display data stored for `user` (its `businessinfo` should be loaded)."""
+    business = getattr(user, "businessinfo", None) if user.user_type == "business" else None
+    return {
+        "id": str(user.id),
+        "username": user.username,
+        "full_name": user.get_full_name(),
+        "user_type": user.user_type,
+        "business_name": business.business_name if business else None,
+    }
+
+
+def entry_terms(entry):
+    """Normalized terms an entry is found by: whole names and each of their words."""
+    terms = set()
+    for name in (entry["username"], entry["full_name"], entry["business_name"]):
+        name = normalize(name)
+        if name:
+            terms.add(name)
+            terms.update(name.split())
+    return terms
+
+
+def entry_prefixes(entry):
+    return sorted({
+        term[:length]
+        for term in entry_terms(entry)
+        for length in range(1, min(len(term), MAX_PREFIX_LENGTH) + 1)
+    })
+
+
+def _index(pipe, version, entry, score, old_prefixes=()):
+    prefixes = entry_prefixes(entry)
+    for prefix in set(old_prefixes) - set(prefixes):
+        pipe.zrem(PREFIX_KEY.format(version, prefix), entry["id"])
+    for prefix in prefixes:
+        key = PREFIX_KEY.format(version, prefix)
+        pipe.zadd(key, {entry["id"]: score})
+        pipe.zremrangebyrank(key, 0, -MAX_PER_PREFIX - 1)  # Keep the most followed only
+    pipe.hset(USERS_KEY.format(version), entry["id"], json.dumps(entry))
+    pipe.hset(USER_PREFIXES_KEY.format(version), entry["id"], json.dumps(prefixes))
+
+
+def _served_version(conn):
+    return int(conn.get(VERSION_KEY) or 0)
+
+
+def reindex_user(user_id):
+    """Re-read one user and refresh their prefixes and score, in the served and the rebuilding index."""
+    conn = get_connection()
+    if conn is None:
+        return
+    user = User.objects.select_related("businessinfo").filter(pk=user_id).first()
+    try:
+        served, building = conn.mget(VERSION_KEY, BUILDING_KEY)
+        versions = {int(served or 0)} | ({int(building)} if building else set())
+        pipe = conn.pipeline(transaction=False)
+        for version in versions:
+            old_prefixes = json.loads(conn.hget(USER_PREFIXES_KEY.format(version), str(user_id)) or "[]")
+            if user is None:
+                for prefix in old_prefixes:
+                    pipe.zrem(PREFIX_KEY.format(version, prefix), str(user_id))
+                pipe.hdel(USERS_KEY.format(version), str(user_id))
+                pipe.hdel(USER_PREFIXES_KEY.format(version), str(user_id))
+            else:
+                _index(pipe, version, user_entry(user), user.followers_count, old_prefixes)
+        pipe.execute()
+    except RedisError:
+        logger.exception("Autocomplete re-index failed for user %s", user_id)
+
+
+def schedule_reindex(user_id):
+    """Re-index `user_id` once the current transaction commits."""
+    transaction.on_commit(lambda: reindex_user(user_id))
+
+
+def rebuild_index(chunk_size=2000):
+    """
+    Rebuild the whole index from the database into a new version, then serve
+    it and drop the previous one. Returns the number of users indexed.
+    """
+    conn = get_connection()
+    if conn is None:
+        return 0
+    version = conn.incr(VERSION_COUNTER_KEY)
+    conn.set(BUILDING_KEY, version)
+
+    count = 0
+    users = User.objects.select_related("businessinfo").order_by().iterator(chunk_size=chunk_size)
+    for chunk in _chunks(users, chunk_size):
+        pipe = conn.pipeline(transaction=False)
+        for user in chunk:
+            _index(pipe, version, user_entry(user), user.followers_count)
+        pipe.execute()
+        count += len(chunk)
+
+    previous = _served_version(conn)
+    pipe = conn.pipeline(transaction=True)
+    pipe.set(VERSION_KEY, version)
+    pipe.delete(BUILDING_KEY)
+    pipe.execute()
+
+    for keys in _chunks(conn.scan_iter(match=VERSION_PATTERN.format(previous), count=chunk_size), chunk_size):
+        conn.delete(*keys)
+    return count
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def autocomplete(query, limit=DEFAULT_LIMIT):
+    """
+    Up to `limit` entries whose terms start with `query`, most followed first.
+    Returns None when Redis isn't available.
+    """
+    query = normalize(query)
+    conn = get_connection()
+    if conn is None:
+        return None
+    if not query:
+        return []
+
+    # Longer queries are looked up by their indexed prefix, then filtered
+    fetch = limit if len(query) <= MAX_PREFIX_LENGTH else MAX_PER_PREFIX
+    try:
+        version = _served_version(conn)
+        user_ids = conn.zrevrange(PREFIX_KEY.format(version, query[:MAX_PREFIX_LENGTH]), 0, fetch - 1)
+        rows = conn.hmget(USERS_KEY.format(version), user_ids) if user_ids else []
+    except RedisError:
+        logger.exception("Autocomplete lookup failed")
+        return None
+    entries = [json.loads(data) for data in rows if data]
+    if len(query) > MAX_PREFIX_LENGTH:
+        entries = [entry for entry in entries if any(term.startswith(query) for term in entry_terms(entry))]
+    return entries[:limit]
@@ -0,0 +1,352 @@
+"""
+Chat message persistence and history.
+
+Write-behind: when `CHAT_WRITE_BEHIND["ENABLED"]` is set, `ChatConsumer` builds the message
+(its UUID is the client-visible id), broadcasts it right away and queues it
+here. Every worker process owns one `MessageWriter` that inserts queued
+messages with `bulk_create` every `FLUSH_INTERVAL` seconds, or as soon as
+`BATCH_SIZE` messages are waiting. The queue is bounded by `MAX_QUEUE`: when
+it is full, senders wait for the next flush. Queued messages are also
+written on disconnect and at process exit.
+
+When a batch fails it is retried row by row: rows failing with a data error
+(e.g. their room was deleted) are logged and dropped, the rest of a batch hit
+by a transient error is kept for the next flush, up to `MAX_QUEUE` messages.
+`Message.created_at` is set when the message is built, so the broadcast
+timestamp is the stored one.
+
+Inbox: `record_messages()` moves each room's last message and unread counters
+forward after messages are saved, `mark_room_read()` resets them.
+
+History: `get_message_history()` serves pages of a room keyed on
+(`created_at`, `id`), used by the history API and the WebSocket resume.
+
+Resume: with write-behind, a message may still be queued in another worker
+when a client reconnects. Broadcast messages are therefore also kept in a
+per-room Redis sorted set shared by all workers (`remember_message()`), and
+`get_missed_messages()` merges it with the database history. Without Redis
+(local-memory cache, in-memory channel layer) there is a single process, and
+flushing its own queue before reading is enough.
+"""
+import asyncio
+import atexit
+import json
+import logging
+from datetime import datetime
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, DataError, IntegrityError, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest
+
+from redis.exceptions import RedisError
+
+from core.cache import get_connection
+
+from .models import ChatRoom, Message
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "ENABLED": False,
+    "BATCH_SIZE": 200,
+    "FLUSH_INTERVAL": 0.5,
+    "MAX_QUEUE": 5000,
+}
+
+PREVIEW_LENGTH = 100
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 100
+
+RECENT_KEY = "feed:chat:recent:{}"  # Sorted set of a room's latest broadcast messages (payload JSON)
+RECENT_MESSAGES = 500  # Kept per room, well above what waits in the write-behind queues
+RECENT_TTL = 3600
+
+
+def get_write_behind_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, "CHAT_WRITE_BEHIND", {})}
+
+
+def write_behind_enabled():
+    return get_write_behind_config()["ENABLED"]
+
+
+class MessageWriter:
+    """Per-process queue of unsaved messages, written in batches."""
+
+    def __init__(self, batch_size, flush_interval, max_queue):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._loop = None
+        self._queue = None
+        self._wakeup = None
+        self._lock = None
+        self._task = None
+        self._unsaved = []  # Messages whose insert failed on a transient error, retried first
+
+    def _ensure_running(self):
+        """Bind the queue and the flush task to the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._queue is not None:
+            self._keep(self._drain())  # Left over from a previous loop
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+
+    def _drain(self):
+        batch = []
+        while self._queue is not None and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    def _keep(self, messages):
+        """Add `messages` to the retry buffer, which holds at most `max_queue` messages."""
+        self._unsaved.extend(messages)
+        overflow = len(self._unsaved) - self.max_queue
+        if overflow > 0:
+            logger.error("Chat write-behind retry buffer full, %s oldest messages dropped", overflow)
+            self._unsaved = self._unsaved[overflow:]
+
+    async def put(self, message):
+        """Queue a message; waits for a flush when the queue is full."""
+        self._ensure_running()
+        if self._queue.full():
+            self._wakeup.set()
+        await self._queue.put(message)
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        """Insert everything queued so far. Concurrent calls run one after the other."""
+        if self._queue is None and not self._unsaved:
+            return  # Nothing was ever queued
+        self._ensure_running()
+        async with self._lock:
+            batch = self._unsaved + self._drain()
+            self._unsaved = []
+            if not batch:
+                return
+            try:
+                retry = await database_sync_to_async(self.write_batch)(batch)
+            except Exception:
+                self._keep(batch)
+                raise
+            self._keep(retry)
+
+    def write(self, batch):
+        with transaction.atomic():
+            Message.objects.bulk_create(batch, batch_size=self.batch_size, ignore_conflicts=True)
+            record_messages(batch)
+
+    def write_batch(self, batch):
+        """
+        Insert `batch`, retrying row by row when the batch fails. Rows that fail
+        on their own with a data error (e.g. their room was deleted) are logged
+        and dropped. Returns the messages to retry later (transient errors).
+        """
+        try:
+            self.write(batch)
+            return []
+        except DatabaseError:
+            logger.warning("Chat write-behind batch of %s messages failed, retrying row by row", len(batch))
+
+        for index, message in enumerate(batch):
+            try:
+                self.write([message])
+            except (IntegrityError, DataError):
+                logger.exception(
+                    "Chat write-behind dropped message %s (room %s, sender %s)",
+                    message.id, message.chat_room_id, message.sender_id,
+                )
+            except DatabaseError:
+                logger.exception("Chat write-behind flush failed, %s messages kept for retry", len(batch) - index)
+                return batch[index:]
+        return []
+
+    def flush_sync(self):
+        """Write queued messages without an event loop (process shutdown)."""
+        batch = self._unsaved + self._drain()
+        self._unsaved = []
+        if batch:
+            self._keep(self.write_batch(batch))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Chat write-behind flush failed")  # Kept, retried on the next tick
+
+
+def save_message(chat_room, sender, content):
+    """Create a message and update the room's inbox fields."""
+    with transaction.atomic():
+        message = Message.objects.create(chat_room=chat_room, sender=sender, content=content)
+        record_messages([message])
+    return message
+
+
+def record_messages(messages):
+    """
+    Update `last_message_*` and the unread counters of the rooms of saved
+    `messages`, one UPDATE per room. The last message only moves forward, so
+    batches written out of order by different workers are harmless.
+    """
+    by_room = {}
+    for message in messages:
+        by_room.setdefault(message.chat_room_id, []).append(message)
+
+    for room_id, room_messages in by_room.items():
+        room = room_messages[0].chat_room
+        last = max(room_messages, key=lambda message: message.created_at)
+        from_user2 = sum(1 for message in room_messages if message.sender_id == room.user2_id)
+        from_user1 = len(room_messages) - from_user2
+        is_newer = Q(last_message_at__lte=last.created_at)
+
+        ChatRoom.objects.filter(pk=room_id).update(
+            last_message_at=Greatest(F("last_message_at"), Value(last.created_at)),
+            last_message_preview=Case(
+                When(is_newer, then=Value(last.content[:PREVIEW_LENGTH])), default=F("last_message_preview"),
+            ),
+            last_message_sender=Case(
+                When(is_newer, then=Value(last.sender_id)), default=F("last_message_sender"),
+            ),
+            user1_unread_count=F("user1_unread_count") + from_user2,
+            user2_unread_count=F("user2_unread_count") + from_user1,
+        )
+
+
+def unread_count_field(chat_room, user):
+    return "user1_unread_count" if chat_room.user1_id == user.id else "user2_unread_count"
+
+
+def mark_room_read(chat_room, user):
+    """Mark the messages `user` received in the room as read and reset the counter."""
+    with transaction.atomic():
+        ChatRoom.objects.filter(pk=chat_room.pk).update(**{unread_count_field(chat_room, user): 0})
+        chat_room.messages.filter(is_read=False).exclude(sender=user).update(is_read=True)
+
+
+_config = get_write_behind_config()
+message_writer = MessageWriter(_config["BATCH_SIZE"], _config["FLUSH_INTERVAL"], _config["MAX_QUEUE"])
+atexit.register(message_writer.flush_sync)
+
+
+def message_payload(message):
+    """A message as it is sent over the WebSocket."""
+    return {
+        "message_id": str(message.id),
+        "sender": message.sender.username,
+        "content": message.content,
+        "created_at": str(message.created_at),
+    }
+
+
+def get_message_history(chat_room, before=None, after=None, since=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Return (messages, has_more) for `chat_room`, messages oldest first.
+
+    - `after` (a Message) and/or `since` (a datetime): the messages that follow,
+      for incremental sync; `has_more` means the gap is not closed yet
+    - otherwise: the latest messages, or those just before `before` (a Message);
+      `has_more` means older messages exist
+    """
+    messages = chat_room.messages.select_related("sender")
+    forward = after is not None or since is not None
+
+    if forward:
+        if after is not None:
+            messages = messages.filter(
+                Q(created_at__gt=after.created_at) | Q(created_at=after.created_at, id__gt=after.id)
+            )
+        if since is not None:
+            messages = messages.filter(created_at__gt=since)
+        messages = messages.order_by("created_at", "id")
+    else:
+        if before is not None:
+            messages = messages.filter(
+                Q(created_at__lt=before.created_at) | Q(created_at=before.created_at, id__lt=before.id)
+            )
+        messages = messages.order_by("-created_at", "-id")
+
+    rows = list(messages[:limit + 1])  # One extra row tells if there is more
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not forward:
+        rows.reverse()
+    return rows, has_more
+
+
+def _position(payload):
+    """(created_at, id) of a message payload, the history order."""
+    return datetime.fromisoformat(payload["created_at"]), payload["message_id"]
+
+
+def remember_message(message):
+    """Add a broadcast message to its room's shared recent buffer (write-behind only)."""
+    conn = get_connection()
+    if conn is None:
+        return
+    key = RECENT_KEY.format(message.chat_room_id)
+    try:
+        pipe = conn.pipeline(transaction=False)
+        pipe.zadd(key, {json.dumps(message_payload(message)): message.created_at.timestamp()})
+        pipe.zremrangebyrank(key, 0, -RECENT_MESSAGES - 1)
+        pipe.expire(key, RECENT_TTL)
+        pipe.execute()
+    except RedisError:
+        logger.exception("Could not buffer chat message %s for resume", message.id)
+
+
+def recent_messages(chat_room):
+    """Payloads of the room's recently broadcast messages, saved or not."""
+    conn = get_connection()
+    if conn is None:
+        return []
+    try:
+        rows = conn.zrange(RECENT_KEY.format(chat_room.id), 0, -1)
+    except RedisError:
+        logger.exception("Could not read the recent messages of room %s", chat_room.id)
+        return []
+    return [json.loads(row) for row in rows]
+
+
+def get_missed_messages(chat_room, last_message_id, limit=HISTORY_PAGE_SIZE):
+    """
+    (payloads, has_more) of the messages after `last_message_id`, oldest first,
+    or None when that message is unknown in the room. With write-behind, messages
+    not saved yet come from the shared recent buffer.
+    """
+    recent = recent_messages(chat_room) if write_behind_enabled() else []
+    try:
+        last = chat_room.messages.only("id", "created_at").get(id=last_message_id)
+    except (Message.DoesNotExist, ValidationError):
+        payload = next((payload for payload in recent if payload["message_id"] == str(last_message_id)), None)
+        if payload is None:
+            return None
+        created_at, message_id = _position(payload)
+        last = Message(id=message_id, created_at=created_at)
+    position = (last.created_at, str(last.id))
+
+    rows, has_more = get_message_history(chat_room, after=last, limit=limit)
+    missed = {str(message.id): message_payload(message) for message in rows}
+    end = _position(missed[str(rows[-1].id)]) if has_more else None
+    for payload in recent:
+        if _position(payload) > position and (end is None or _position(payload) < end):
+            missed.setdefault(payload["message_id"], payload)
+
+    missed = sorted(missed.values(), key=_position)
+    return missed[:limit], has_more or len(missed) > limit
@@ -60,28 +60,83 @@
 
 
 
+import asyncio
 import json
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from .models import ChatRoom, Message
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
+from .chat import (
+    get_missed_messages, message_payload, message_writer, remember_message, save_message, write_behind_enabled,
+)
+
+logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket chat for one room.
+
+    The room is resolved and the user authorized once in `connect()`; the
+    resolved room is kept on the connection and reused for every message.
+    With `CHAT_WRITE_BEHIND` enabled messages are broadcast before they are
+    saved and written in batches by `feed.chat.message_writer`.
+
+    Reconnecting clients send {"type": "resume", "last_message_id": "..."} and
+    get back {"type": "history", "messages": [...], "has_more": bool} with the
+    messages they missed. When `has_more` is set they resume again from the
+    last message of the frame until the gap is closed. Messages other workers
+    haven't saved yet are served from the shared buffer of `feed.chat`. Live
+    messages may overlap the history frame, so clients de-duplicate on
+    `message_id`.
+    """
+
     async def connect(self):
         self.user = self.scope["user"]
         self.room_id = self.scope["url_route"]["kwargs"]["room_id"]
         self.room_group_name = f"chat_{self.room_id}"
 
-        if self.user.is_authenticated:
-            await self.channel_layer.group_add(self.room_group_name, self.channel_name)
-            await self.accept()
-        else:
+        if not self.user or not self.user.is_authenticated:
+            await self.close()
+            return
+
+        # Only the two members of the room may join it
+        self.chat_room = await self.get_authorized_chat_room(self.room_id, self.user)
+        if self.chat_room is None:
             await self.close()
+            return
+
+        await self.join_group()
+        await self.accept()
+        self.membership_task = asyncio.create_task(self.keep_group_membership())
 
     async def disconnect(self, close_code):
+        if getattr(self, "membership_task", None):
+            self.membership_task.cancel()
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if write_behind_enabled():
+            try:
+                await message_writer.flush()  # Don't leave this user's messages queued
+            except Exception:
+                logger.exception("Chat write-behind flush on disconnect failed")
+
+    async def join_group(self):
+        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+
+    async def keep_group_membership(self):
+        """Re-join the room group before the channel layer's group_expiry drops this connection, even if it only listens"""
+        group_expiry = getattr(self.channel_layer, "group_expiry", 86400)
+        while True:
+            await asyncio.sleep(group_expiry / 2)
+            try:
+                await self.join_group()
+            except Exception:
+                logger.exception("Re-joining chat group %s failed", self.room_group_name)
 
     async def receive(self, text_data):
         if not text_data or text_data.strip() == "":  # Handle empty message
@@ -94,25 +149,25 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.send(text_data=json.dumps({"error": "Invalid JSON format"}))
             return
 
-        sender = self.user
-        chat_room = await self.get_chat_room(self.room_id)
-
-        if not chat_room:
-            await self.send(text_data=json.dumps({"error": "Chat room not found"}))
+        if data.get("type") == "resume":
+            await self.resume(data.get("last_message_id"))
             return
 
+        sender = self.user
+
         # Convert any non-string values into strings
         message_content = str(data.get("message", ""))
 
-        # Save message in database
-        message = await self.create_message(chat_room, sender, message_content)
+        if write_behind_enabled():
+            # Id is generated here, the row is inserted by the next batch
+            message = Message(chat_room=self.chat_room, sender=sender, content=message_content)
+            await sync_to_async(remember_message, thread_sensitive=False)(message)  # Resumable from any worker
+            await message_writer.put(message)
+        else:
+            # Save message in database
+            message = await self.create_message(self.chat_room, sender, message_content)
 
-        response = {
-            "message_id": str(message.id),
-            "sender": sender.username,
-            "content": message.content,
-            "created_at": str(message.created_at),
-        }
+        response = message_payload(message)
 
         await self.channel_layer.group_send(
             self.room_group_name, {"type": "chat_message", "message": response}
@@ -122,16 +177,36 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def chat_message(self, event):
         await self.send(text_data=json.dumps(event["message"]))
 
+    async def resume(self, last_message_id):
+        """Send the messages posted after `last_message_id`"""
+        if write_behind_enabled():
+            try:
+                await message_writer.flush()  # This worker's queue; other workers' come from the shared buffer
+            except Exception:
+                logger.exception("Chat write-behind flush before resume failed")
+
+        history = await database_sync_to_async(get_missed_messages)(self.chat_room, last_message_id)
+        if history is None:
+            await self.send(text_data=json.dumps({"error": "Unknown last_message_id"}))
+            return
+
+        messages, has_more = history
+        await self.send(text_data=json.dumps({
+            "type": "history",
+            "messages": messages,
+            "has_more": has_more,
+        }))
+
     @database_sync_to_async
-    def get_chat_room(self, room_id):
-        """Fetch chat room from database in a non-blocking way"""
+    def get_authorized_chat_room(self, room_id, user):
+        """Fetch the chat room if `user` is one of its members, else None"""
         try:
-            return ChatRoom.objects.get(id=room_id)
-        except ChatRoom.DoesNotExist:
+            return ChatRoom.objects.filter(Q(user1=user) | Q(user2=user)).get(id=room_id)
+        except (ChatRoom.DoesNotExist, ValidationError):
             return None
 
     @database_sync_to_async
     def create_message(self, chat_room, sender, message):
         """Create message in database asynchronously"""
-        return Message.objects.create(chat_room=chat_room, sender=sender, content=message)
+        return save_message(chat_room, sender, message)
 
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from account.models import User
+from feed.models import Post, Follower
+from feed.timeline import FANOUT_BATCH_SIZE, _bulk_insert, _entry, is_fanout_on_read
+
+
+class Command(BaseCommand):
+    """
+    Fill home timelines from existing posts and follows.
+
+    Usage: python manage.py backfill_timelines --posts-per-author 50
+    """
+    help = "Backfill TimelineEntry rows for existing posts (fan-out-on-write)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts-per-author", type=int, default=50,
+                            help="Latest posts of every author to copy into timelines.")
+        parser.add_argument("--author", help="Only backfill posts of this username.")
+
+    def handle(self, *args, **options):
+        limit = options["posts_per_author"]
+        authors = User.objects.filter(id__in=Post.objects.values("user_id"))
+        if options["author"]:
+            authors = authors.filter(username=options["author"])
+
+        total = 0
+        for author in authors.iterator():
+            posts = list(
+                Post.objects.filter(user=author).only("id", "user_id", "created_at").order_by("-created_at")[:limit]
+            )
+
+            # Fan-out-on-read authors are merged into timelines when they are read
+            owner_ids = [author.id]
+            if not is_fanout_on_read(author):
+                owner_ids += list(Follower.objects.filter(following=author).values_list("follower_id", flat=True))
+
+            entries = []
+            for owner_id in owner_ids:
+                entries.extend(_entry(owner_id, post) for post in posts)
+                if len(entries) >= FANOUT_BATCH_SIZE:
+                    _bulk_insert(entries)
+                    total += len(entries)
+                    entries = []
+            if entries:
+                _bulk_insert(entries)
+                total += len(entries)
+
+            self.stdout.write(f"{author.username}: {len(posts)} posts -> {len(owner_ids)} timelines")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfill finished, {total} timeline entries written."))
@@ -0,0 +1,86 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from core.benchmarks import create_bench_users, format_stats, measure
+from feed.models import Post, Follower, TimelineEntry
+from feed.timeline import home_timeline_queryset
+
+
+class Command(BaseCommand):
+    """
+    Benchmark feed reads: the global `-created_at` listing against the
+    precomputed home timeline.
+
+    Usage: python manage.py bench_feed --posts 1000000
+    Data is seeded in a transaction and rolled back unless `--keep` is given.
+    """
+    help = "Compare p50/p99 latency of the global feed and the home timeline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1_000_000)
+        parser.add_argument("--authors", type=int, default=2000)
+        parser.add_argument("--readers", type=int, default=20, help="Users whose home timeline is measured.")
+        parser.add_argument("--follows", type=int, default=50, help="Authors followed by every reader.")
+        parser.add_argument("--samples", type=int, default=200)
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--max-page", type=int, default=100, help="Pages are sampled from 1..max-page.")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded data.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            readers = self.seed(options)
+            self.benchmark(readers, options)
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+    def seed(self, options):
+        authors = create_bench_users(options["authors"])
+        readers = create_bench_users(options["readers"])
+        author_ids = [author.id for author in authors]
+
+        self.stdout.write(f"Seeding {options['posts']} posts ...")
+        chunk = []
+        for i in range(options["posts"]):
+            chunk.append(Post(user_id=random.choice(author_ids), media=f"bench/{i}.jpg", media_type="image"))
+            if len(chunk) == 10000:
+                Post.objects.bulk_create(chunk)
+                chunk = []
+        if chunk:
+            Post.objects.bulk_create(chunk)
+
+        self.stdout.write("Seeding follows and timelines ...")
+        for reader in readers:
+            followed = random.sample(author_ids, min(options["follows"], len(author_ids)))
+            Follower.objects.bulk_create([Follower(follower=reader, following_id=a) for a in followed])
+
+            entries = []
+            rows = Post.objects.filter(user_id__in=followed).values_list("id", "user_id", "created_at")
+            for post_id, author_id, created_at in rows.iterator(chunk_size=5000):
+                entries.append(TimelineEntry(owner=reader, post_id=post_id, author_id=author_id, created_at=created_at))
+                if len(entries) == 5000:
+                    TimelineEntry.objects.bulk_create(entries)
+                    entries = []
+            TimelineEntry.objects.bulk_create(entries)
+
+        return readers
+
+    def benchmark(self, readers, options):
+        page_size = options["page_size"]
+        max_page = options["max_page"]
+
+        def read_page(queryset):
+            paginator = Paginator(queryset, page_size)
+            number = random.randint(1, max(1, min(max_page, paginator.num_pages)))
+            list(paginator.page(number))
+
+        def global_feed():
+            read_page(Post.objects.all().order_by("-created_at"))
+
+        def home_feed():
+            read_page(home_timeline_queryset(random.choice(readers)))
+
+        self.stdout.write(format_stats("global feed (-created_at)", measure(global_feed, options["samples"])))
+        self.stdout.write(format_stats("home timeline", measure(home_feed, options["samples"])))
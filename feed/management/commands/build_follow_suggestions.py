@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from account.models import User
+from feed.suggestions import build_suggestions
+
+
+class Command(BaseCommand):
+    """
+    Precompute "who to follow" suggestions (FollowSuggestion rows).
+
+    Users are processed in chunks; each chunk is scored with a few set-based
+    queries and its rows replaced in one transaction. Run it nightly.
+    Usage: python manage.py build_follow_suggestions [--user <username>] [--chunk-size 500]
+    """
+    help = "Rebuild follow suggestions from friends-of-friends, memberships and categories."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only rebuild the suggestions of this username.")
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True).order_by("id")
+        if options["user"]:
+            users = users.filter(username=options["user"])
+
+        chunk, total, owners = [], 0, 0
+        for user_id in users.values_list("id", flat=True).iterator(chunk_size=options["chunk_size"]):
+            chunk.append(user_id)
+            if len(chunk) == options["chunk_size"]:
+                total += build_suggestions(chunk)
+                owners += len(chunk)
+                chunk = []
+        if chunk:
+            total += build_suggestions(chunk)
+            owners += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"{total} suggestions written for {owners} users."))
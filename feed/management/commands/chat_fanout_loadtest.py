@@ -0,0 +1,133 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from core.benchmarks import percentile
+
+
+REDIS_BACKEND = "channels_redis.core.RedisChannelLayer"
+
+
+def run_worker(worker_id, backend, config, group, connections, expected, timeout, ready, results):
+    """Worker process: join `connections` channels to the group and time every message."""
+    asyncio.run(_consume(worker_id, backend, config, group, connections, expected, timeout, ready, results))
+
+
+async def _consume(worker_id, backend, config, group, connections, expected, timeout, ready, results):
+    layer = import_string(backend)(**config)
+    channels = [await layer.new_channel() for _ in range(connections)]
+    for channel in channels:
+        await layer.group_add(group, channel)
+    ready.put(worker_id)
+
+    latencies = []
+
+    async def receive_all(channel):
+        for _ in range(expected):
+            message = await layer.receive(channel)
+            latencies.append((time.time() - message["sent_at"]) * 1000)
+
+    try:
+        await asyncio.wait_for(asyncio.gather(*[receive_all(channel) for channel in channels]), timeout)
+    except asyncio.TimeoutError:
+        pass  # Messages dropped by backpressure never arrive
+
+    for channel in channels:
+        await layer.group_discard(group, channel)
+    results.put({"worker": worker_id, "received": len(latencies), "latencies": latencies})
+
+
+class Command(BaseCommand):
+    """
+    Local load test of chat fan-out through the channel layer.
+
+    Spawns worker processes that each hold `--connections` channels in one chat
+    group, sends `--messages` group messages from the main process and reports
+    delivery and latency per worker. Needs a Redis channel layer, e.g.
+
+        python manage.py chat_fanout_loadtest --hosts redis://127.0.0.1:6379/1
+        python manage.py chat_fanout_loadtest --fakeredis   (in-process fakeredis server, from requirements-dev.txt)
+    """
+    help = "Measure chat group fan-out across worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--connections", type=int, default=25, help="Channels per worker.")
+        parser.add_argument("--messages", type=int, default=100)
+        parser.add_argument("--rate", type=float, default=0, help="Messages per second, 0 for no limit.")
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--hosts", help="Comma separated redis:// URLs instead of CHANNEL_LAYERS.")
+        parser.add_argument("--fakeredis", action="store_true", help="Run against a local fakeredis server.")
+
+    def handle(self, *args, **options):
+        backend, config = self.get_layer_config(options)
+        group = f"loadtest_{uuid.uuid4().hex}"
+
+        context = multiprocessing.get_context("spawn")
+        ready, results = context.Queue(), context.Queue()
+        workers = [
+            context.Process(target=run_worker, args=(
+                i, backend, config, group, options["connections"], options["messages"],
+                options["timeout"], ready, results,
+            ))
+            for i in range(options["workers"])
+        ]
+        for worker in workers:
+            worker.start()
+        for _ in workers:
+            ready.get(timeout=options["timeout"])
+
+        send_seconds = asyncio.run(self.send_messages(backend, config, group, options))
+        reports = [results.get(timeout=options["timeout"] + 10) for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        expected = options["connections"] * options["messages"]
+        latencies = []
+        for report in sorted(reports, key=lambda r: r["worker"]):
+            latencies.extend(report["latencies"])
+            self.stdout.write(f"worker {report['worker']}: received {report['received']}/{expected}")
+
+        latencies.sort()
+        total = expected * len(workers)
+        self.stdout.write(
+            f"sent {options['messages']} messages in {send_seconds:.2f}s to {total // options['messages']} connections, "
+            f"delivered {len(latencies)}/{total}"
+        )
+        self.stdout.write(f"fan-out latency p50={percentile(latencies, 50):.2f}ms p99={percentile(latencies, 99):.2f}ms")
+
+    def get_layer_config(self, options):
+        if options["fakeredis"]:
+            import fakeredis
+
+            server = fakeredis.TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            host, port = server.server_address
+            return REDIS_BACKEND, {"hosts": [f"redis://{host}:{port}/0"]}
+
+        if options["hosts"]:
+            return REDIS_BACKEND, {"hosts": [host.strip() for host in options["hosts"].split(",")]}
+
+        layer = settings.CHANNEL_LAYERS["default"]
+        if layer["BACKEND"] != REDIS_BACKEND:
+            raise CommandError(
+                "The in-memory channel layer cannot fan out across processes. "
+                "Set CHANNEL_REDIS_HOSTS, or pass --hosts or --fakeredis."
+            )
+        return layer["BACKEND"], layer.get("CONFIG", {})
+
+    async def send_messages(self, backend, config, group, options):
+        layer = import_string(backend)(**config)
+        interval = 1 / options["rate"] if options["rate"] else 0
+        started = time.time()
+        for seq in range(options["messages"]):
+            await layer.group_send(group, {"type": "chat.message", "seq": seq, "sent_at": time.time()})
+            if interval:
+                await asyncio.sleep(interval)
+        return time.time() - started
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from feed.view_counter import flush_views
+
+
+class Command(BaseCommand):
+    """
+    Apply buffered post views to `Post.views_count`.
+
+    Usage: python manage.py flush_post_views --loop --interval 5
+    """
+    help = "Flush buffered post views from Redis into the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep flushing every --interval seconds.")
+        parser.add_argument("--interval", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        while True:
+            updated = flush_views()
+            self.stdout.write(f"Flushed views of {updated} posts")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
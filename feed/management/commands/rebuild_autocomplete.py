@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache import get_connection
+from feed.autocomplete import rebuild_index
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the Redis prefix index used by the autocomplete endpoint.
+
+    Profile and follow changes keep the index up to date; run this after a
+    bulk import or to re-rank users whose follower counts changed a lot.
+    Usage: python manage.py rebuild_autocomplete
+    """
+    help = "Rebuild the username / full name / business name autocomplete index."
+
+    def handle(self, *args, **options):
+        if get_connection() is None:
+            raise CommandError("The default cache is not Redis; autocomplete is disabled.")
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} users."))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from account.models import User
+from feed.models import Post, Like, Comment, Follower
+
+
+def count_subquery(model, field):
+    """COUNT(*) of `model` rows pointing at the outer row through `field`."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by().values(field).annotate(c=Count("pk")).values("c")
+        ),
+        0,
+    )
+
+
+# (model, counter column, related model, related field)
+COUNTERS = [
+    (Post, "likes_count", Like, "post"),
+    (Post, "comments_count", Comment, "post"),
+    (User, "followers_count", Follower, "following"),
+    (User, "following_count", Follower, "follower"),
+]
+
+
+class Command(BaseCommand):
+    """
+    Repair drift of the denormalized counters on Post and User.
+
+    Every counter is fixed with one `UPDATE ... WHERE counter <> (SELECT COUNT(*) ...)`
+    so only drifted rows are written.
+    Usage: python manage.py reconcile_counters [--dry-run]
+    """
+    help = "Recompute likes/comments/followers/following counters in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report drifted rows.")
+
+    def handle(self, *args, **options):
+        for model, column, related_model, related_field in COUNTERS:
+            actual = count_subquery(related_model, related_field)
+            drifted = model.objects.filter(~Q(**{column: actual}))
+
+            if options["dry_run"]:
+                fixed = drifted.count()
+            else:
+                with transaction.atomic():
+                    fixed = drifted.update(**{column: count_subquery(related_model, related_field)})
+
+            self.stdout.write(f"{model.__name__}.{column}: {fixed} rows drifted")
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING("Dry run, nothing written."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Counters reconciled."))
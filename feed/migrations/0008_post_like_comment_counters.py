@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:37
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by().values(field).annotate(c=Count("pk")).values("c")
+        ),
+        0,
+    )
+
+
+def backfill_post_counters(apps, schema_editor):
+    Post = apps.get_model("feed", "Post")
+    Like = apps.get_model("feed", "Like")
+    Comment = apps.get_model("feed", "Comment")
+    Post.objects.update(
+        likes_count=count_subquery(Like, "post"),
+        comments_count=count_subquery(Comment, "post"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed', '0007_follower_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_post_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed', '0008_post_like_comment_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat_room', 'created_at'], name='feed_messag_chat_ro_b4ec9f_idx'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_inbox(apps, schema_editor):
+    """Fill the last message and unread counts of existing rooms from their messages."""
+    from django.db.models import Count, F, OuterRef, Subquery
+    from django.db.models.functions import Coalesce, Substr
+
+    ChatRoom = apps.get_model("feed", "ChatRoom")
+    Message = apps.get_model("feed", "Message")
+
+    latest = Message.objects.filter(chat_room=OuterRef("pk")).order_by("-created_at")
+
+    def unread_for(user_field):
+        return Coalesce(Subquery(
+            Message.objects.filter(chat_room=OuterRef("pk"), is_read=False)
+            .exclude(sender=OuterRef(user_field))
+            .order_by().values("chat_room").annotate(c=Count("pk")).values("c")
+        ), 0)
+
+    ChatRoom.objects.update(
+        last_message_at=Coalesce(Subquery(latest.values("created_at")[:1]), F("created_at")),
+        last_message_preview=Coalesce(Substr(Subquery(latest.values("content")[:1]), 1, 100), models.Value("")),
+        last_message_sender=Subquery(latest.values("sender")[:1]),
+        user1_unread_count=unread_for("user1"),
+        user2_unread_count=unread_for("user2"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('feed', '0009_message_room_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='user1_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='user2_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_inbox, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='chatroom',
+            index=models.Index(fields=['user1', '-last_message_at'], name='feed_chatro_user1_i_d717d1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatroom',
+            index=models.Index(fields=['user2', '-last_message_at'], name='feed_chatro_user2_i_cda4cb_idx'),
+        ),
+    ]
@@ -7,6 +7,7 @@ from datetime import timedelta
 from account.models import User
 from core.models import BaseModel
 from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
 
 
 
@@ -25,6 +26,29 @@ def validate_file_extension(value):
         raise ValidationError("Unsupported file format! Only images and videos are allowed.")
 
 
+LATEST_COMMENTS_LIMIT = 3  # Comments embedded with every post in feed listings
+
+
+class PostQuerySet(models.QuerySet):
+    """Queryset helpers to serialize feed pages in a constant number of queries."""
+
+    def for_feed(self, expand=()):
+        """
+        Resolve the author in the same query and prefetch the latest comments
+        window. Full `likes`/`comments` lists are prefetched only when
+        requested through `expand`.
+        """
+        latest_comments = Comment.objects.select_related("user").order_by("-created_at")[:LATEST_COMMENTS_LIMIT]
+        queryset = self.select_related("user").prefetch_related(
+            Prefetch("comments", queryset=latest_comments, to_attr="latest_comments")
+        )
+        if "likes" in expand:
+            queryset = queryset.prefetch_related(Prefetch("likes", queryset=Like.objects.select_related("user")))
+        if "comments" in expand:
+            queryset = queryset.prefetch_related(Prefetch("comments", queryset=Comment.objects.select_related("user")))
+        return queryset
+
+
 class Post(BaseModel):
     """
     Represents a post made by a user. It can contain media (image/video), a caption,
@@ -39,6 +63,8 @@ class Post(BaseModel):
     caption = models.TextField(blank=True, null=True)  # Caption text
     hashtags = models.CharField(max_length=500, blank=True, null=True)  # List of hashtags (stored as JSON)
     views_count = models.PositiveBigIntegerField(default=0)  
+    likes_count = models.PositiveIntegerField(default=0)  # Maintained with F() on like/unlike
+    comments_count = models.PositiveIntegerField(default=0)  # Maintained with F() on comment
     media_type = models.CharField(max_length=10, blank=True, null=True)
     is_video = models.BooleanField(default=False)
     extension = models.CharField(max_length=10, blank=True, null=True)  
@@ -46,6 +72,8 @@ class Post(BaseModel):
     category = models.CharField(max_length=50, blank=True, null=True)
     video_size = models.FloatField(blank=True, null=True)
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         indexes = [
             models.Index(fields=["user"]),
@@ -164,21 +192,110 @@ class Follower(models.Model):
             models.Index(fields=["follower"]),
             models.Index(fields=["following"]),
         ]
-        abstract = True
 
     def __str__(self):
         return f"{self.follower.username} follows {self.following.username}"
 
 
+class TimelineEntry(models.Model):
+    """
+    A post delivered into a user's home timeline.
+
+    Rows are written when a post is created (fan-out-on-write), so reading a
+    timeline page is a single ranged lookup on (`owner`, `-created_at`).
+    `created_at` is copied from the post and `author` is kept so the entries of
+    an unfollowed user can be dropped without touching the posts table.
+    """
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries"  # Timeline of this user
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries"
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    created_at = models.DateTimeField()  # Same as post.created_at
+
+    class Meta:
+        unique_together = ("owner", "post")  # A post appears once per timeline
+        indexes = [
+            models.Index(fields=["owner", "-created_at"]),
+            models.Index(fields=["owner", "author"]),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} in timeline of {self.owner_id}"
+
+
+
+class FollowSuggestion(models.Model):
+    """
+    A precomputed "who to follow" candidate for `owner`.
+
+    Rows are rebuilt offline by `python manage.py build_follow_suggestions`
+    from friends-of-friends, shared business memberships and business
+    categories (see `feed.suggestions`), so serving suggestions is one ranged
+    lookup on (`owner`, `-score`).
+    """
+    REASON_CHOICES = [
+        ("friends_of_friends", "Followed by people you follow"),
+        ("shared_business", "Member of the same business"),
+        ("same_category", "Business in a category you like"),
+    ]
+
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="follow_suggestions"  # Suggestions shown to this user
+    )
+    suggested = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    score = models.FloatField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)  # Biggest contribution to the score
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("owner", "suggested")
+        indexes = [
+            models.Index(fields=["owner", "-score"]),
+        ]
+
+    def __str__(self):
+        return f"Suggest {self.suggested_id} to {self.owner_id} ({self.reason})"
+
 
 class ChatRoom(BaseModel):
     """
     A chat room between two users.
+
+    The last message and the unread counts are denormalized for the inbox and
+    kept current by `feed.chat.record_messages()` / `mark_room_read()`.
+    `last_message_at` is the room creation time until the first message.
     """
     user1 = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chats_as_user1")
     user2 = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chats_as_user2")
+    last_message_at = models.DateTimeField(default=now)
+    last_message_preview = models.CharField(max_length=100, blank=True, default="")
+    last_message_sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    user1_unread_count = models.PositiveIntegerField(default=0)  # Messages from user2 not read by user1
+    user2_unread_count = models.PositiveIntegerField(default=0)
+
     class Meta:
         unique_together = ("user1", "user2")
+        indexes = [
+            models.Index(fields=["user1", "-last_message_at"]),  # Inbox, latest activity first
+            models.Index(fields=["user2", "-last_message_at"]),
+        ]
 
     def __str__(self):
         return f"Chat: {self.user1.username} & {self.user2.username}"
@@ -191,6 +308,13 @@ class Message(BaseModel):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sent_messages")
     content = models.TextField()
     is_read = models.BooleanField(default=False)
+    # Set when the message is built, not on insert: write-behind broadcasts it before saving
+    created_at = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["chat_room", "created_at"]),  # History pages of a room
+        ]
 
     def __str__(self):
         return f"{self.sender.username}: {self.content[:20]}"
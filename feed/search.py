@@ -0,0 +1,68 @@
+"""
+User search.
+
+Matching keeps the `icontains` semantics, but every condition can be served by
+an index on Postgres: `username`, `first_name`, `last_name` and
+`BusinessInfo.business_name` have `pg_trgm` GIN indexes on the exact
+`UPPER(col::text)` expression Django filters on (account 0005, core 0015).
+Business names are matched first in their own query, best match first
+before the `BUSINESS_MATCH_LIMIT` cut, so the user query is a single-table OR
+the planner can answer with a BitmapOr of index scans instead of a sequential
+scan behind a join. Business types are matched against the choice list in
+Python.
+
+Results are ranked by trigram similarity on Postgres (an exact > prefix >
+substring rank elsewhere, e.g. SQLite in tests), and the personal and
+business profiles are fetched in the same query.
+"""
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+
+from account.models import User
+from core.models import BusinessInfo
+from core.search import matching_business_types
+
+
+SEARCH_LIMIT = 10
+BUSINESS_MATCH_LIMIT = 100  # Business-name matches considered for ranking
+USER_FIELDS = ("username", "first_name", "last_name")
+
+
+def _rank(query, fields=(*USER_FIELDS, "businessinfo__business_name")):
+    """Match quality of `query` against `fields`: trigram similarity, or exact > prefix > substring."""
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        similarities = [TrigramSimilarity(field, query) for field in fields]
+        return Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+
+    return Case(
+        *[When(**{f"{field}__iexact": query}, then=Value(3)) for field in fields],
+        *[When(**{f"{field}__istartswith": query}, then=Value(2)) for field in fields],
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+
+
+def search_users(query, limit=SEARCH_LIMIT):
+    """Users matching `query`, best match first, with `personalinfo` and `businessinfo` loaded."""
+    business_user_ids = list(
+        BusinessInfo.objects.filter(
+            Q(business_name__icontains=query) | Q(business_type__in=matching_business_types(query))
+        )
+        .annotate(rank=_rank(query, ["business_name"]))
+        .order_by("-rank", "business_name")  # Best name matches survive the cut
+        .values_list("user_id", flat=True)[:BUSINESS_MATCH_LIMIT]
+    )
+
+    condition = Q(id__in=business_user_ids)
+    for field in USER_FIELDS:
+        condition |= Q(**{f"{field}__icontains": query})
+
+    return list(
+        User.objects.filter(condition)
+        .select_related("personalinfo", "businessinfo")
+        .annotate(rank=_rank(query))
+        .order_by("-rank", "username")[:limit]
+    )
@@ -57,11 +57,30 @@ def validate_video_size(media):
 #     except Exception:
 #         raise ValidationError("Could not determine video duration. Ensure it's a valid MP4 file.")
 
+EXPANDABLE_POST_FIELDS = ('likes', 'comments')
+
+
+def get_expand_fields(request):
+    """Parse `?expand=likes,comments` into a set of nested lists to include"""
+    if request is None:
+        return set()
+    values = request.query_params.get('expand', '')
+    return {value.strip() for value in values.split(',')} & set(EXPANDABLE_POST_FIELDS)
+
+
 class PostSerializer(serializers.ModelSerializer):
-    """Post model ke liye serializer"""
+    """
+    Post model ke liye serializer
+
+    Views listing posts pass the requested `expand` set (`?expand=likes,comments`)
+    in the context, and the full `likes` and `comments` lists are then only
+    included when asked for. Without it (create/update responses, use outside a
+    request) both lists are included. `latest_comments` always carries the
+    newest few comments.
+    Use `Post.objects.for_feed()` querysets to avoid per-post queries.
+    """
     user = serializers.StringRelatedField()
-    likes_count = serializers.SerializerMethodField()
-    comments_count = serializers.SerializerMethodField()
+    latest_comments = serializers.SerializerMethodField()
     likes = LikeSerializer(many=True, read_only=True)
     comments = CommentSerializer(many=True, read_only=True)
     media_url = serializers.SerializerMethodField()  # Add media URL field
@@ -72,8 +91,17 @@ class PostSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'user', 'media', 'media_url', 'caption', 'hashtags', 
             'views_count', 'media_type', 'is_video', 'created_at', 
-            'likes_count', 'comments_count', 'likes', 'comments'
+            'likes_count', 'comments_count', 'latest_comments', 'likes', 'comments'
         ]
+        read_only_fields = ['views_count', 'likes_count', 'comments_count']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = self.context.get('expand')
+        if expand is not None:
+            for field_name in EXPANDABLE_POST_FIELDS:
+                if field_name not in expand:
+                    self.fields.pop(field_name)
 
     def validate_media(self, media):
         """ Validate file extension and set media type """
@@ -97,11 +125,11 @@ class PostSerializer(serializers.ModelSerializer):
         validated_data['video_size'] = self.video_size
         return super().create(validated_data)
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
-
-    def get_comments_count(self, obj):
-        return obj.comments.count()
+    def get_latest_comments(self, obj):
+        comments = getattr(obj, 'latest_comments', None)  # Prefetched by for_feed()
+        if comments is None:
+            comments = obj.comments.select_related('user').order_by('-created_at')[:LATEST_COMMENTS_LIMIT]
+        return CommentSerializer(comments, many=True).data
     
     def get_media_url(self, obj):
         return obj.media.url if obj.media else None  # Return the full URL to the media file
@@ -133,18 +161,10 @@ class FollowerSerializer(serializers.ModelSerializer):
 
 
 class UserSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
-
     class Meta:
         model = User
         fields = ["id", "username", "email", "followers_count", "following_count"]
-
-    def get_followers_count(self, obj):
-        return obj.followers.count()
-
-    def get_following_count(self, obj):
-        return obj.following.count()
+        read_only_fields = ["followers_count", "following_count"]
 
 
 class ChatRoomSerializer(serializers.ModelSerializer):
@@ -152,6 +172,24 @@ class ChatRoomSerializer(serializers.ModelSerializer):
         model = ChatRoom
         fields = "__all__"
 
+class ChatInboxSerializer(serializers.ModelSerializer):
+    """Inbox row as seen by `context["request"].user`; needs user1/user2 selected"""
+    other_user = serializers.SerializerMethodField()
+    unread_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChatRoom
+        fields = ["id", "other_user", "last_message_at", "last_message_preview", "last_message_sender", "unread_count"]
+
+    def get_other_user(self, obj):
+        other = obj.user2 if obj.user1_id == self.context["request"].user.id else obj.user1
+        return {"id": other.id, "username": other.username}
+
+    def get_unread_count(self, obj):
+        if obj.user1_id == self.context["request"].user.id:
+            return obj.user1_unread_count
+        return obj.user2_unread_count
+
 class MessageSerializer(serializers.ModelSerializer):
     sender_username = serializers.CharField(source="sender.username", read_only=True)
 
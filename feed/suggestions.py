@@ -0,0 +1,183 @@
+"""
+"Who to follow" suggestions.
+
+`build_suggestions()` runs offline (`python manage.py build_follow_suggestions`)
+and scores candidates for a chunk of users at a time with a handful of set-based
+queries:
+
+- friends of friends: users followed by the people you follow, per mutual;
+- shared business: members (and the owner) of businesses you are a member of;
+- same category: the most followed businesses in the main categories of your
+  own business, your memberships and the businesses you follow.
+
+The best `MAX_SUGGESTIONS` per user are stored in `FollowSuggestion`.
+`get_suggestions()` serves them with one indexed query, and fills up with a
+random sample read from a random UUID pivot on the primary key — never
+`ORDER BY RANDOM()`.
+"""
+import random
+import uuid
+from collections import defaultdict
+
+from django.db import transaction
+
+from account.models import User
+from core.models import BusinessInfo, BusinessMembership
+from .models import Follower, FollowSuggestion
+
+
+MAX_SUGGESTIONS = 50  # Stored per user
+SERVE_POOL = 15  # Top suggestions a response is sampled from, so it varies between calls
+MAX_FOLLOWING_SCANNED = 1000  # Skip friends who follow more people than this
+MAX_MEMBERS_PER_BUSINESS = 500
+CATEGORY_CANDIDATES = 20  # Most followed businesses taken per category
+WEIGHTS = {
+    "friends_of_friends": 3.0,  # Per mutual
+    "shared_business": 2.0,  # Per shared business
+    "same_category": 1.0,
+}
+
+
+def _following(owner_ids):
+    following = defaultdict(set)
+    for follower_id, following_id in Follower.objects.filter(follower_id__in=owner_ids).values_list(
+        "follower_id", "following_id"
+    ):
+        following[follower_id].add(following_id)
+    return following
+
+
+def _add(scores, owner_id, candidate_id, reason, weight):
+    entry = scores[owner_id][candidate_id]
+    entry[reason] = entry.get(reason, 0.0) + weight
+
+
+def _friends_of_friends(scores, following):
+    friend_ids = {friend_id for friends in following.values() for friend_id in friends}
+    second = defaultdict(list)
+    rows = (
+        Follower.objects.filter(follower_id__in=friend_ids, follower__following_count__lte=MAX_FOLLOWING_SCANNED)
+        .values_list("follower_id", "following_id")
+    )
+    for friend_id, candidate_id in rows.iterator(chunk_size=5000):
+        second[friend_id].append(candidate_id)
+
+    for owner_id, friends in following.items():
+        for friend_id in friends:
+            for candidate_id in second.get(friend_id, ()):
+                _add(scores, owner_id, candidate_id, "friends_of_friends", WEIGHTS["friends_of_friends"])
+
+
+def _shared_business(scores, owner_ids):
+    businesses = defaultdict(set)
+    for user_id, business_id in BusinessMembership.objects.filter(user_id__in=owner_ids).values_list(
+        "user_id", "business_id"
+    ):
+        businesses[business_id].add(user_id)
+    if not businesses:
+        return
+
+    members = defaultdict(list)
+    for business_id, user_id in BusinessInfo.objects.filter(id__in=businesses).values_list("id", "user_id"):
+        members[business_id].append(user_id)  # The business account itself
+    rows = (
+        BusinessMembership.objects.filter(business_id__in=businesses)
+        .order_by("business_id", "-joined_at").values_list("business_id", "user_id")
+    )
+    for business_id, user_id in rows.iterator(chunk_size=5000):
+        if len(members[business_id]) <= MAX_MEMBERS_PER_BUSINESS:
+            members[business_id].append(user_id)
+
+    for business_id, owners in businesses.items():
+        for owner_id in owners:
+            for candidate_id in members[business_id]:
+                _add(scores, owner_id, candidate_id, "shared_business", WEIGHTS["shared_business"])
+
+
+def _same_category(scores, owner_ids, following):
+    followed_ids = {user_id for users in following.values() for user_id in users}
+    business_category = dict(
+        BusinessInfo.objects.filter(main_category__isnull=False, user_id__in=[*owner_ids, *followed_ids])
+        .values_list("user_id", "main_category_id")
+    )
+    categories = defaultdict(set)
+    for owner_id in owner_ids:
+        for user_id in {owner_id, *following.get(owner_id, ())}:
+            if user_id in business_category:
+                categories[owner_id].add(business_category[user_id])
+    rows = BusinessMembership.objects.filter(user_id__in=owner_ids, business__main_category__isnull=False)
+    for owner_id, category_id in rows.values_list("user_id", "business__main_category_id"):
+        categories[owner_id].add(category_id)
+
+    popular = {}
+    for category_id in {category for owned in categories.values() for category in owned}:
+        popular[category_id] = list(
+            BusinessInfo.objects.filter(main_category_id=category_id)
+            .order_by("-user__followers_count").values_list("user_id", flat=True)[:CATEGORY_CANDIDATES]
+        )
+    for owner_id, owned in categories.items():
+        for category_id in owned:
+            for candidate_id in popular[category_id]:
+                _add(scores, owner_id, candidate_id, "same_category", WEIGHTS["same_category"])
+
+
+def build_suggestions(owner_ids):
+    """Recompute and store the suggestions of `owner_ids`. Returns the number of rows written."""
+    owner_ids = list(owner_ids)
+    following = _following(owner_ids)
+    scores = defaultdict(lambda: defaultdict(dict))  # owner -> candidate -> {reason: score}
+
+    _friends_of_friends(scores, following)
+    _shared_business(scores, owner_ids)
+    _same_category(scores, owner_ids, following)
+
+    rows = []
+    for owner_id in owner_ids:
+        excluded = following.get(owner_id, set()) | {owner_id}
+        candidates = [
+            (sum(reasons.values()), candidate_id, max(reasons, key=reasons.get))
+            for candidate_id, reasons in scores[owner_id].items() if candidate_id not in excluded
+        ]
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        rows.extend(
+            FollowSuggestion(owner_id=owner_id, suggested_id=candidate_id, score=score, reason=reason)
+            for score, candidate_id, reason in candidates[:MAX_SUGGESTIONS]
+        )
+
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(owner_id__in=owner_ids).delete()
+        FollowSuggestion.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def random_users(user, count, exclude_ids=()):
+    """
+    Up to `count` random users `user` doesn't follow, read from a random point
+    of the primary key index (wrapping around) instead of sorting the table.
+    """
+    pivot = uuid.uuid4()
+    users = (
+        User.objects.exclude(id__in=Follower.objects.filter(follower=user).values("following_id"))
+        .exclude(id__in=[user.id, *exclude_ids]).select_related("personalinfo")
+    )
+    sample = list(users.filter(id__gte=pivot).order_by("id")[:count])
+    if len(sample) < count:
+        sample += list(users.filter(id__lt=pivot).order_by("id")[:count - len(sample)])
+    return sample
+
+
+def get_suggestions(user, count=5):
+    """[(User, reason or None)]: precomputed suggestions first, then random users."""
+    pool = list(
+        FollowSuggestion.objects.filter(owner=user)
+        .exclude(suggested__in=Follower.objects.filter(follower=user).values("following_id"))
+        .select_related("suggested__personalinfo").order_by("-score")[:SERVE_POOL]
+    )
+    picked = random.sample(pool, min(count, len(pool)))
+    picked.sort(key=lambda suggestion: suggestion.score, reverse=True)
+    result = [(suggestion.suggested, suggestion.reason) for suggestion in picked]
+
+    if len(result) < count:
+        exclude_ids = [suggested.id for suggested, _ in result]
+        result += [(other, None) for other in random_users(user, count - len(result), exclude_ids)]
+    return result
@@ -1,3 +1,674 @@
-from django.test import TestCase
+import asyncio
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError, connection
+from django.db.models import QuerySet
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from account.models import User
+from core.models import BusinessInfo, BusinessMembership
+from . import autocomplete, chat, search
+from .consumers import ChatConsumer
+from .chat import MessageWriter, get_message_history, get_missed_messages, remember_message
+from .models import Post, Like, Comment, Follower, ChatRoom, FollowSuggestion, Message
+from .suggestions import build_suggestions
+from .routing import websocket_urlpatterns
+from .serializers import PostSerializer
+from .timeline import fan_out_post
+from . import view_counter
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class FeedQueryCountTests(APITestCase):
+    """Feed endpoints must issue the same number of queries whatever the page size."""
+
+    def setUp(self):
+        self.user = self.create_user("reader")
+        self.author = self.create_user("author")
+        self.fans = [self.create_user(f"fan{i}") for i in range(3)]
+        Follower.objects.create(follower=self.user, following=self.author)
+        self.client.force_authenticate(self.user)
+
+    def create_user(self, username):
+        return User.objects.create(
+            username=username, email=f"{username}@example.com",
+            mobile_number=f"+91-{username}", user_type="personal",
+        )
+
+    def create_posts(self, count):
+        for i in range(count):
+            for author in (self.author, self.user):
+                post = Post.objects.create(user=author, media=f"Post/medias/{i}.jpg", caption=f"post {i}")
+                fan_out_post(post)
+                for fan in self.fans:
+                    Like.objects.create(user=fan, post=post)
+                    Comment.objects.create(user=fan, post=post, text=f"comment by {fan.username}")
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url):
+        self.create_posts(2)
+        self.client.get(url)  # Warm up per-user caches
+        small_page = self.count_queries(url)
+        self.create_posts(8)
+        self.assertEqual(self.count_queries(url), small_page)
+
+    def test_post_list(self):
+        self.assertConstantQueries("/api/feed/posts/list/?page_size=20")
+
+    def test_post_list_expanded(self):
+        self.assertConstantQueries("/api/feed/posts/list/?page_size=20&expand=likes,comments")
+
+    def test_post_list_cursor(self):
+        self.assertConstantQueries("/api/feed/posts/list/?pagination=cursor&page_size=20")
+
+    def test_home_timeline(self):
+        self.assertConstantQueries("/api/feed/posts/list/?feed=home&page_size=20")
+
+    def test_user_post_list(self):
+        self.assertConstantQueries("/api/feed/posts/list/user/?page_size=20")
+
+    def test_user_profile(self):
+        self.assertConstantQueries(f"/api/feed/user/{self.author.id}/")
+
+    def test_nested_lists_require_expand(self):
+        self.create_posts(1)
+        call_command("reconcile_counters", stdout=StringIO())  # Likes/comments were created directly
+        post = self.client.get("/api/feed/posts/list/").data["results"][0]
+        self.assertNotIn("likes", post)
+        self.assertNotIn("comments", post)
+        self.assertEqual(post["likes_count"], 3)
+        self.assertEqual(post["comments_count"], 3)
+        self.assertEqual(len(post["latest_comments"]), 3)
+
+        post = self.client.get("/api/feed/posts/list/?expand=likes,comments").data["results"][0]
+        self.assertEqual(len(post["likes"]), 3)
+        self.assertEqual(len(post["comments"]), 3)
+
+    def test_nested_lists_kept_outside_list_views(self):
+        self.create_posts(1)
+        data = PostSerializer(Post.objects.first()).data
+        self.assertEqual((len(data["likes"]), len(data["comments"])), (3, 3))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CounterTests(APITestCase):
+    """Counters are maintained by the like/comment/follow endpoints."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="fan", email="fan@example.com", mobile_number="100", user_type="personal")
+        self.author = User.objects.create(username="star", email="star@example.com", mobile_number="200", user_type="personal")
+        self.post = Post.objects.create(user=self.author, media="Post/medias/a.jpg")
+        self.client.force_authenticate(self.user)
+
+    def test_like_and_unlike(self):
+        self.client.post(f"/api/feed/posts/{self.post.id}/like/")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+        self.client.post(f"/api/feed/posts/{self.post.id}/like/")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_comment(self):
+        self.client.post(f"/api/feed/posts/{self.post.id}/comment/", {"text": "nice"})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_follow_and_unfollow(self):
+        self.client.post(f"/api/feed/follow/{self.author.id}/")
+        self.author.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual((self.author.followers_count, self.user.following_count), (1, 1))
+
+        self.client.delete(f"/api/feed/unfollow/{self.author.id}/")
+        self.author.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual((self.author.followers_count, self.user.following_count), (0, 0))
+
+    def test_reconcile_counters(self):
+        Like.objects.create(user=self.user, post=self.post)
+        Follower.objects.create(follower=self.user, following=self.author)
+        User.objects.filter(pk=self.user.pk).update(followers_count=5)
+
+        call_command("reconcile_counters", stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.author.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.author.followers_count, 1)
+        self.assertEqual((self.user.followers_count, self.user.following_count), (0, 1))
+
+
+class ChatInboxTests(APITestCase):
+    """The inbox is served from the denormalized ChatRoom columns."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="me", email="me@example.com", mobile_number="100", user_type="personal")
+        self.client.force_authenticate(self.user)
+
+    def create_room(self, index):
+        friend = User.objects.create(
+            username=f"friend{index}", email=f"friend{index}@example.com",
+            mobile_number=f"2{index:02}", user_type="personal",
+        )
+        room = ChatRoom.objects.create(user1=self.user, user2=friend)
+        self.client.force_authenticate(friend)
+        self.client.post(f"/api/feed/chats/{room.id}/send-message/", {"content": f"hello {index}"})
+        self.client.force_authenticate(self.user)
+        return room
+
+    def test_inbox_sorted_with_preview_and_unread(self):
+        rooms = [self.create_room(i) for i in range(3)]
+        self.client.post(f"/api/feed/chats/{rooms[0].id}/send-message/", {"content": "reply"})
+
+        results = self.client.get("/api/feed/chats/inbox/").data["results"]
+        self.assertEqual([row["id"] for row in results], [str(rooms[i].id) for i in (0, 2, 1)])
+        self.assertEqual(results[0]["last_message_preview"], "reply")
+        self.assertEqual([row["unread_count"] for row in results], [1, 1, 1])
+
+        self.client.post(f"/api/feed/chats/{rooms[0].id}/read/")
+        results = self.client.get("/api/feed/chats/inbox/").data["results"]
+        self.assertEqual(results[0]["unread_count"], 0)
+
+    def test_inbox_constant_queries(self):
+        self.create_room(0)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get("/api/feed/chats/inbox/")
+        for i in range(1, 6):
+            self.create_room(i)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get("/api/feed/chats/inbox/")
+        self.assertEqual(len(response.data["results"]), 6)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+
+class UserSearchTests(APITestCase):
+    """Search ranks the best match first and loads profiles in the same query."""
+
+    def setUp(self):
+        self.users = {
+            name: User.objects.create(
+                username=name, email=f"{name}@example.com", mobile_number=f"+91-{name}", user_type=user_type,
+            )
+            for name, user_type in [("yoga", "personal"), ("yogafan", "personal"), ("kim", "business"), ("lee", "business")]
+        }
+        BusinessInfo.objects.create(
+            user=self.users["kim"], business_name="Sunrise Yoga", business_address="Pune", business_phone="1",
+        )
+        BusinessInfo.objects.create(
+            user=self.users["lee"], business_name="Lee Strength", business_type="fitness_center",
+            business_address="Pune", business_phone="2",
+        )
+        self.client.force_authenticate(self.users["yoga"])
+        self.url = reverse("user-search")
+
+    def test_ranked_matches(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {"q": "yoga"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user["username"] for user in response.data], ["yoga", "yogafan", "kim"])
+        self.assertEqual(response.data[2]["business_details"]["business_name"], "Sunrise Yoga")
+        self.assertEqual(len(context.captured_queries), 2)  # Business names, then users with profiles
+
+    def test_business_type_label(self):
+        response = self.client.get(self.url, {"q": "gym"})
+        self.assertEqual([user["username"] for user in response.data], ["lee"])
+
+    def test_exact_business_name_survives_match_limit(self):
+        for name in ("Yoga Hub", "Yoga"):  # Inserted after Sunrise Yoga: last in table order
+            user = User.objects.create(
+                username=f"owner {name}", email=f"{len(name)}@example.com", mobile_number=f"+91-{name}", user_type="business",
+            )
+            BusinessInfo.objects.create(user=user, business_name=name, business_address="Pune", business_phone="3")
+        with mock.patch.object(search, "BUSINESS_MATCH_LIMIT", 1):
+            users = search.search_users("yoga")
+        self.assertIn("owner Yoga", [user.username for user in users])
+        self.assertNotIn("kim", [user.username for user in users])
+
+
+class FollowSuggestionTests(APITestCase):
+    """Suggestions are precomputed from the graph and served without ORDER BY RANDOM()."""
+
+    def setUp(self):
+        self.users = {
+            name: User.objects.create(username=name, email=f"{name}@example.com", mobile_number=f"+91-{name}")
+            for name in ["me", "friend", "friend2", "mutual", "once", "colleague", "stranger", "owner"]
+        }
+        me = self.users["me"]
+        for friend in ("friend", "friend2"):
+            Follower.objects.create(follower=me, following=self.users[friend])
+            Follower.objects.create(follower=self.users[friend], following=self.users["mutual"])
+        Follower.objects.create(follower=self.users["friend"], following=self.users["once"])
+        Follower.objects.create(follower=self.users["friend"], following=me)
+
+        business = BusinessInfo.objects.create(
+            user=self.users["owner"], business_name="Gym", business_address="Pune", business_phone="1",
+        )
+        BusinessMembership.objects.create(business=business, user=me)
+        BusinessMembership.objects.create(business=business, user=self.users["colleague"])
+        self.client.force_authenticate(me)
+        self.url = reverse("suggested-users")
+
+    def test_build_ranks_graph_candidates(self):
+        build_suggestions([self.users["me"].id])
+        rows = list(FollowSuggestion.objects.filter(owner=self.users["me"]).order_by("-score", "suggested__username"))
+        self.assertEqual(
+            [(row.suggested.username, row.reason) for row in rows],
+            [("mutual", "friends_of_friends"), ("once", "friends_of_friends"), ("colleague", "shared_business"),
+             ("owner", "shared_business")],
+        )
+
+    def test_serves_suggestions_without_random_order(self):
+        call_command("build_follow_suggestions", stdout=StringIO())
+        Follower.objects.create(follower=self.users["me"], following=self.users["once"])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        reasons = {user["username"]: user["reason"] for user in response.data}
+        self.assertEqual(reasons, {
+            "mutual": "friends_of_friends", "colleague": "shared_business", "owner": "shared_business",
+            "stranger": None,  # Random fill
+        })
+        self.assertFalse(any("RANDOM()" in query["sql"].upper() for query in context.captured_queries))
+
+    def test_random_fallback(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {user["username"] for user in response.data}, {"mutual", "once", "colleague", "stranger", "owner"},
+        )
+        self.assertTrue(all(user["reason"] is None for user in response.data))
+
+
+class MessageWriterTests(TransactionTestCase):
+    """The write-behind queue saves batches, drops bad rows and drains at shutdown."""
+
+    def setUp(self):
+        self.me = User.objects.create(username="me", email="me@example.com", mobile_number="100")
+        self.friend = User.objects.create(username="friend", email="friend@example.com", mobile_number="200")
+        self.room = ChatRoom.objects.create(user1=self.me, user2=self.friend)
+        self.writer = MessageWriter(batch_size=10, flush_interval=60, max_queue=3)
+
+    def run_writer(self, messages, flushes=1):
+        async def run():
+            for message in messages:
+                await self.writer.put(message)
+            for _ in range(flushes):
+                await self.writer.flush()
+            self.writer._task.cancel()
+        async_to_sync(run)()
+
+    def message(self, content, room=None, sender=None):
+        return Message(chat_room=room or self.room, sender=sender or self.friend, content=content)
+
+    def test_batch_saved_with_broadcast_timestamp(self):
+        messages = [self.message(f"hello {i}") for i in range(3)]
+        self.run_writer(messages)
+
+        saved = {message.id: message.created_at for message in Message.objects.all()}
+        self.assertEqual(saved, {message.id: message.created_at for message in messages})
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.last_message_preview, self.room.user1_unread_count), ("hello 2", 3))
+
+    def test_failing_row_dropped(self):
+        other = ChatRoom.objects.create(user1=self.friend, user2=User.objects.create(
+            username="other", email="other@example.com", mobile_number="300",
+        ))
+        messages = [self.message("kept"), self.message("orphan", room=other)]
+        ChatRoom.objects.filter(pk=other.pk).delete()  # The room goes away while its message is queued
+
+        with self.assertLogs("feed.chat", "ERROR"):
+            self.run_writer(messages)
+        self.assertEqual(list(Message.objects.values_list("content", flat=True)), ["kept"])
+        self.assertEqual(self.writer._unsaved, [])
+
+    def test_transient_failure_retried_within_bound(self):
+        messages = [self.message(f"hello {i}") for i in range(4)]
+        write, calls = self.writer.write, []
+
+        def flaky_write(batch):
+            calls.append(batch)
+            if len(calls) <= 2:  # The batch, then its first row
+                raise OperationalError("connection lost")
+            write(batch)
+
+        with mock.patch.object(self.writer, "write", side_effect=flaky_write):
+            with self.assertLogs("feed.chat", "ERROR") as logs:
+                self.run_writer(messages[:3], flushes=1)
+                self.run_writer(messages[3:], flushes=0)  # Retry buffer is full: oldest dropped
+                self.run_writer([], flushes=1)
+        self.assertIn("1 oldest messages dropped", "\n".join(logs.output))
+        self.assertEqual(
+            list(Message.objects.order_by("created_at").values_list("content", flat=True)),
+            ["hello 1", "hello 2", "hello 3"],
+        )
+
+    def test_shutdown_drain(self):
+        async def queue():
+            for i in range(2):
+                await self.writer.put(self.message(f"hello {i}"))
+            self.writer._task.cancel()
+        async_to_sync(queue)()
+        self.assertEqual(Message.objects.count(), 0)
+
+        self.writer.flush_sync()
+        self.assertEqual(Message.objects.count(), 2)
+
+
+class PostViewCounterTests(APITestCase):
+    """Buffered views reach the database exactly once, even after a failed flush."""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch.object(view_counter, "get_redis_connection", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        author = User.objects.create(username="author", email="author@example.com", mobile_number="100")
+        self.posts = [Post.objects.create(user=author, media=f"Post/medias/{i}.jpg") for i in range(2)]
+
+    def record(self):
+        for _ in range(3):
+            view_counter.record_view(self.posts[0].id)
+        view_counter.record_view(self.posts[1].id, count=2)
+
+    def views(self):
+        return [Post.objects.get(pk=post.pk).views_count for post in self.posts]
+
+    def test_record_and_flush(self):
+        self.record()
+        self.assertEqual(view_counter.get_flush_metrics()["pending_views"], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(view_counter.flush_views(), 2)
+        self.assertEqual(self.views(), [3, 2])
+        self.assertFalse(self.redis.exists(view_counter.FLUSHING_KEY))
+        self.assertEqual(view_counter.flush_views(), 0)
+
+    def test_failed_flush_retried_without_double_counting(self):
+        self.record()
+        update, calls = QuerySet.update, []
+
+        def failing_second_update(queryset, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 2:
+                raise DatabaseError("connection lost")
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(view_counter, "UPDATE_BATCH_SIZE", 1), \
+                mock.patch.object(QuerySet, "update", autospec=True, side_effect=failing_second_update):
+            with self.assertRaises(DatabaseError):
+                view_counter.flush_views()
+        self.assertEqual(self.views(), [0, 0])  # The first batch was rolled back
+        self.assertTrue(self.redis.exists(view_counter.FLUSHING_KEY))
+
+        view_counter.record_view(self.posts[0].id)  # Buffered while the failed batch waits
+        with self.captureOnCommitCallbacks(execute=True):
+            view_counter.flush_views()
+        self.assertEqual(self.views(), [3, 2])
+        with self.captureOnCommitCallbacks(execute=True):
+            view_counter.flush_views()
+        self.assertEqual(self.views(), [4, 2])
+
+    def test_flush_losing_its_lock_rolls_back(self):
+        self.record()
+        apply_deltas = view_counter._apply_deltas
+
+        def slow_apply(deltas):
+            apply_deltas(deltas)
+            time.sleep(0.05)  # The lock expires: another worker may take the batch over
+
+        with mock.patch.object(view_counter, "LOCK_TIMEOUT", 0.01), \
+                mock.patch.object(view_counter, "_apply_deltas", side_effect=slow_apply):
+            with self.assertLogs("feed.view_counter", "WARNING"), self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(view_counter.flush_views(), 0)
+        self.assertEqual(self.views(), [0, 0])
+        token = self.redis.get(view_counter.FLUSHING_KEY).decode()
+        self.assertTrue(self.redis.exists(view_counter.BATCH_KEY.format(token)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(view_counter.flush_views(), 2)  # The same batch, applied once
+        self.assertEqual(self.views(), [3, 2])
+        self.assertFalse(self.redis.exists(view_counter.BATCH_KEY.format(token)))
+
+
+class ChatHistoryTests(APITestCase):
+    """History pages are keyed on (created_at, id); resume also sees messages other workers haven't saved."""
+
+    def setUp(self):
+        self.me = User.objects.create(username="me", email="me@example.com", mobile_number="100")
+        self.friend = User.objects.create(username="friend", email="friend@example.com", mobile_number="200")
+        self.room = ChatRoom.objects.create(user1=self.me, user2=self.friend)
+        start = timezone.now() - timedelta(minutes=10)
+        self.messages = [
+            Message.objects.create(chat_room=self.room, sender=self.friend, content=f"m{i}", created_at=start + timedelta(seconds=i // 2))
+            for i in range(6)  # Pairs share a created_at
+        ]
+        self.messages.sort(key=lambda message: (message.created_at, str(message.id)))
+        self.url = reverse("chat-messages", args=[self.room.id])
+        self.client.force_authenticate(self.me)
+
+    def contents(self, messages):
+        return [message.content if isinstance(message, Message) else message["content"] for message in messages]
+
+    def test_history_pages(self):
+        ordered = self.contents(self.messages)
+        rows, has_more = get_message_history(self.room, limit=4)
+        self.assertEqual((self.contents(rows), has_more), (ordered[2:], True))
+        rows, has_more = get_message_history(self.room, before=rows[0], limit=4)
+        self.assertEqual((self.contents(rows), has_more), (ordered[:2], False))
+        rows, has_more = get_message_history(self.room, after=self.messages[2], limit=2)  # Tie with messages[3]
+        self.assertEqual((self.contents(rows), has_more), (ordered[3:5], True))
+        rows, _ = get_message_history(self.room, since=self.messages[3].created_at)
+        self.assertEqual(self.contents(rows), ordered[4:])
+
+    def test_history_api(self):
+        ordered = self.contents(self.messages)
+        response = self.client.get(self.url, {"after": self.messages[1].id, "limit": 3})
+        self.assertEqual((self.contents(response.data["results"]), response.data["has_more"]), (ordered[2:5], True))
+        response = self.client.get(self.url, {"before": self.messages[2].id})
+        self.assertEqual(self.contents(response.data["results"]), ordered[:2])
+        self.assertEqual(self.client.get(self.url, {"since": "yesterday"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"after": "not-a-message"}).status_code, 404)
+
+    @override_settings(CHAT_WRITE_BEHIND={"ENABLED": True})
+    def test_missed_messages_include_other_workers_queue(self):
+        redis = fakeredis.FakeRedis()
+        patcher = mock.patch.object(chat, "get_connection", return_value=redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for message in self.messages[4:]:
+            remember_message(message)  # Saved and still buffered
+        unsaved = [Message(chat_room=self.room, sender=self.me, content=f"queued {i}") for i in range(2)]
+        for message in unsaved:
+            remember_message(message)  # Queued in another worker
+
+        missed, has_more = get_missed_messages(self.room, self.messages[3].id)
+        self.assertEqual(self.contents(missed), self.contents(self.messages[4:]) + ["queued 0", "queued 1"])
+        self.assertFalse(has_more)
+
+        missed, _ = get_missed_messages(self.room, unsaved[0].id)  # Resume from a message not saved yet
+        self.assertEqual(self.contents(missed), ["queued 1"])
+
+        missed, has_more = get_missed_messages(self.room, self.messages[0].id, limit=3)
+        self.assertEqual((self.contents(missed), has_more), (self.contents(self.messages[1:4]), True))
+        self.assertIsNone(get_missed_messages(self.room, Message().id))
+
+
+class ChatConsumerTests(TransactionTestCase):
+    """Only room members can connect; reconnecting clients resume from their last message."""
+
+    def setUp(self):
+        self.me = User.objects.create(username="me", email="me@example.com", mobile_number="100")
+        self.friend = User.objects.create(username="friend", email="friend@example.com", mobile_number="200")
+        self.stranger = User.objects.create(username="stranger", email="stranger@example.com", mobile_number="300")
+        self.room = ChatRoom.objects.create(user1=self.me, user2=self.friend)
+
+    def communicator(self, user, room_id=None):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/chat/{room_id or self.room.id}/")
+        communicator.scope["user"] = user
+        return communicator
+
+    def test_member_sends_and_resumes(self):
+        async def run():
+            communicator = self.communicator(self.me)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            for content in ("one", "two"):
+                await communicator.send_json_to({"message": content})
+                self.assertEqual((await communicator.receive_json_from())["content"], content)
+            first = await database_sync_to_async(Message.objects.get)(content="one")
+            await communicator.send_json_to({"type": "resume", "last_message_id": str(first.id)})
+            history = await communicator.receive_json_from()
+            await communicator.send_json_to({"type": "resume", "last_message_id": "unknown"})
+            error = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return history, error
+
+        history, error = async_to_sync(run)()
+        self.assertEqual([message["content"] for message in history["messages"]], ["two"])
+        self.assertFalse(history["has_more"])
+        self.assertEqual(error, {"error": "Unknown last_message_id"})
+
+    def test_non_member_rejected(self):
+        async def connect(user, room_id=None):
+            communicator = self.communicator(user, room_id)
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+            return connected
+
+        self.assertFalse(async_to_sync(connect)(self.stranger))
+        self.assertFalse(async_to_sync(connect)(AnonymousUser()))
+        self.assertFalse(async_to_sync(connect)(self.me, room_id=uuid.uuid4()))
+        self.assertTrue(async_to_sync(connect)(self.friend))
+
+    @override_settings(CHANNEL_LAYERS={
+        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer", "CONFIG": {"group_expiry": 1}},
+    })
+    def test_listening_socket_keeps_group_membership(self):
+        async def run():
+            communicator = self.communicator(self.friend)
+            await communicator.connect()
+            await asyncio.sleep(2.5)  # Past group_expiry without sending anything
+            await get_channel_layer().group_send(
+                f"chat_{self.room.id}", {"type": "chat_message", "message": {"content": "still here"}},
+            )
+            received = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return received
+
+        self.assertEqual(async_to_sync(run)(), {"content": "still here"})
+
+    @override_settings(CHANNEL_LAYERS={
+        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer", "CONFIG": {"group_expiry": 0.2}},
+    })
+    def test_group_membership_refresh_survives_errors_until_disconnect(self):
+        consumers = []
+
+        async def join_group(consumer):
+            consumers.append(consumer)
+            if len(consumers) == 2:
+                raise ConnectionError("channel layer unavailable")
+            await consumer.channel_layer.group_add(consumer.room_group_name, consumer.channel_name)
+
+        async def run():
+            communicator = self.communicator(self.friend)
+            await communicator.connect()
+            await asyncio.sleep(0.35)  # Second join fails, third still runs
+            await communicator.disconnect()
+            joins = len(consumers)
+            await asyncio.sleep(0.25)
+            return joins, consumers[0].membership_task.cancelled()
+
+        with mock.patch.object(ChatConsumer, "join_group", autospec=True, side_effect=join_group), \
+                self.assertLogs("feed.consumers", "ERROR"):
+            joins, cancelled = async_to_sync(run)()
+        self.assertGreaterEqual(joins, 3)
+        self.assertEqual(len(consumers), joins)
+        self.assertTrue(cancelled)
+
+
+class AutocompleteTests(APITestCase):
+    """Prefix lookups are served from Redis, ranked by followers, and rebuilt without downtime."""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch.object(autocomplete, "get_connection", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.yogi = User.objects.create(
+            username="yogi", email="yogi@example.com", mobile_number="100",
+            first_name="Anil", last_name="Kumar", followers_count=5,
+        )
+        self.studio = User.objects.create(
+            username="yoga_studio", email="studio@example.com", mobile_number="200", user_type="business", followers_count=50,
+        )
+        BusinessInfo.objects.create(
+            user=self.studio, business_name="Sunrise Yoga Academy", business_address="Pune", business_phone="1",
+        )
+        self.carl = User.objects.create(username="carl", email="carl@example.com", mobile_number="300", followers_count=1)
+        autocomplete.rebuild_index()
+        self.client.force_authenticate(self.yogi)
+        self.url = reverse("user-autocomplete")
+
+    def lookup(self, query):
+        return [entry["username"] for entry in self.client.get(self.url, {"q": query}).data]
+
+    def test_prefix_hits_ranked_by_followers(self):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.lookup("Yo"), ["yoga_studio", "yogi"])
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(self.lookup("kum"), ["yogi"])  # Last name
+        self.assertEqual(self.lookup("anil ku"), ["yogi"])  # Full name
+        self.assertEqual(self.lookup("suNRise yoga acad"), ["yoga_studio"])  # Business name
+
+        User.objects.filter(pk=self.yogi.pk).update(followers_count=500)
+        autocomplete.reindex_user(self.yogi.pk)
+        self.assertEqual(self.lookup("yo"), ["yogi", "yoga_studio"])
+
+    def test_rename_removes_old_prefixes(self):
+        User.objects.filter(pk=self.carl.pk).update(username="yocarl")
+        autocomplete.reindex_user(self.carl.pk)
+        self.assertEqual(self.lookup("yoc"), ["yocarl"])
+        self.assertEqual(self.lookup("car"), [])
+
+    def test_rebuild_keeps_serving(self):
+        served, index = [], autocomplete._index
+
+        def index_and_lookup(*args, **kwargs):
+            served.append(autocomplete.autocomplete("yo"))
+            index(*args, **kwargs)
+
+        with mock.patch.object(autocomplete, "_index", side_effect=index_and_lookup):
+            self.assertEqual(autocomplete.rebuild_index(), 3)
+        self.assertTrue(all([entry["username"] for entry in entries] == ["yoga_studio", "yogi"] for entries in served))
+        self.assertEqual(self.lookup("yo"), ["yoga_studio", "yogi"])
+        self.assertEqual(self.redis.keys("feed:autocomplete:1:*"), [])  # Previous version dropped
+
+    def test_search_fallback_without_redis(self):
+        with mock.patch.object(autocomplete, "get_connection", return_value=None):
+            self.assertEqual(set(self.lookup("yog")), {"yogi", "yoga_studio"})
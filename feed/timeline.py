@@ -0,0 +1,126 @@
+"""
+Home timeline store for the feed.
+
+When a post is created it is pushed into the timeline of every follower of
+the author (fan-out-on-write). Authors with a huge audience are skipped on
+write; their recent posts are pulled into a reader's timeline when the
+timeline is read (fan-out-on-read). Either way a feed page is served by a
+single ranged lookup on `TimelineEntry`.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from account.models import User
+from .models import Post, Follower, TimelineEntry
+
+
+FANOUT_BATCH_SIZE = 1000
+FOLLOW_BACKFILL_POSTS = 50  # Recent posts copied into a timeline on follow
+FANOUT_ON_READ_CACHE_TIMEOUT = 300
+PULL_OVERLAP = timedelta(minutes=1)  # Re-check window for posts committed late
+
+
+def _fanout_on_read_key(user_id):
+    return f"feed:timeline:fanout_on_read:{user_id}"
+
+
+def _pulled_at_key(user_id):
+    return f"feed:timeline:pulled_at:{user_id}"
+
+
+def is_fanout_on_read(author):
+    """Authors with more followers than the threshold are merged on read."""
+    return author.followers_count >= settings.FEED_FANOUT_THRESHOLD
+
+
+def _entry(owner_id, post):
+    return TimelineEntry(owner_id=owner_id, post_id=post.id, author_id=post.user_id, created_at=post.created_at)
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """
+    Push a newly created post into the author's and the followers' timelines.
+    For fan-out-on-read authors only the author's own timeline is written.
+    """
+    entries = [_entry(post.user_id, post)]
+
+    if not is_fanout_on_read(post.user):
+        follower_ids = Follower.objects.filter(following_id=post.user_id).values_list("follower_id", flat=True)
+        for follower_id in follower_ids.iterator(chunk_size=FANOUT_BATCH_SIZE):
+            entries.append(_entry(follower_id, post))
+            if len(entries) >= FANOUT_BATCH_SIZE:
+                _bulk_insert(entries)
+                entries = []
+
+    if entries:
+        _bulk_insert(entries)
+
+
+def backfill_author_posts(owner, author, limit=FOLLOW_BACKFILL_POSTS):
+    """Copy the latest posts of `author` into the timeline of `owner`."""
+    posts = Post.objects.filter(user=author).only("id", "user_id", "created_at").order_by("-created_at")[:limit]
+    _bulk_insert([_entry(owner.id, post) for post in posts])
+
+
+def on_follow(follower, following):
+    """Make the followed user's posts visible in the follower's timeline."""
+    cache.delete_many([_fanout_on_read_key(follower.id), _pulled_at_key(follower.id)])
+    if not is_fanout_on_read(following):
+        backfill_author_posts(follower, following)
+
+
+def on_unfollow(follower, following):
+    """Remove the unfollowed user's posts from the follower's timeline."""
+    TimelineEntry.objects.filter(owner=follower, author=following).delete()
+    cache.delete(_fanout_on_read_key(follower.id))
+
+
+def get_fanout_on_read_author_ids(user):
+    """Followed authors whose posts are not fanned out on write (cached)."""
+    key = _fanout_on_read_key(user.id)
+    author_ids = cache.get(key)
+
+    if author_ids is None:
+        following_ids = Follower.objects.filter(follower=user).values("following_id")
+        author_ids = list(
+            User.objects.filter(id__in=following_ids, followers_count__gte=settings.FEED_FANOUT_THRESHOLD)
+            .values_list("id", flat=True)
+        )
+        cache.set(key, author_ids, timeout=FANOUT_ON_READ_CACHE_TIMEOUT)
+
+    return author_ids
+
+
+def pull_fanout_on_read_posts(user):
+    """Merge new posts of fan-out-on-read authors into the user's timeline."""
+    author_ids = get_fanout_on_read_author_ids(user)
+    if not author_ids:
+        return
+
+    key = _pulled_at_key(user.id)
+    pulled_at = cache.get(key)
+    started_at = now()
+
+    posts = Post.objects.filter(user_id__in=author_ids).only("id", "user_id", "created_at").order_by("-created_at")
+    if pulled_at:
+        posts = posts.filter(created_at__gte=pulled_at - PULL_OVERLAP)
+
+    _bulk_insert([_entry(user.id, post) for post in posts[:settings.FEED_TIMELINE_PULL_LIMIT]])
+    cache.set(key, started_at, timeout=None)
+
+
+def home_timeline_queryset(user):
+    """Posts in the user's home timeline, latest first."""
+    pull_fanout_on_read_posts(user)
+    return (
+        Post.objects.filter(timeline_entries__owner=user)
+        .select_related("user")
+        .order_by("-timeline_entries__created_at")
+    )
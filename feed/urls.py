@@ -14,8 +14,11 @@ urlpatterns = [
     # Like and comment
     path('posts/<post_id>/like/', LikePostAPIView.as_view(), name='post-like'),  # Like/unlike a post
     path('posts/<post_id>/comment/', CommentPostAPIView.as_view(), name='post-comment'),  # Add a comment
+    path('posts/<uuid:post_id>/view/', PostViewAPIView.as_view(), name='post-view'),  # Count a view
+    path('posts/views/metrics/', PostViewMetricsAPIView.as_view(), name='post-view-metrics'),
 
     path("search-users/", UserSearchAPIView.as_view(), name="user-search"),
+    path("autocomplete/", UserAutocompleteAPIView.as_view(), name="user-autocomplete"),
     path('follow/<uuid:user_id>/', FollowUserAPIView.as_view(), name='follow-user'),
     path('unfollow/<uuid:user_id>/', UnfollowUserAPIView.as_view(), name='unfollow-user'),
     path('followers/<uuid:user_id>/', FollowerListAPIView.as_view(), name='followers-list'),
@@ -25,6 +28,8 @@ urlpatterns = [
     path('suggested-users/', SuggestedUsersAPIView.as_view(), name='suggested-users'),
 
     path("chats/", ChatListAPIView.as_view(), name="chat-list"),
+    path("chats/inbox/", ChatInboxAPIView.as_view(), name="chat-inbox"),
+    path("chats/<room_id>/read/", MarkChatReadAPIView.as_view(), name="chat-mark-read"),
     path("chats/<room_id>/messages/", ChatMessagesAPIView.as_view(), name="chat-messages"),
     path("chats/<room_id>/send-message/", SendMessageAPIView.as_view(), name="send-message"),
     path('chats/create/<user2_id>/', CreateChatRoomAPIView.as_view(), name='create-chat-room'),
@@ -0,0 +1,144 @@
+"""
+Buffered view counting for `Post.views_count`.
+
+A view is an `HINCRBY` on a Redis hash (post id -> pending views), so hot posts
+never take a row lock per view. `flush_views()` periodically swaps the hash
+out and applies all pending deltas to the database with a single
+`UPDATE ... SET views_count = views_count + CASE id WHEN ... END` per batch
+of posts. Run it with `python manage.py flush_post_views --loop`.
+
+Each swap moves the pending views to a batch hash with its own token
+(`FLUSHING_KEY` points at it until it is written). All UPDATEs of a flush run
+in one transaction; right before the commit the flush lock is extended, which
+fails if the lock expired meanwhile (and another worker may have taken the
+batch over): the transaction is then rolled back. The batch hash is deleted
+only after the commit. A batch is therefore applied exactly once, and a flush
+failing halfway is retried from the same batch.
+"""
+import logging
+import time
+import uuid
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveBigIntegerField, Value, When
+from django_redis import get_redis_connection
+from redis.exceptions import LockError
+
+from .models import Post
+
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "feed:post_views:pending"  # Hash of post id -> views not yet in the DB
+PENDING_TOTAL_KEY = "feed:post_views:pending_total"
+OLDEST_KEY = "feed:post_views:oldest"  # Timestamp of the oldest buffered view
+FLUSHING_KEY = "feed:post_views:flushing"  # Token of the batch currently being written
+BATCH_KEY = "feed:post_views:batch:{}"  # Hash of post id -> views of one swapped-out batch
+BATCH_OLDEST_KEY = "feed:post_views:batch_oldest:{}"
+METRICS_KEY = "feed:post_views:metrics"
+LOCK_KEY = "feed:post_views:flush_lock"
+
+UPDATE_BATCH_SIZE = 500
+LOCK_TIMEOUT = 60
+
+
+def record_view(post_id, count=1):
+    """Buffer `count` views of a post. One Redis round-trip, no DB access."""
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    pipe.hincrby(PENDING_KEY, str(post_id), count)
+    pipe.incrby(PENDING_TOTAL_KEY, count)
+    pipe.set(OLDEST_KEY, time.time(), nx=True)
+    pipe.execute()
+
+
+def _swap_pending(conn):
+    """Atomically move the pending buffer to a new batch and return its token; new views start a fresh hash."""
+    token = uuid.uuid4().hex
+    pipe = conn.pipeline(transaction=True)
+    pipe.rename(PENDING_KEY, BATCH_KEY.format(token))
+    pipe.rename(OLDEST_KEY, BATCH_OLDEST_KEY.format(token))
+    pipe.delete(PENDING_TOTAL_KEY)
+    pipe.set(FLUSHING_KEY, token)
+    pipe.execute(raise_on_error=False)  # RENAME fails when nothing is pending
+    return token
+
+
+def _finish_batch(conn, token):
+    conn.delete(BATCH_KEY.format(token), BATCH_OLDEST_KEY.format(token), FLUSHING_KEY)
+
+
+def _apply_deltas(deltas):
+    """Add the buffered views to `views_count`, one UPDATE per batch of posts."""
+    items = list(deltas.items())
+    for start in range(0, len(items), UPDATE_BATCH_SIZE):
+        batch = items[start:start + UPDATE_BATCH_SIZE]
+        delta = Case(
+            *[When(pk=post_id, then=Value(count)) for post_id, count in batch],
+            default=Value(0),
+            output_field=PositiveBigIntegerField(),
+        )
+        Post.objects.filter(pk__in=[post_id for post_id, _ in batch]).update(views_count=F("views_count") + delta)
+
+
+def flush_views():
+    """
+    Write buffered views to the database and return the number of posts updated.
+    A batch left behind by a failed flush is retried before new views are taken.
+    """
+    conn = get_redis_connection("default")
+    lock = conn.lock(LOCK_KEY, timeout=LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return 0  # Another worker is flushing
+
+    try:
+        started = time.time()
+        token = conn.get(FLUSHING_KEY)
+        token = token.decode() if token else _swap_pending(conn)
+
+        raw = conn.hgetall(BATCH_KEY.format(token))
+        oldest = conn.get(BATCH_OLDEST_KEY.format(token))
+        deltas = {key.decode(): int(value) for key, value in raw.items() if int(value) > 0}
+        try:
+            with transaction.atomic():
+                if deltas:
+                    _apply_deltas(deltas)
+                # Still ours for another LOCK_TIMEOUT, so no other flush takes the batch before the commit
+                lock.extend(LOCK_TIMEOUT, replace_ttl=True)
+                transaction.on_commit(lambda: _finish_batch(conn, token))
+        except LockError:
+            logger.warning("Post views flush outlived its %ss lock, rolled back for the next flush", LOCK_TIMEOUT)
+            return 0
+
+        finished = time.time()
+        conn.hset(METRICS_KEY, mapping={
+            "last_flush_at": finished,
+            "last_flush_posts": len(deltas),
+            "last_flush_views": sum(deltas.values()),
+            "last_flush_duration_ms": round((finished - started) * 1000, 2),
+            "last_flush_lag_seconds": round(finished - float(oldest), 2) if oldest else 0,
+        })
+        return len(deltas)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            pass  # Expired after the commit, or already logged above
+
+
+def get_flush_metrics():
+    """Buffer size and lag between a view being recorded and it reaching the DB."""
+    conn = get_redis_connection("default")
+    pipe = conn.pipeline(transaction=False)
+    pipe.hlen(PENDING_KEY)
+    pipe.get(PENDING_TOTAL_KEY)
+    pipe.get(OLDEST_KEY)
+    pipe.hgetall(METRICS_KEY)
+    pending_posts, pending_views, oldest, metrics = pipe.execute()
+
+    data = {key.decode(): float(value) for key, value in metrics.items()}
+    data.update({
+        "pending_posts": pending_posts,
+        "pending_views": int(pending_views or 0),
+        "current_lag_seconds": round(time.time() - float(oldest), 2) if oldest else 0,
+    })
+    return data
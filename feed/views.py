@@ -4,13 +4,26 @@ from django.shortcuts import render
 from rest_framework import generics, status
 from rest_framework.pagination import PageNumberPagination
 from .models import Post
-from .serializers import PostSerializer, FollowerSerializer, UserSerializer, ChatRoomSerializer, MessageSerializer
+from .serializers import get_expand_fields, PostSerializer, FollowerSerializer, UserSerializer, ChatRoomSerializer, ChatInboxSerializer, MessageSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from account.models import User
 from .models import *
 from core.models import *
 from rest_framework import permissions
+from .view_counter import get_flush_metrics, record_view
+from .chat import HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE, get_message_history, mark_room_read, save_message
+from .autocomplete import DEFAULT_LIMIT, MAX_LIMIT, autocomplete, schedule_reindex, user_entry
+from .search import search_users
+from .suggestions import get_suggestions
+from .timeline import fan_out_post, home_timeline_queryset, on_follow, on_unfollow
+from core.pagination import CursorOptInMixin, KeysetPagination, use_cursor_pagination
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 
 
@@ -21,23 +34,56 @@ class CustomPagination(PageNumberPagination):
     max_page_size = 50  # Maximum limit: 50 posts per page
 
 
-class PostListAPIView(generics.ListAPIView):
-    """API for retrieving paginated list of posts by GET"""
+class ChatMessagePagination(KeysetPagination):
+    """Keyset pagination for chat messages, oldest first like the full listing"""
+    page_size = 50
+    max_page_size = 100
+    ordering = ('created_at', 'id')
+
+
+class ChatInboxPagination(KeysetPagination):
+    """Keyset pagination for the inbox, latest activity first"""
+    page_size = 20
+    ordering = ('-last_message_at', '-id')
+
+
+class ExpandablePostsMixin:
+    """Post list views: nested likes/comments lists only with `?expand=`"""
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), "expand": get_expand_fields(self.request)}
+
+
+class PostListAPIView(ExpandablePostsMixin, CursorOptInMixin, generics.ListAPIView):
+    """
+    API for retrieving paginated list of posts by GET
+
+    - `?feed=home`: posts from the precomputed home timeline of the current user
+    - otherwise: latest posts of all users
+    - `?pagination=cursor`: keyset pages on (created_at, id), follow `next` for more
+    """
     
-    queryset = Post.objects.all().order_by('-created_at')  # Latest posts fetch karo
     serializer_class = PostSerializer  # Serializer ka use karo
     pagination_class = CustomPagination  # Custom pagination set karo
 
+    def get_queryset(self):
+        if self.request.query_params.get("feed") == "home":
+            queryset = home_timeline_queryset(self.request.user)
+        else:
+            queryset = Post.objects.all().order_by('-created_at')  # Latest posts fetch karo
+        return queryset.for_feed(expand=get_expand_fields(self.request))
+
 
-class PostListUserAPIView(generics.ListAPIView):
-    """API to fetch all posts of a current user by GET"""
+class PostListUserAPIView(ExpandablePostsMixin, CursorOptInMixin, generics.ListAPIView):
+    """API to fetch all posts of a current user by GET (`?pagination=cursor` for keyset pages)"""
 
     serializer_class = PostSerializer  
     pagination_class = CustomPagination 
 
     def get_queryset(self):
         """Filter posts by logged-in user"""
-        return Post.objects.filter(user=self.request.user).order_by('-created_at')
+        queryset = Post.objects.filter(user=self.request.user).order_by('-created_at')
+        return queryset.for_feed(expand=get_expand_fields(self.request))
 
 
 class PostCreateUpdateDeleteAPIView(APIView):
@@ -47,7 +93,8 @@ class PostCreateUpdateDeleteAPIView(APIView):
         serializer = PostSerializer(data=request.data)
         
         if serializer.is_valid():
-            serializer.save(user=request.user)  # Automatically assign the current user
+            post = serializer.save(user=request.user)  # Automatically assign the current user
+            fan_out_post(post)  # Push into followers' home timelines
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -90,10 +137,16 @@ class LikePostAPIView(APIView):
         except Post.DoesNotExist:
             return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
         
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(user=request.user, post=post)
+
+            if created:
+                Post.objects.filter(pk=post.pk).update(likes_count=F("likes_count") + 1)
+            else:
+                like.delete()  # Unlike if already liked
+                Post.objects.filter(pk=post.pk).update(likes_count=Greatest(F("likes_count") - 1, 0))
 
         if not created:
-            like.delete()  # Unlike if already liked
             return Response({"message": "Unliked the post"}, status=status.HTTP_200_OK)
         
         create_feed_notification(request.user, post, 'post_like', f"{request.user.username} liked your post.")
@@ -102,6 +155,23 @@ class LikePostAPIView(APIView):
     
 
 
+class PostViewAPIView(APIView):
+    """API to count a view of a post (buffered, flushed to views_count in bulk)"""
+
+    def post(self, request, post_id):
+        record_view(post_id)
+        return Response({"message": "View recorded"}, status=status.HTTP_202_ACCEPTED)
+
+
+class PostViewMetricsAPIView(APIView):
+    """Admin API for the view buffer: pending views and flush lag"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_flush_metrics(), status=status.HTTP_200_OK)
+
+
+
 class CommentPostAPIView(APIView):
     """API for adding a comment on a post"""
 
@@ -115,7 +185,9 @@ class CommentPostAPIView(APIView):
         if not text:
             return Response({"error": "Comment cannot be empty"}, status=status.HTTP_400_BAD_REQUEST)
 
-        comment = Comment.objects.create(user=request.user, post=post, text=text)
+        with transaction.atomic():
+            comment = Comment.objects.create(user=request.user, post=post, text=text)
+            Post.objects.filter(pk=post.pk).update(comments_count=F("comments_count") + 1)
 
         create_feed_notification(request.user, post, 'post_comment', f"{request.user.username} commented: {text[:30]}")
 
@@ -128,6 +200,7 @@ from django.db.models import Q
 class UserSearchAPIView(APIView):
     """
     Search users globally by username, full name, business name, or business type.
+    Best matches first (see `feed.search`).
     """
 
     def get(self, request):
@@ -136,13 +209,8 @@ class UserSearchAPIView(APIView):
         if not query:
             return Response({"error": "Search query is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        users = User.objects.filter(
-            Q(username__icontains=query) | 
-            Q(first_name__icontains=query) | 
-            Q(last_name__icontains=query) | 
-            Q(businessinfo__business_name__icontains=query) |  # Search in business name
-            Q(businessinfo__business_type__icontains=query)  # Search in business type
-        ).distinct()[:10]  # Limit results to 10
+        # Index-backed match, ranked by similarity; profiles come in the same query
+        users = search_users(query)  # Limit results to 10
 
         user_data = []
         for user in users:
@@ -168,6 +236,29 @@ class UserSearchAPIView(APIView):
 
 
 
+class UserAutocompleteAPIView(APIView):
+    """
+    Search-as-you-type: users whose username, name or business name starts with `q`.
+
+    GET /api/feed/autocomplete/?q=<prefix>&limit=<1-20, default 8>
+    Most followed first, served from the Redis prefix index (see `feed.autocomplete`).
+    """
+
+    def get(self, request):
+        query = request.GET.get("q", "").strip()
+        if not query:
+            return Response({"error": "Search query is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.GET.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            return Response({"error": "limit must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = autocomplete(query, limit)
+        if results is None:  # No Redis, use the database search
+            results = [user_entry(user) for user in search_users(query, limit)]
+        return Response(results, status=status.HTTP_200_OK)
+
+
 class FollowUserAPIView(APIView):
     """
     Follow a user (like Instagram).
@@ -184,8 +275,15 @@ class FollowUserAPIView(APIView):
         if follower == following:
             return Response({"error": "You cannot follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
 
-        obj, created = Follower.objects.get_or_create(follower=follower, following=following)
+        with transaction.atomic():
+            obj, created = Follower.objects.get_or_create(follower=follower, following=following)
+            if created:
+                User.objects.filter(pk=following.pk).update(followers_count=F("followers_count") + 1)
+                User.objects.filter(pk=follower.pk).update(following_count=F("following_count") + 1)
+
         if created:
+            on_follow(follower, following)
+            schedule_reindex(following.pk)  # Autocomplete ranks by followers
             return Response({"message": "You are now following this user."}, status=status.HTTP_201_CREATED)
         return Response({"message": "You are already following this user."}, status=status.HTTP_200_OK)
 
@@ -203,8 +301,15 @@ class UnfollowUserAPIView(APIView):
         except User.DoesNotExist:
             return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        deleted, _ = Follower.objects.filter(follower=follower, following=following).delete()
+        with transaction.atomic():
+            deleted, _ = Follower.objects.filter(follower=follower, following=following).delete()
+            if deleted:
+                User.objects.filter(pk=following.pk).update(followers_count=Greatest(F("followers_count") - 1, 0))
+                User.objects.filter(pk=follower.pk).update(following_count=Greatest(F("following_count") - 1, 0))
+
         if deleted:
+            on_unfollow(follower, following)
+            schedule_reindex(following.pk)
             return Response({"message": "You have unfollowed this user."}, status=status.HTTP_200_OK)
         return Response({"error": "You are not following this user."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -221,7 +326,7 @@ class FollowerListAPIView(APIView):
             return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
         followers = user.followers.all().select_related("follower__personalinfo")  # Optimized DB query
-        count = followers.count()
+        count = user.followers_count  # Denormalized counter, no COUNT(*)
 
         follower_list = [
             {
@@ -249,7 +354,7 @@ class FollowingListAPIView(APIView):
             return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
         following = user.following.all().select_related("following__personalinfo")  # Optimized DB query
-        count = following.count()
+        count = user.following_count  # Denormalized counter, no COUNT(*)
 
         following_list = [
             {
@@ -283,9 +388,9 @@ class UserProfileAPIView(APIView):
         is_follower = user.followers.filter(follower=viewer).exists() if viewer else False
 
 
-        # Get follower and following count
-        follower_count = user.followers.count()
-        following_count = user.following.count()
+        # Get follower and following count (denormalized counters)
+        follower_count = user.followers_count
+        following_count = user.following_count
 
         # Default response for personal users
         user_data = {
@@ -359,15 +464,18 @@ class CheckFollowStatusAPIView(APIView):
 class SuggestedUsersAPIView(APIView):
     """
     Suggest users to follow with profile details.
+
+    Served from the precomputed suggestions (friends of friends, shared
+    business, same category; see `feed.suggestions`), topped up with random
+    users. `reason` is null for those.
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        following_users = user.following.values_list('following', flat=True)
 
-        # Exclude users already followed & self
-        suggested_users = User.objects.exclude(id__in=following_users).exclude(id=user.id).order_by("?")[:5]
+        # Precomputed candidates, then a random sample; no ORDER BY RANDOM()
+        suggestions = get_suggestions(user, count=5)
 
         # Prepare response data with full user details
         suggested_users_data = [
@@ -375,9 +483,10 @@ class SuggestedUsersAPIView(APIView):
                 "id": suggested_user.id,
                 "username": suggested_user.username,
                 "full_name": suggested_user.get_full_name(),
-                "profile_pic": suggested_user.personalinfo.profile_pic.url if hasattr(suggested_user, "personalinfo") and suggested_user.personalinfo.profile_pic else None
+                "profile_pic": suggested_user.personalinfo.profile_pic.url if hasattr(suggested_user, "personalinfo") and suggested_user.personalinfo.profile_pic else None,
+                "reason": reason,
             }
-            for suggested_user in suggested_users
+            for suggested_user, reason in suggestions
         ]
 
         return Response(suggested_users_data, status=status.HTTP_200_OK)
@@ -391,17 +500,100 @@ class ChatListAPIView(APIView):
         serializer = ChatRoomSerializer(chats, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+class ChatInboxAPIView(APIView):
+    """
+    Inbox of the current user by GET: chat rooms sorted by last activity with
+    the other user, the last message preview and the user's unread count.
+    Served from the denormalized ChatRoom columns in one query per page.
+    Response: {"next": <url or null>, "results": [...]}
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        rooms = ChatRoom.objects.filter(Q(user1=user) | Q(user2=user)).select_related("user1", "user2")
+
+        paginator = ChatInboxPagination()
+        page = paginator.paginate_queryset(rooms, request, view=self)
+        serializer = ChatInboxSerializer(page, many=True, context={"request": request})
+        return paginator.get_paginated_response(serializer.data)
+
+class MarkChatReadAPIView(APIView):
+    """Marks every message the current user received in a chat room as read"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, room_id):
+        try:
+            chat_room = ChatRoom.objects.filter(Q(user1=request.user) | Q(user2=request.user)).get(id=room_id)
+        except (ChatRoom.DoesNotExist, ValidationError):
+            return Response({"error": "Chat room not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        mark_room_read(chat_room, request.user)
+        return Response({"message": "Chat marked as read", "unread_count": 0}, status=status.HTTP_200_OK)
+
 class ChatMessagesAPIView(APIView):
+    """
+    Messages of a chat room by GET, oldest first.
+
+    History mode (any of these params):
+    - `before=<message_id>`: the page of messages older than that message
+    - `after=<message_id>`: messages newer than that message (sync after reconnect)
+    - `since=<ISO datetime>`: messages created after that time
+    - `limit`: page size (default 50, max 100)
+    Response: {"results": [...], "has_more": bool}
+
+    Without these params every message is returned (or a cursor page with `?pagination=cursor`).
+    """
+    history_params = ("before", "after", "since", "limit")
+
     def get(self, request, room_id):
         try:
             chat_room = ChatRoom.objects.get(id=room_id)
         except ChatRoom.DoesNotExist:
             return Response({"error": "Chat room not found"}, status=status.HTTP_404_NOT_FOUND)
 
+        if any(param in request.query_params for param in self.history_params):
+            return self.get_history(request, chat_room)
+
         messages = chat_room.messages.all().order_by("created_at")
+
+        if use_cursor_pagination(request):
+            paginator = ChatMessagePagination()
+            page = paginator.paginate_queryset(messages, request, view=self)
+            serializer = MessageSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
         serializer = MessageSerializer(messages, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    def get_history(self, request, chat_room):
+        params = request.query_params
+        anchors = {}
+        for param in ("before", "after"):
+            if params.get(param):
+                try:
+                    anchors[param] = chat_room.messages.only("id", "created_at").get(id=params[param])
+                except (Message.DoesNotExist, ValidationError):
+                    return Response({"error": f"Message '{params[param]}' not found in this chat"}, status=status.HTTP_404_NOT_FOUND)
+
+        since = None
+        if params.get("since"):
+            since = parse_datetime(params["since"])
+            if since is None:
+                return Response({"error": "Invalid 'since', use an ISO 8601 datetime"}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        try:
+            limit = int(params.get("limit", HISTORY_PAGE_SIZE))
+        except ValueError:
+            return Response({"error": "Invalid 'limit'"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+
+        messages, has_more = get_message_history(chat_room, since=since, limit=limit, **anchors)
+        serializer = MessageSerializer(messages, many=True)
+        return Response({"results": serializer.data, "has_more": has_more}, status=status.HTTP_200_OK)
+
 class SendMessageAPIView(APIView):
     def post(self, request, room_id):
         try:
@@ -415,7 +607,7 @@ class SendMessageAPIView(APIView):
         if not content:
             return Response({"error": "Message cannot be empty"}, status=status.HTTP_400_BAD_REQUEST)
 
-        message = Message.objects.create(chat_room=chat_room, sender=sender, content=content)
+        message = save_message(chat_room, sender, content)
         return Response({"message": "Message sent successfully"}, status=status.HTTP_201_CREATED)
 
 